@@ -0,0 +1,437 @@
+"""Offline evaluation of poll policies on high resolution flow traces.
+
+Every policy is simulated against flow traces sampled once per second, all
+traces of a policy in lockstep with numpy, and scored by:
+
+- requests issued, per hour and the peak per minute (device load)
+- litres of draws no poll saw at all, and the litres the sample and hold
+  flow of the polls is off from the real flow
+- seconds from the start and from the end of a draw until a poll sees it
+
+Run from the repository root, on synthetic traces or recorded ones:
+
+    python -m benchmarks.policies --traces 200 --days 7
+    python -m benchmarks.policies --trace trace.csv --fixed 5,10,30
+"""
+
+from abc import ABC, abstractmethod
+import argparse
+from collections.abc import Iterable
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+import time
+
+import numpy as np
+
+from custom_components.bwt_perla.polling import (
+    _IDLE_INTERVAL_MAX,
+    _LIKELY_INTERVAL,
+    _LOOKAHEAD,
+    _P_REFERENCE,
+    UPDATE_INTERVAL_MAX,
+    UPDATE_INTERVAL_MIN,
+    ClassicPolicy,
+)
+
+from .simulator import Trace
+
+_HOURS_PER_WEEK = 7 * 24
+_DAY = 24 * 3600
+
+
+class VectorPolicy(ABC):
+    """Poll policy computing the next interval of many traces at once."""
+
+    name: str
+
+    def subset(self, rows: slice) -> "VectorPolicy":
+        """Return the policy for a subset of the traces."""
+        return self
+
+    def initial(self, count: int) -> np.ndarray:
+        """Return the interval before the first poll of every trace."""
+        return np.full(count, UPDATE_INTERVAL_MAX, dtype=np.int64)
+
+    @abstractmethod
+    def next_interval(
+        self, interval: np.ndarray, flow: np.ndarray, now: np.ndarray, rows: np.ndarray
+    ) -> np.ndarray:
+        """Return the seconds until the next poll of the polled rows."""
+
+
+class FixedPolicy(VectorPolicy):
+    """Poll at a fixed interval."""
+
+    def __init__(self, interval: int) -> None:
+        """Initialize the policy."""
+        self.interval = interval
+        self.name = f"fixed {interval}s"
+
+    def initial(self, count: int) -> np.ndarray:
+        """Return the interval before the first poll of every trace."""
+        return np.full(count, self.interval, dtype=np.int64)
+
+    def next_interval(self, interval, flow, now, rows):
+        """Return the seconds until the next poll of the polled rows."""
+        return np.full(len(rows), self.interval, dtype=np.int64)
+
+
+class DoublingPolicy(VectorPolicy):
+    """The classic policy: minimum while water flows, doubling otherwise."""
+
+    def __init__(
+        self, minimum: int = UPDATE_INTERVAL_MIN, maximum: int = UPDATE_INTERVAL_MAX
+    ) -> None:
+        """Initialize the policy, the defaults are those of ClassicPolicy."""
+        self.minimum = minimum
+        self.maximum = maximum
+        self.name = f"doubling {minimum}-{maximum}s"
+
+    def initial(self, count: int) -> np.ndarray:
+        """Return the interval before the first poll of every trace."""
+        return np.full(count, self.maximum, dtype=np.int64)
+
+    def next_interval(self, interval, flow, now, rows):
+        """Return the seconds until the next poll of the polled rows."""
+        backed_off = np.where(
+            interval >= self.maximum, interval, np.minimum(self.maximum, interval * 2)
+        )
+        return np.where(flow > 0, self.minimum, backed_off)
+
+
+class LearnedVectorPolicy(VectorPolicy):
+    """The learned policy with usage probabilities per hour of the week.
+
+    The probabilities are given per trace, e.g. by usage_probabilities of
+    the same traces. That is the best the online histogram can learn, so the
+    result is an upper bound of the learned policy.
+    """
+
+    def __init__(
+        self,
+        probabilities: np.ndarray,
+        likely_interval: float = _LIKELY_INTERVAL,
+        reference: float = _P_REFERENCE,
+        idle_max: int = _IDLE_INTERVAL_MAX,
+        lookahead: int = int(_LOOKAHEAD.total_seconds()),
+    ) -> None:
+        """Initialize the policy, the defaults are those of LearnedPolicy."""
+        self.probabilities = probabilities
+        self.likely_interval = likely_interval
+        self.reference = reference
+        self.idle_max = idle_max
+        self.lookahead = lookahead
+        self.name = f"learned {likely_interval}s@{reference}, max {idle_max}s"
+        self._fallback = DoublingPolicy()
+
+    def subset(self, rows: slice) -> "LearnedVectorPolicy":
+        """Return the policy for a subset of the traces."""
+        return LearnedVectorPolicy(
+            self.probabilities[rows],
+            self.likely_interval,
+            self.reference,
+            self.idle_max,
+            self.lookahead,
+        )
+
+    def next_interval(self, interval, flow, now, rows):
+        """Return the seconds until the next poll of the polled rows."""
+        table = self.probabilities[rows]
+        hour = now // 3600 % _HOURS_PER_WEEK
+        ahead = (now + self.lookahead) // 3600 % _HOURS_PER_WEEK
+        picked = np.arange(len(rows))
+        likelihood = np.fmax(table[picked, hour], table[picked, ahead])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            target = self.likely_interval * self.reference / likelihood
+            target = np.clip(target, UPDATE_INTERVAL_MIN, self.idle_max)
+            target = np.minimum(target, np.maximum(UPDATE_INTERVAL_MIN, interval * 2))
+            target = np.rint(target).astype(np.int64)
+        # Hours without any observation fall back to the classic policy
+        fallback = self._fallback.next_interval(interval, flow, now, rows)
+        target = np.where(np.isnan(likelihood), fallback, target)
+        return np.where(flow > 0, UPDATE_INTERVAL_MIN, target)
+
+
+def usage_probabilities(flows: np.ndarray) -> np.ndarray:
+    """Return the share of seconds with flow per trace and hour of the week.
+
+    The traces start on a Monday at midnight, NaN for hours not covered.
+    """
+    count, length = flows.shape
+    hours = -(-length // 3600)
+    padded = np.zeros((count, hours * 3600), dtype=bool)
+    padded[:, :length] = flows > 0
+    active = padded.reshape(count, hours, 3600).sum(axis=2)
+    observed = np.full(hours, 3600)
+    observed[-1] = length - (hours - 1) * 3600
+    slot = np.arange(hours) % _HOURS_PER_WEEK
+    totals = np.zeros((count, _HOURS_PER_WEEK))
+    seen = np.zeros(_HOURS_PER_WEEK)
+    np.add.at(totals, (slice(None), slot), active)
+    np.add.at(seen, slot, observed)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(seen > 0, totals / seen, np.nan)
+
+
+def simulate(policy: VectorPolicy, flows: np.ndarray) -> np.ndarray:
+    """Run the policy on all traces, return which seconds were polled."""
+    count, length = flows.shape
+    polls = np.zeros((count, length), dtype=bool)
+    interval = policy.initial(count)
+    # Every trace starts with a poll, like the first refresh of a setup
+    now = np.zeros(count, dtype=np.int64)
+    rows = np.arange(count)
+    while len(rows):
+        polls[rows, now[rows]] = True
+        observed = flows[rows, now[rows]]
+        interval[rows] = policy.next_interval(interval[rows], observed, now[rows], rows)
+        now[rows] += interval[rows]
+        rows = rows[now[rows] < length]
+    return polls
+
+
+def simulate_reference(flow: np.ndarray) -> np.ndarray:
+    """Run the ClassicPolicy of the integration on one trace, poll by poll."""
+    policy = ClassicPolicy()
+    polls = np.zeros(len(flow), dtype=bool)
+    interval = timedelta(seconds=UPDATE_INTERVAL_MAX)
+    now = 0
+    start = datetime(2024, 1, 1)
+    while now < len(flow):
+        polls[now] = True
+        interval = policy.next_interval(
+            interval, int(flow[now]), start + timedelta(seconds=now)
+        )
+        now += int(interval.total_seconds())
+    return polls
+
+
+@dataclass
+class Score:
+    """What a policy cost and missed, summed over all traces."""
+
+    policy: str
+    seconds: float
+    requests: int
+    peak_per_minute: int
+    draws: int
+    missed_draws: int
+    missed_litres: float
+    flow_error_litres: float
+    start_latency: np.ndarray
+    stop_latency: np.ndarray
+
+    @classmethod
+    def combine(cls, scores: list["Score"]) -> "Score":
+        """Return the score of all traces of the scores."""
+        return cls(
+            policy=scores[0].policy,
+            seconds=sum(s.seconds for s in scores),
+            requests=sum(s.requests for s in scores),
+            peak_per_minute=max(s.peak_per_minute for s in scores),
+            draws=sum(s.draws for s in scores),
+            missed_draws=sum(s.missed_draws for s in scores),
+            missed_litres=sum(s.missed_litres for s in scores),
+            flow_error_litres=sum(s.flow_error_litres for s in scores),
+            start_latency=np.concatenate([s.start_latency for s in scores]),
+            stop_latency=np.concatenate([s.stop_latency for s in scores]),
+        )
+
+    def as_row(self) -> dict[str, float | str]:
+        """Return the figures per hour and day of trace."""
+        hours = self.seconds / 3600
+        days = self.seconds / _DAY
+        return {
+            "policy": self.policy,
+            "requests/h": round(self.requests / hours, 1),
+            "peak/min": self.peak_per_minute,
+            "missed draws %": round(100 * self.missed_draws / max(1, self.draws), 2),
+            "missed l/day": round(self.missed_litres / days, 2),
+            "flow error l/day": round(self.flow_error_litres / days, 2),
+            "start latency s": _summary(self.start_latency),
+            "stop latency s": _summary(self.stop_latency),
+        }
+
+
+def _summary(values: np.ndarray) -> str:
+    if not len(values):
+        return "-"
+    return f"{values.mean():.1f} (p95 {np.percentile(values, 95):.0f})"
+
+
+def score(name: str, flows: np.ndarray, polls: np.ndarray) -> Score:
+    """Score the polls of all traces against their flows."""
+    count, length = flows.shape
+    index = np.broadcast_to(np.arange(length, dtype=np.int32), (count, length))
+    # Next poll at or after every second, length if there is none
+    next_poll = np.where(polls, index, length)
+    next_poll = np.minimum.accumulate(next_poll[:, ::-1], axis=1)[:, ::-1]
+    next_poll = np.concatenate([next_poll, np.full((count, 1), length)], axis=1)
+    # Flow the integration shows, held from the last poll
+    last_poll = np.maximum.accumulate(np.where(polls, index, -1), axis=1)
+    held = np.where(
+        last_poll >= 0, np.take_along_axis(flows, np.maximum(last_poll, 0), 1), 0
+    )
+    flow_error = np.abs(flows - held).sum() / 3600
+
+    # Draws are the runs of seconds with flow, starts and ends pair up
+    active = np.pad(flows > 0, ((0, 0), (1, 1)))
+    edges = np.diff(active.astype(np.int8), axis=1)
+    start_rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    litres = np.pad(np.cumsum(flows, axis=1) / 3600, ((0, 0), (1, 0)))
+    draw_litres = litres[start_rows, ends] - litres[start_rows, starts]
+    first_seen = next_poll[start_rows, starts]
+    seen = first_seen < ends
+    stop_seen = next_poll[start_rows, ends]
+
+    counts = np.pad(np.cumsum(polls, axis=1), ((0, 0), (1, 0)))
+    window = min(60, length)
+    peak = int((counts[:, window:] - counts[:, :-window]).max()) if length else 0
+    return Score(
+        policy=name,
+        seconds=float(count * length),
+        requests=int(polls.sum()),
+        peak_per_minute=peak,
+        draws=len(starts),
+        missed_draws=int((~seen).sum()),
+        missed_litres=float(draw_litres[~seen].sum()),
+        flow_error_litres=float(flow_error),
+        start_latency=(first_seen - starts)[seen],
+        stop_latency=(stop_seen - ends)[(stop_seen < length) & seen],
+    )
+
+
+def evaluate(policy: VectorPolicy, flows: np.ndarray, chunk: int = 8) -> Score:
+    """Simulate and score the policy, a few traces at a time to bound memory."""
+    scores = []
+    for start in range(0, len(flows), chunk):
+        rows = slice(start, start + chunk)
+        polls = simulate(policy.subset(rows), flows[rows])
+        scores.append(score(policy.name, flows[rows], polls))
+    return Score.combine(scores)
+
+
+def synthetic_flows(count: int, days: int, seed: int = 0) -> np.ndarray:
+    """Return households drawing water mostly in the morning and evening.
+
+    Draws arrive as a Poisson process following a daily profile, last a log
+    normal number of seconds (median 20) at 300 to 1200 l/h.
+    """
+    rng = np.random.default_rng(seed)
+    length = days * _DAY
+    hour_of_day = np.arange(24)
+    profile = (
+        0.2
+        + 6 * np.exp(-((hour_of_day - 7) ** 2) / 2)
+        + 4 * np.exp(-((hour_of_day - 19) ** 2) / 4)
+    )
+    # About 60 draws per day and household
+    rate = profile / profile.sum() * 60 / 3600
+    rate_per_second = np.repeat(np.tile(rate, days), 3600)
+    flows = np.zeros((count, length), dtype=np.float32)
+    starts = rng.random((count, length), dtype=np.float32) < rate_per_second
+    rows, begins = np.nonzero(starts)
+    durations = np.maximum(1, rng.lognormal(np.log(20), 1.0, len(begins))).astype(int)
+    values = rng.integers(300, 1200, len(begins))
+    # Later draws overwrite overlapping earlier ones
+    for offset in range(int(durations.max(initial=0))):
+        running = durations > offset
+        positions = begins[running] + offset
+        inside = positions < length
+        flows[rows[running][inside], positions[inside]] = values[running][inside]
+    return flows
+
+
+def load_traces(paths: Iterable[str], journal: bool = False) -> np.ndarray:
+    """Return recorded traces sampled every second, padded to the longest."""
+    traces = [
+        Trace.from_register_export(path) if journal else Trace.from_csv(path)
+        for path in paths
+    ]
+    length = int(max(trace.duration for trace in traces)) + 1
+    grid = np.arange(length)
+    flows = np.zeros((len(traces), length), dtype=np.float32)
+    for row, trace in enumerate(traces):
+        if not trace.times:
+            continue
+        index = np.searchsorted(trace.times, grid, side="right") - 1
+        flows[row] = np.where(index >= 0, np.asarray(trace.flows)[index], 0.0)
+        flows[row, int(trace.duration) + 1 :] = 0.0
+    return flows
+
+
+def _ints(value: str) -> list[int]:
+    return [int(v) for v in value.split(",") if v]
+
+
+def _floats(value: str) -> list[float]:
+    return [float(v) for v in value.split(",") if v]
+
+
+def policies_of(args: argparse.Namespace, flows: np.ndarray) -> list[VectorPolicy]:
+    """Return the grid of policies selected by the arguments."""
+    policies: list[VectorPolicy] = [FixedPolicy(i) for i in args.fixed]
+    policies += [DoublingPolicy(UPDATE_INTERVAL_MIN, m) for m in args.doubling_max]
+    if args.learned:
+        probabilities = usage_probabilities(flows)
+        policies += [
+            LearnedVectorPolicy(probabilities, likely, idle_max=idle_max)
+            for likely in args.likely_interval
+            for idle_max in args.idle_max
+        ]
+    return policies
+
+
+def main() -> None:
+    """Parse the arguments, evaluate the policies and print a table."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--trace", action="append", help="recorded trace csv")
+    parser.add_argument(
+        "--journal", action="store_true", help="traces are register journal exports"
+    )
+    parser.add_argument("--traces", type=int, default=50, help="synthetic traces")
+    parser.add_argument("--days", type=int, default=7, help="days per synthetic trace")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fixed", type=_ints, default=[5, 10, 30], help="seconds")
+    parser.add_argument(
+        "--doubling-max", type=_ints, default=[UPDATE_INTERVAL_MAX], help="seconds"
+    )
+    parser.add_argument("--learned", action="store_true", help="add the learned policy")
+    parser.add_argument(
+        "--likely-interval", type=_floats, default=[_LIKELY_INTERVAL], help="seconds"
+    )
+    parser.add_argument("--idle-max", type=_ints, default=[_IDLE_INTERVAL_MAX])
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="compare the vectorized classic policy with the one of the integration",
+    )
+    args = parser.parse_args()
+
+    if args.trace:
+        flows = load_traces(args.trace, args.journal)
+    else:
+        flows = synthetic_flows(args.traces, args.days, args.seed)
+
+    if args.check:
+        polls = simulate(DoublingPolicy(), flows[:1])
+        if not np.array_equal(polls[0], simulate_reference(flows[0])):
+            raise SystemExit("The vectorized classic policy differs")
+        print("The vectorized classic policy matches the integration")
+
+    rows = []
+    for policy in policies_of(args, flows):
+        started = time.perf_counter()
+        row = evaluate(policy, flows).as_row()
+        row["sim s"] = round(time.perf_counter() - started, 2)
+        rows.append(row)
+
+    widths = {key: max(len(key), *(len(str(r[key])) for r in rows)) for key in rows[0]}
+    print("  ".join(key.ljust(width) for key, width in widths.items()))
+    for row in rows:
+        print("  ".join(str(row[key]).ljust(width) for key, width in widths.items()))
+
+
+if __name__ == "__main__":
+    main()
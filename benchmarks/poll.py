@@ -0,0 +1,278 @@
+"""Cost of a poll, from the request to the entity states, and how it scales.
+
+Sets up 1 to N config entries of the integration in a test instance of HA,
+all of them polling devices emulated by the stand-in server, and drives the
+polls itself instead of the scheduler. Run from the repository root:
+
+    python -m benchmarks.poll --model local,silk --entries 1,10,50,100,200
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import tempfile
+import time
+import timeit
+import tracemalloc
+from typing import Any
+
+import aiohttp
+from bwt_api.bwt import BwtModel
+from pytest_homeassistant_custom_component.common import (
+    MockConfigEntry,
+    async_test_home_assistant,
+)
+
+from custom_components.bwt_perla.const import (
+    CONF_COLUMNS,
+    CONF_FIRMWARE,
+    CONF_MODEL,
+    DATA_TRANSPORT,
+    DOMAIN,
+)
+from custom_components.bwt_perla.coordinator import BwtCoordinator
+from custom_components.bwt_perla.data.local import LocalApiData
+from custom_components.bwt_perla.data.silk import SilkApiData, register_ranges
+from custom_components.bwt_perla.scheduler import async_get_scheduler
+from custom_components.bwt_perla.stats import PollStats
+from custom_components.bwt_perla.transport import (
+    BwtTransport,
+    PooledBwtApi,
+    PooledBwtSilkApi,
+)
+from homeassistant import loader
+from homeassistant.const import CONF_CODE, CONF_HOST
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import recorder as recorder_helper
+from homeassistant.setup import async_setup_component
+
+from .standin import CODE, LOCAL_FIRMWARE, StandinDevice, StandinServer
+
+_MODELS = {"local": BwtModel.PERLA_LOCAL_API, "silk": BwtModel.PERLA_SILK}
+_DECODE_NUMBER = 2000
+
+
+def _entry_data(model: BwtModel, host: str) -> dict[str, Any]:
+    if model == BwtModel.PERLA_LOCAL_API:
+        return {
+            CONF_HOST: host,
+            CONF_CODE: CODE,
+            CONF_MODEL: model.value,
+            CONF_FIRMWARE: LOCAL_FIRMWARE,
+            CONF_COLUMNS: 2,
+        }
+    return {CONF_HOST: host, CONF_MODEL: model.value}
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 3)
+
+
+async def bench_decode(server: StandinServer, session, model: BwtModel) -> dict:
+    """Time the decoders on a response of the stand-in, full and fast path."""
+    host = f"decode-{model.name.lower()}"
+    server.add_device(host, StandinDevice(model))
+    transport = BwtTransport(session)
+    if model == BwtModel.PERLA_LOCAL_API:
+        response = await PooledBwtApi(transport, host, CODE).get_current_data()
+        variants = {
+            "full": lambda: LocalApiData(response).snapshot(),
+        }
+        previous = variants["full"]()
+        variants["fast"] = lambda: LocalApiData(response).snapshot(previous)
+    else:
+        registers = await PooledBwtSilkApi(transport, host).get_registers()
+        ranges = register_ranges(("current_flow", "total_output"))
+        variants = {
+            "full": lambda: SilkApiData(registers).snapshot(),
+            "ranges": lambda: SilkApiData(registers, ranges).snapshot(),
+        }
+        previous = variants["full"]()
+        variants["fast"] = lambda: SilkApiData(registers).snapshot(previous)
+    return {
+        name: round(
+            min(timeit.repeat(decode, number=_DECODE_NUMBER, repeat=5))
+            / _DECODE_NUMBER
+            * 1e6,
+            2,
+        )
+        for name, decode in variants.items()
+    }
+
+
+async def _async_add_entries(
+    hass: HomeAssistant, server: StandinServer, model: BwtModel, count: int
+) -> list[BwtCoordinator]:
+    coordinators = []
+    for index in range(count):
+        host = f"{model.name.lower()}-{index}"
+        server.add_device(host, StandinDevice(model, index))
+        entry = MockConfigEntry(
+            domain=DOMAIN,
+            version=2,
+            minor_version=2,
+            title=host,
+            data=_entry_data(model, host),
+        )
+        entry.add_to_hass(hass)
+        if not await hass.config_entries.async_setup(entry.entry_id):
+            raise RuntimeError(f"Setup of {host} failed")
+        coordinators.append(hass.data[DOMAIN][entry.entry_id])
+    await hass.async_block_till_done()
+    return coordinators
+
+
+async def _async_poll_round(
+    hass: HomeAssistant, coordinators: list[BwtCoordinator], slow: bool
+) -> float:
+    """Poll every device once, return the wall time of the round."""
+    if slow:
+        for coordinator in coordinators:
+            coordinator._slow_due = 0.0
+    started = time.perf_counter()
+    await asyncio.gather(*(c.async_refresh() for c in coordinators))
+    elapsed = time.perf_counter() - started
+    # Lets the recorder pick up the state changes outside of the timing
+    await hass.async_block_till_done()
+    return elapsed
+
+
+async def bench_scaling(
+    model: BwtModel, entries: int, polls: int, slow: bool
+) -> dict[str, Any]:
+    """Set up entries devices of a model and poll all of them polls times."""
+    with tempfile.TemporaryDirectory() as directory:
+        return await _async_bench_scaling(
+            f"sqlite:///{directory}/home-assistant_v2.db", model, entries, polls, slow
+        )
+
+
+async def _async_bench_scaling(
+    db_url: str, model: BwtModel, entries: int, polls: int, slow: bool
+) -> dict[str, Any]:
+    async with async_test_home_assistant() as hass:
+        # What the enable_custom_integrations fixture does
+        hass.data.pop(loader.DATA_CUSTOM_COMPONENTS, None)
+        # What bootstrap does before setting up the recorder, which refuses
+        # an in-memory database
+        recorder_helper.async_initialize_recorder(hass)
+        if not await async_setup_component(
+            hass, "recorder", {"recorder": {"db_url": db_url}}
+        ):
+            raise RuntimeError("Setup of the recorder failed")
+        server = StandinServer()
+        await server.start()
+        session = aiohttp.ClientSession()
+        hass.data.setdefault(DOMAIN, {})[DATA_TRANSPORT] = BwtTransport(
+            server.session(session)
+        )
+        try:
+            tracemalloc.start()
+            before = tracemalloc.get_traced_memory()[0]
+            started = time.perf_counter()
+            coordinators = await _async_add_entries(hass, server, model, entries)
+            setup = time.perf_counter() - started
+            memory_per_device = (tracemalloc.get_traced_memory()[0] - before) / entries
+            tracemalloc.stop()
+            # The benchmark drives the polls itself
+            async_get_scheduler(hass).async_shutdown()
+            for coordinator in coordinators:
+                coordinator.stats = PollStats()
+                coordinator.state_writes = 0
+
+            rounds = [
+                await _async_poll_round(hass, coordinators, slow) for _ in range(polls)
+            ]
+            state_writes = sum(c.state_writes for c in coordinators)
+            request = _mean([c.stats.request for c in coordinators])
+            decode = _mean([c.stats.decode for c in coordinators])
+            fan_out = _mean([c.stats.fan_out for c in coordinators])
+
+            # Allocations are traced separately, tracing slows everything down
+            tracemalloc.start()
+            peaks = []
+            for _ in range(min(polls, 5)):
+                base = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+                await _async_poll_round(hass, coordinators, slow)
+                peaks.append((tracemalloc.get_traced_memory()[1] - base) / entries)
+            tracemalloc.stop()
+
+            return {
+                "model": model.name,
+                "entries": entries,
+                "polls": polls,
+                "tier": "slow" if slow else "mixed",
+                "setup_ms": _ms(setup),
+                "round_ms": _ms(statistics.median(rounds)),
+                "request_ms": _ms(request),
+                "decode_us": round(decode * 1e6, 1),
+                "fan_out_us": round(fan_out * 1e6, 1),
+                "state_writes_per_poll": round(state_writes / entries / polls, 2),
+                "peak_bytes_per_poll": int(statistics.median(peaks)),
+                "memory_per_device": int(memory_per_device),
+                "requests": sum(d.requests for d in server.devices.values()),
+            }
+        finally:
+            # Stops the recorder thread and the tasks still using the session
+            await hass.async_stop(force=True)
+            await session.close()
+            await server.stop()
+
+
+def _mean(histograms) -> float:
+    count = sum(h.count for h in histograms)
+    return sum(h.total for h in histograms) / count if count else 0.0
+
+
+async def async_main(args: argparse.Namespace) -> list[dict[str, Any]]:
+    """Run the decode and the scaling benchmarks."""
+    results = []
+    server = StandinServer()
+    await server.start()
+    async with aiohttp.ClientSession() as client:
+        session = server.session(client)
+        for name in args.model:
+            decode = await bench_decode(server, session, _MODELS[name])
+            print(f"decode {name} [us]: {decode}")
+            results.append({"model": _MODELS[name].name, "decode_us": decode})
+    await server.stop()
+
+    for name in args.model:
+        for entries in args.entries:
+            result = await bench_scaling(_MODELS[name], entries, args.polls, args.slow)
+            print(" ".join(f"{key}={value}" for key, value in result.items()))
+            results.append(result)
+    return results
+
+
+def main() -> None:
+    """Parse the arguments and run the benchmarks."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--model",
+        type=lambda value: value.split(","),
+        default=list(_MODELS),
+        help="comma separated models: local, silk",
+    )
+    parser.add_argument(
+        "--entries",
+        type=lambda value: [int(v) for v in value.split(",")],
+        default=[1, 10, 50, 100, 200],
+        help="comma separated numbers of config entries",
+    )
+    parser.add_argument("--polls", type=int, default=20, help="polls per device")
+    parser.add_argument(
+        "--slow", action="store_true", help="decode everything on every poll"
+    )
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+    results = asyncio.run(async_main(args))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
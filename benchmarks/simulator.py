@@ -0,0 +1,260 @@
+"""Replay recorded traces of flow, regenerations and errors as emulated devices.
+
+A trace is a csv file with the columns seconds, flow in l/h and an optional
+event, one of regeneration:<column>, error:<id>, clear:<id> and
+holiday:<0|1>. The csv export of the Silk register journal can be replayed as
+well. Traces are replayed at real or accelerated speed, through the same http
+surface BwtApi and BwtSilkApi talk to, with latency and faults per host.
+
+From a test or a benchmark, next to StandinServer:
+
+    device = TraceDevice(BwtModel.PERLA_LOCAL_API, Trace.from_csv(path), speed=60)
+    device.faults = Faults(latency=0.2, timeout_rate=0.05)
+    server.add_device("perla-1", device)
+
+As a standalone process, each device listens on its own loopback address
+and the default port of its model, so it can be added to HA by that address:
+
+    python -m benchmarks.simulator --device 127.0.0.2=local:trace.csv \\
+        --faults 127.0.0.2=latency=0.3,timeout_rate=0.1 --speed 60
+"""
+
+import argparse
+import asyncio
+from bisect import bisect_right
+import csv
+from dataclasses import dataclass, fields
+from datetime import datetime
+from itertools import accumulate
+import time
+
+from bwt_api.bwt import BwtModel
+
+from .standin import CODE, Faults, StandinDevice, StandinServer
+
+_MODELS = {"local": BwtModel.PERLA_LOCAL_API, "silk": BwtModel.PERLA_SILK}
+_PORTS = {BwtModel.PERLA_LOCAL_API: 8080, BwtModel.PERLA_SILK: 80}
+# Silk registers of the flow in l/min and of the regeneration count
+_FLOW_REGISTER = 16
+_REGENERATION_REGISTER = 19
+
+
+@dataclass
+class Trace:
+    """Flow samples and events of a trace, seconds from its start."""
+
+    times: list[float]
+    flows: list[float]
+    events: list[tuple[float, str]]
+
+    def __post_init__(self) -> None:
+        """Integrate the flow once, the total is looked up for every request."""
+        steps = (
+            flow * (end - start) / 3600
+            for start, end, flow in zip(self.times, self.times[1:], self.flows)
+        )
+        self._totals = [0.0, *accumulate(steps)]
+
+    @property
+    def duration(self) -> float:
+        """Return the seconds from the first to the last sample or event."""
+        last_event = self.events[-1][0] if self.events else 0.0
+        return max(self.times[-1] if self.times else 0.0, last_event)
+
+    def flow(self, seconds: float) -> float:
+        """Return the flow at the time, the samples are held until the next."""
+        index = bisect_right(self.times, seconds) - 1
+        return self.flows[index] if index >= 0 else 0.0
+
+    def total(self, seconds: float) -> float:
+        """Return the litres drawn from the start until the time."""
+        index = bisect_right(self.times, seconds) - 1
+        if index < 0:
+            return 0.0
+        return self._totals[index] + self.flows[index] * (
+            seconds - self.times[index]
+        ) / 3600
+
+    @classmethod
+    def from_csv(cls, path: str) -> "Trace":
+        """Read a trace of seconds, flow and optional event."""
+        times: list[float] = []
+        flows: list[float] = []
+        events: list[tuple[float, str]] = []
+        with open(path, newline="", encoding="utf-8") as file:
+            for row in csv.DictReader(file):
+                seconds = float(row["seconds"])
+                if row.get("flow"):
+                    times.append(seconds)
+                    flows.append(float(row["flow"]))
+                if row.get("event"):
+                    events.append((seconds, row["event"]))
+        return cls(times, flows, sorted(events))
+
+    @classmethod
+    def from_register_export(cls, path: str) -> "Trace":
+        """Read the csv export of the Silk register journal."""
+        times: list[float] = []
+        flows: list[float] = []
+        events: list[tuple[float, str]] = []
+        start = None
+        regenerations = None
+        with open(path, newline="", encoding="utf-8") as file:
+            for row in csv.DictReader(file):
+                moment = datetime.fromisoformat(row["timestamp"]).timestamp()
+                start = moment if start is None else start
+                seconds = moment - start
+                register = int(row["register"])
+                value = int(row["value"])
+                if register == _FLOW_REGISTER:
+                    times.append(seconds)
+                    flows.append(value * 60.0)
+                elif register == _REGENERATION_REGISTER:
+                    if regenerations is not None and value > regenerations:
+                        events.append((seconds, "regeneration:1"))
+                    regenerations = value
+        return cls(times, flows, events)
+
+
+class TraceDevice(StandinDevice):
+    """Device whose flow and events follow a trace."""
+
+    def __init__(
+        self,
+        model: BwtModel,
+        trace: Trace,
+        speed: float = 1.0,
+        loop: bool = True,
+        **kwargs,
+    ) -> None:
+        """Initialize the device at the start of the trace."""
+        super().__init__(model, **kwargs)
+        self.trace = trace
+        self.speed = speed
+        self.loop = loop
+        self._started = time.monotonic()
+        self._base_total = self.total
+        self._laps = 0
+        self._next_event = 0
+
+    def advance(self) -> None:
+        """Move to the current time of the trace."""
+        elapsed = (time.monotonic() - self._started) * self.speed
+        duration = self.trace.duration
+        if self.loop and duration > 0:
+            laps, elapsed = divmod(elapsed, duration)
+            while self._laps < laps:
+                # Finish the lap, the total keeps growing over the laps
+                self._apply_events(duration)
+                self._base_total += self.trace.total(duration)
+                self._next_event = 0
+                self._laps += 1
+        self._apply_events(elapsed)
+        self.flow = int(self.trace.flow(elapsed))
+        self.total = self._base_total + self.trace.total(elapsed)
+
+    def _apply_events(self, seconds: float) -> None:
+        events = self.trace.events
+        while self._next_event < len(events) and events[self._next_event][0] <= seconds:
+            self._apply(events[self._next_event][1])
+            self._next_event += 1
+
+    def _apply(self, event: str) -> None:
+        kind, _, value = event.partition(":")
+        if kind == "regeneration":
+            self.regenerate(int(value or 1), datetime.now())
+        elif kind == "error":
+            self.errors.add(int(value))
+        elif kind == "clear":
+            self.errors.discard(int(value))
+        elif kind == "holiday":
+            self.holiday_mode = int(value)
+        else:
+            raise ValueError(f"Unknown trace event: {event}")
+
+
+def parse_faults(value: str) -> tuple[str, Faults]:
+    """Parse host=name=value,... into the faults of that host."""
+    host, _, settings = value.partition("=")
+    types = {field.name: field.type for field in fields(Faults)}
+    faults = Faults()
+    for setting in filter(None, settings.split(",")):
+        name, _, raw = setting.partition("=")
+        if name not in types:
+            raise argparse.ArgumentTypeError(f"Unknown fault: {name}")
+        if types[name] in (bool, "bool"):
+            setattr(faults, name, raw.lower() in ("", "1", "true", "yes"))
+        else:
+            setattr(faults, name, float(raw))
+    return host, faults
+
+
+def _parse_device(value: str) -> tuple[str, BwtModel, str]:
+    host, _, rest = value.partition("=")
+    model, _, path = rest.partition(":")
+    if model not in _MODELS or not path:
+        raise argparse.ArgumentTypeError(
+            f"Expected <address>=<local|silk>:<trace.csv>, got {value}"
+        )
+    return host, _MODELS[model], path
+
+
+async def async_main(args: argparse.Namespace) -> None:
+    """Serve the devices until interrupted."""
+    server = StandinServer()
+    faults = dict(args.faults)
+    addresses = []
+    for host, model, path in args.device:
+        if args.journal:
+            trace = Trace.from_register_export(path)
+        else:
+            trace = Trace.from_csv(path)
+        device = TraceDevice(model, trace, args.speed, code=args.code)
+        device.faults = faults.get(host, Faults())
+        server.add_device(host, device)
+        port = args.local_port if model == BwtModel.PERLA_LOCAL_API else args.silk_port
+        addresses.append((host, port or _PORTS[model]))
+    await server.start(addresses)
+    print("Serving " + ", ".join(f"{host}:{port}" for host, port in addresses))
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+def main() -> None:
+    """Parse the arguments and run the simulator."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--device",
+        type=_parse_device,
+        action="append",
+        required=True,
+        help="<address>=<local|silk>:<trace.csv>, repeat for more devices",
+    )
+    parser.add_argument(
+        "--faults",
+        type=parse_faults,
+        action="append",
+        default=[],
+        help="<address>=latency=0.2,jitter=0.1,timeout_rate=0.05,hang=60,"
+        "partial_rate=0.01,error_rate=0.01,wrong_code",
+    )
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed")
+    parser.add_argument("--code", default=CODE, help="login code of the devices")
+    parser.add_argument(
+        "--journal",
+        action="store_true",
+        help="the traces are csv exports of the Silk register journal",
+    )
+    parser.add_argument("--local-port", type=int, help="instead of 8080")
+    parser.add_argument("--silk-port", type=int, help="instead of 80")
+    args = parser.parse_args()
+    try:
+        asyncio.run(async_main(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""Local stand-in for BWT devices, serving the local api and the Silk registers.
+
+One server emulates any number of devices. The device urls the apis build
+are rewritten by StandinSession, the host becomes the first path segment:
+
+    http://perla-1:8080/api/GetCurrentData
+    -> http://127.0.0.1:<port>/perla-1/api/GetCurrentData
+
+Without the host segment the device is looked up by the Host header, so a
+server listening on 127.0.0.2:8080 can also be added to a real HA.
+"""
+
+import asyncio
+import base64
+from dataclasses import dataclass
+from datetime import datetime
+import json
+import random
+import time
+from typing import Any
+
+from aiohttp import web
+import aiohttp
+from bwt_api.bwt import BwtModel
+from bwt_api.error import BwtError
+from yarl import URL
+
+LOCAL_FIRMWARE = "2.0201"
+CODE = "standin"
+# Registers the Silk has, see data/silk.py
+_SILK_REGISTER_COUNT = 48
+_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+@dataclass
+class Faults:
+    """Faults injected into the responses of one device."""
+
+    # Seconds added to every response, plus up to jitter seconds at random
+    latency: float = 0.0
+    jitter: float = 0.0
+    # Share of requests never answered within hang seconds
+    timeout_rate: float = 0.0
+    hang: float = 60.0
+    # Share of requests answered with a truncated body
+    partial_rate: float = 0.0
+    # Share of requests answered with a server error
+    error_rate: float = 0.0
+    # Answer the local api like a device with another login code
+    wrong_code: bool = False
+
+
+class StandinDevice:
+    """Values of one emulated device, water is drawn at random."""
+
+    def __init__(self, model: BwtModel, seed: int = 0, code: str = CODE) -> None:
+        """Initialize the device in a reproducible state."""
+        self.model = model
+        self.code = code
+        self.faults = Faults()
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._updated = time.monotonic()
+        self.flow = 0
+        self.total = 1000.0 + seed * 100
+        self.errors: set[int] = set()
+        self.regenerations = [310, 305]
+        self.last_regeneration = [
+            datetime(2024, 5, 1, 2, 0),
+            datetime(2024, 5, 2, 2, 0),
+        ]
+        self.holiday_mode = 0
+
+    def advance(self) -> None:
+        """Update the flow and the total since the last request."""
+        now = time.monotonic()
+        self.total += self.flow * (now - self._updated) / 3600
+        self._updated = now
+        if self._random.random() < 0.1:
+            # Start or stop a draw of water
+            self.flow = 0 if self.flow else self._random.randrange(300, 1200)
+
+    def regenerate(self, column: int, moment: datetime) -> None:
+        """Finish a regeneration of a column, starting at 1."""
+        self.regenerations[column - 1] += 1
+        self.last_regeneration[column - 1] = moment
+
+    def current_data(self) -> dict[str, Any]:
+        """Return the body of GetCurrentData."""
+        total = int(self.total)
+        errors = [BwtError(error) for error in sorted(self.errors)]
+        show_error = 0
+        if any(error.is_fatal() for error in errors):
+            show_error = 2
+        elif errors:
+            show_error = 1
+        return {
+            "ActiveErrorIDs": ",".join(str(error.value) for error in errors),
+            "BlendedWaterSinceSetup_l": total,
+            "CapacityColumn1_ml_dH": 1_200_000,
+            "CapacityColumn2_ml_dH": 1_350_000,
+            "CurrentFlowrate_l_h": self.flow,
+            "DosingSinceSetup_ml": 0,
+            "FirmwareVersion": LOCAL_FIRMWARE,
+            "HardnessIN_CaCO3": 357,
+            "HardnessIN_dH": 20,
+            "HardnessIN_fH": 36,
+            "HardnessIN_mmol_l": 3.57,
+            "HardnessOUT_CaCO3": 71,
+            "HardnessOUT_dH": 4,
+            "HardnessOUT_fH": 7,
+            "HardnessOUT_mmol_l": 0.71,
+            "HolidayModeStartTime": self.holiday_mode,
+            "LastRegenerationColumn1": self.last_regeneration[0].strftime(
+                _DATETIME_FORMAT
+            ),
+            "LastRegenerationColumn2": self.last_regeneration[1].strftime(
+                _DATETIME_FORMAT
+            ),
+            "LastServiceCustomer": "2024-01-10 10:00:00",
+            "LastServiceTechnican": "2023-06-01 09:30:00",
+            "OutOfService": 0,
+            "RegenerationCounterColumn1": self.regenerations[0],
+            "RegenerationCounterColumn2": self.regenerations[1],
+            "RegenerationCountSinceSetup": sum(self.regenerations),
+            "RegenerativLevel": 64,
+            "RegenerativRemainingDays": 41,
+            "RegenerativSinceSetup_g": 98_000,
+            "ShowError": show_error,
+            "WaterTreatedCurrentDay_l": total % 300,
+            "WaterTreatedCurrentMonth_l": total % 9000,
+            "WaterTreatedCurrentYear_l": total % 100_000,
+        }
+
+    def daily_data(self) -> dict[str, int]:
+        """Return the body of GetDailyData."""
+        return {
+            f"{m // 60:02}{m % 60:02}_{m // 60:02}{m % 60 + 29:02}_l": 5
+            for m in range(0, 1440, 30)
+        }
+
+    def monthly_data(self) -> dict[str, int]:
+        """Return the body of GetMonthlyData."""
+        return {f"Day{day:02}_l": 240 for day in range(1, 32)}
+
+    def yearly_data(self) -> dict[str, int]:
+        """Return the body of GetYearlyData."""
+        return {f"Month{month:02}_l": 7200 for month in range(1, 13)}
+
+    def registers(self) -> list[int]:
+        """Return the Silk register dump."""
+        registers = [0] * _SILK_REGISTER_COUNT
+        registers[4] = 340
+        registers[7] = self.last_regeneration[0].hour
+        registers[8] = self.last_regeneration[0].minute
+        registers[15] = int(self.total) // 100
+        registers[16] = self.flow // 60
+        registers[17] = 420
+        registers[18] = 310
+        registers[19] = self.regenerations[0]
+        registers[23] = 1500
+        registers[30] = 100
+        registers[31] = 64
+        registers[34] = 90
+        registers[42] = int(self.total) % 300
+        return registers
+
+
+class StandinServer:
+    """aiohttp server emulating the devices registered by their host."""
+
+    def __init__(self) -> None:
+        """Initialize the server without devices."""
+        self.devices: dict[str, StandinDevice] = {}
+        self.port: int | None = None
+        self._runner: web.AppRunner | None = None
+        self._random = random.Random()
+
+    def add_device(self, host: str, device: StandinDevice) -> None:
+        """Emulate a device under the host."""
+        self.devices[host] = device
+
+    async def start(
+        self, addresses: list[tuple[str, int]] | None = None
+    ) -> int:
+        """Start listening, by default on a free local port, return the port."""
+        app = web.Application()
+        for prefix in ("/{host}", ""):
+            app.router.add_get(f"{prefix}/api", self._handle_api_root)
+            app.router.add_get(f"{prefix}/api/{{endpoint}}", self._handle_api)
+            app.router.add_get(f"{prefix}/silk/registers", self._handle_registers)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        for host, port in addresses or [("127.0.0.1", 0)]:
+            await web.TCPSite(self._runner, host, port).start()
+        self.port = self._runner.addresses[0][1]
+        return self.port
+
+    async def stop(self) -> None:
+        """Stop the server."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def session(self, session: aiohttp.ClientSession) -> "StandinSession":
+        """Return a session sending the device requests to this server."""
+        return StandinSession(session, self.port)
+
+    def _device(self, request: web.Request, model: BwtModel) -> StandinDevice:
+        host = request.match_info.get("host", request.url.host)
+        device = self.devices.get(host)
+        if device is None or device.model != model:
+            raise web.HTTPNotFound(text="Not Found")
+        device.requests += 1
+        return device
+
+    async def _respond(self, device: StandinDevice, body: Any) -> web.Response:
+        """Answer with the json body, after injecting the faults of the device."""
+        faults = device.faults
+        delay = faults.latency + self._random.uniform(0, faults.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+        roll = self._random.random()
+        if roll < faults.timeout_rate:
+            await asyncio.sleep(faults.hang)
+        roll -= faults.timeout_rate
+        if 0 <= roll < faults.error_rate:
+            return web.Response(status=500, text="Internal Server Error")
+        roll -= faults.error_rate
+        text = json.dumps(body)
+        if 0 <= roll < faults.partial_rate:
+            text = text[: len(text) // 2]
+        return web.Response(text=text, content_type="application/json")
+
+    async def _handle_api_root(self, request: web.Request) -> web.Response:
+        # What the model detection expects from a local api
+        self._device(request, BwtModel.PERLA_LOCAL_API)
+        return web.Response(status=404, text="Not Found")
+
+    async def _handle_api(self, request: web.Request) -> web.Response:
+        device = self._device(request, BwtModel.PERLA_LOCAL_API)
+        expected = base64.b64encode(f"user:{device.code}".encode()).decode()
+        if (
+            device.faults.wrong_code
+            or request.headers.get("Authorization") != f"Basic {expected}"
+        ):
+            # The device answers a wrong code with an empty 404
+            return web.Response(status=404, text="")
+        endpoint = request.match_info["endpoint"]
+        if endpoint == "GetCurrentData":
+            device.advance()
+            return await self._respond(device, device.current_data())
+        if endpoint == "GetDailyData":
+            return await self._respond(device, device.daily_data())
+        if endpoint == "GetMonthlyData":
+            return await self._respond(device, device.monthly_data())
+        if endpoint == "GetYearlyData":
+            return await self._respond(device, device.yearly_data())
+        return web.Response(status=404, text="Not Found")
+
+    async def _handle_registers(self, request: web.Request) -> web.Response:
+        device = self._device(request, BwtModel.PERLA_SILK)
+        device.advance()
+        return await self._respond(device, {"params": device.registers()})
+
+
+class StandinSession:
+    """Client session rewriting device urls to the stand-in server.
+
+    Used in place of the shared HA session below BwtTransport, so the apis
+    and the transport run unchanged.
+    """
+
+    def __init__(self, session: aiohttp.ClientSession, port: int) -> None:
+        """Initialize the session."""
+        self._session = session
+        self._port = port
+
+    def rewrite(self, url: str) -> URL:
+        """Return the url of the request on the stand-in server."""
+        device_url = URL(url)
+        return URL.build(
+            scheme="http",
+            host="127.0.0.1",
+            port=self._port,
+            path=f"/{device_url.host}{device_url.path}",
+        )
+
+    def get(self, url: str, **kwargs: Any):
+        """Start a GET request on the stand-in server."""
+        return self._session.get(self.rewrite(url), **kwargs)
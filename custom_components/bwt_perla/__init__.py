@@ -2,53 +2,151 @@
 
 import logging
 
-from bwt_api.api import BwtApi, BwtSilkApi
-from bwt_api.exception import BwtException
+import voluptuous as vol
+
+from bwt_api.bwt import BwtModel
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import Platform, CONF_CODE, CONF_HOST
-from homeassistant.core import HomeAssistant, callback
+from homeassistant.const import (
+    EVENT_HOMEASSISTANT_STOP,
+    Platform,
+    CONF_CODE,
+    CONF_HOST,
+)
+from homeassistant.core import Event, HomeAssistant, callback
 from homeassistant.exceptions import ConfigEntryNotReady
 from homeassistant.helpers.entity_registry import async_migrate_entries
-
-from .const import DOMAIN
+from homeassistant.helpers.typing import ConfigType
+
+from .backfill import async_schedule_backfill
+from .const import (
+    CONF_MAX_CONCURRENT_POLLS,
+    CONF_MODEL,
+    CONF_REGISTER_JOURNAL,
+    DATA_SCHEDULER,
+    DOMAIN,
+)
+from .coordinator import (
+    BwtCoordinator,
+    async_remove_snapshot,
+    async_take_over_snapshot,
+)
+from .journal import RegisterJournal, async_remove_journal
+from .polling import async_remove_usage, create_policy
+from .scheduler import DEFAULT_MAX_IN_FLIGHT, BwtPollScheduler, async_get_scheduler
+from .services import async_setup_services
+from .triggers import async_listen_fast_poll_event, async_track_fast_poll_entities
+from .transport import PooledBwtApi, PooledBwtSilkApi, async_get_transport
 
 _LOGGER = logging.getLogger(__name__)
 PLATFORMS: list[Platform] = [Platform.SENSOR]
 
+CONFIG_SCHEMA = vol.Schema(
+    {
+        DOMAIN: vol.Schema(
+            {
+                vol.Optional(
+                    CONF_MAX_CONCURRENT_POLLS, default=DEFAULT_MAX_IN_FLIGHT
+                ): vol.All(vol.Coerce(int), vol.Range(min=1)),
+            }
+        )
+    },
+    extra=vol.ALLOW_EXTRA,
+)
+
+
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    """Set up the parts shared by all BWT Perla devices."""
+    conf = config.get(DOMAIN, {})
+    scheduler = hass.data.setdefault(DOMAIN, {})[DATA_SCHEDULER] = BwtPollScheduler(
+        hass, conf.get(CONF_MAX_CONCURRENT_POLLS, DEFAULT_MAX_IN_FLIGHT)
+    )
+    async_setup_services(hass)
+    unsub_fast_poll = async_listen_fast_poll_event(hass)
+
+    @callback
+    def async_stop(_event: Event) -> None:
+        """Stop the parts shared by all devices."""
+        unsub_fast_poll()
+        scheduler.async_shutdown()
+
+    hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, async_stop)
+    return True
+
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up BWT Perla from a config entry."""
 
     hass.data.setdefault(DOMAIN, {})
-    try:
-        if CONF_CODE in entry.data:
-            api = BwtApi(entry.data["host"], entry.data["code"])
-            await api.get_current_data()
-        else:
-            api = BwtSilkApi(entry.data["host"])
-            await api.get_registers()
-    except BwtException as e:
-        _LOGGER.exception("Error setting up Bwt API")
-        await api.close()
-        raise ConfigEntryNotReady from e
-
-    hass.data[DOMAIN][entry.entry_id] = api
+    transport = async_get_transport(hass)
+    journal = None
+    model = BwtModel(entry.data[CONF_MODEL])
+    if model == BwtModel.PERLA_LOCAL_API:
+        api = PooledBwtApi(transport, entry.data[CONF_HOST], entry.data[CONF_CODE])
+    else:
+        api = PooledBwtSilkApi(transport, entry.data[CONF_HOST])
+        if entry.options.get(CONF_REGISTER_JOURNAL, False):
+            journal = RegisterJournal(hass, entry.entry_id)
+
+    policy = create_policy(hass, entry)
+    await policy.async_load()
+    entry.async_on_unload(policy.async_unload)
+    coordinator = BwtCoordinator(hass, entry, api, model, policy, journal)
+
+    # The config flow hands over the data it just fetched. Otherwise the
+    # entities are created from the snapshot of the last run without waiting
+    # for the device and the first poll runs in the background.
+    first_poll = None
+    if (snapshot := async_take_over_snapshot(hass, entry.data[CONF_HOST])) is not None:
+        coordinator.async_seed(snapshot)
+    elif await coordinator.async_restore():
+        first_poll = 0.0
+    else:
+        try:
+            await coordinator.async_config_entry_first_refresh()
+        except ConfigEntryNotReady:
+            _LOGGER.exception("Error setting up Bwt API")
+            await coordinator.async_shutdown()
+            raise
+
+    hass.data[DOMAIN][entry.entry_id] = coordinator
+    entry.async_on_unload(
+        async_get_scheduler(hass).async_register(
+            entry.entry_id, coordinator, first_poll
+        )
+    )
+
+    if (unsub := async_track_fast_poll_entities(hass, entry)) is not None:
+        entry.async_on_unload(unsub)
+    entry.async_on_unload(async_schedule_backfill(hass, entry, coordinator))
 
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    entry.async_on_unload(entry.add_update_listener(_async_update_listener))
 
     return True
 
 
+async def _async_update_listener(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Reload the entry when the options change."""
+    await hass.config_entries.async_reload(entry.entry_id)
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     if unload_ok := await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
-        api = hass.data[DOMAIN].pop(entry.entry_id)
-        await api.close()
+        coordinator = hass.data[DOMAIN].pop(entry.entry_id)
+        await coordinator.async_shutdown()
 
     return unload_ok
 
 
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the stored data of a deleted entry."""
+    await async_remove_usage(hass, entry.entry_id)
+    await async_remove_snapshot(hass, entry.entry_id)
+    await async_remove_journal(hass, entry.entry_id)
+
+
 async def async_migrate_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Migrate old entry."""
     _LOGGER.debug("Migrating from version %s", entry.version)
@@ -62,7 +160,16 @@ async def async_migrate_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
             return {"new_unique_id": entry.entry_id + "_" + entity_entry.unique_id}
 
         await async_migrate_entries(hass, entry.entry_id, update_unique_id)
-        entry.version = 2
+        hass.config_entries.async_update_entry(entry, version=2)
+
+    # Store the model, firmware and columns are added by the first poll
+    if entry.version == 2 and entry.minor_version < 2:
+        model = (
+            BwtModel.PERLA_LOCAL_API if CONF_CODE in entry.data else BwtModel.PERLA_SILK
+        )
+        hass.config_entries.async_update_entry(
+            entry, data={**entry.data, CONF_MODEL: model.value}, minor_version=2
+        )
 
     _LOGGER.info("Migration to version %s successful", entry.version)
 
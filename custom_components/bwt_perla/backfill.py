@@ -0,0 +1,241 @@
+"""Hourly water statistics, reconstructed from the device counters.
+
+Missing hours are imported in one batch with async_add_external_statistics,
+so the gap after a downtime of HA is filled with a single call. The local
+api knows the treated water of every half hour of the current day, and of
+every day of the current month, which is written into the last hour of the
+day. The rest of the total output, and all of it for the Silk, cannot be
+assigned to an hour and is written into the last imported hour at once.
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+import logging
+from typing import TYPE_CHECKING, Any
+
+import aiohttp
+from bwt_api.bwt import BwtModel
+from bwt_api.exception import BwtException
+
+from homeassistant.components.recorder import get_instance
+from homeassistant.components.recorder.models import StatisticData, StatisticMetaData
+from homeassistant.components.recorder.statistics import (
+    async_add_external_statistics,
+    get_last_statistics,
+)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import UnitOfVolume
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_change
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN
+from .data.local import blended_factor_of
+
+if TYPE_CHECKING:
+    from .coordinator import BwtCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+_HOUR = timedelta(hours=1)
+_HISTORY_TIMEOUT = 10
+
+
+def statistic_id(entry_id: str) -> str:
+    """Return the id of the water statistic of a config entry."""
+    return f"{DOMAIN}:water_{entry_id.lower()}"
+
+
+class StatisticsBackfill:
+    """Keeps the external water statistic of one device complete."""
+
+    def __init__(self, hass: HomeAssistant, coordinator: "BwtCoordinator") -> None:
+        """Initialize the backfill."""
+        self._hass = hass
+        self._coordinator = coordinator
+        self.statistic_id = statistic_id(coordinator.config_entry.entry_id)
+        self._lock = asyncio.Lock()
+
+    async def async_backfill(self) -> int:
+        """Import the complete hours missing in the statistic.
+
+        Returns the number of imported hours.
+        """
+        async with self._lock:
+            return await self._async_backfill()
+
+    async def _async_backfill(self) -> int:
+        coordinator = self._coordinator
+        data = coordinator.data
+        if data is None or coordinator.stale or not coordinator.last_update_success:
+            # Only a live total can be compared with the statistic
+            return 0
+        total = coordinator.flow.total
+        if total is None:
+            total = data.total_output
+        local = coordinator.model == BwtModel.PERLA_LOCAL_API
+        now = dt_util.now()
+        current_hour = dt_util.as_utc(now.replace(minute=0, second=0, microsecond=0))
+
+        last = await self._async_last_statistic()
+        if last is None:
+            if local:
+                start = dt_util.as_utc(dt_util.start_of_local_day(now).replace(day=1))
+            else:
+                start = current_hour - _HOUR
+            base_state = None
+            base_sum = 0.0
+        else:
+            start = dt_util.utc_from_timestamp(last["start"]) + _HOUR
+            base_state = last["state"]
+            base_sum = last["sum"] or 0.0
+
+        hours = []
+        hour = start
+        while hour < current_hour:
+            hours.append(hour)
+            hour += _HOUR
+        if not hours:
+            return 0
+
+        known: dict[datetime, float] = {}
+        partial = 0.0
+        if local:
+            known, partial = await self._async_history(now, hours[0])
+        known_total = sum(known.get(hour, 0.0) for hour in hours)
+        if base_state is None:
+            # Nothing to compare with, so the unknown hours stay empty
+            base_state = total - partial - known_total
+            remainder = 0.0
+        else:
+            # Also corrects the drift of earlier imports
+            remainder = max(0.0, total - partial - base_state - known_total)
+
+        rows = []
+        state = base_state
+        running_sum = base_sum
+        for hour in hours:
+            used = known.get(hour, 0.0)
+            if hour == hours[-1]:
+                # Not spread over the hours, their usage is unknown
+                used += remainder
+            state += used
+            running_sum += used
+            rows.append(StatisticData(start=hour, state=state, sum=running_sum))
+
+        metadata = StatisticMetaData(
+            has_mean=False,
+            has_sum=True,
+            name=f"{coordinator.config_entry.title} water",
+            source=DOMAIN,
+            statistic_id=self.statistic_id,
+            unit_of_measurement=UnitOfVolume.LITERS,
+        )
+        async_add_external_statistics(self._hass, metadata, rows)
+        _LOGGER.debug(
+            "Imported %s hours into %s, %s l not assigned to an hour",
+            len(rows),
+            self.statistic_id,
+            remainder,
+        )
+        return len(rows)
+
+    async def _async_last_statistic(self) -> dict[str, Any] | None:
+        result = await get_instance(self._hass).async_add_executor_job(
+            get_last_statistics,
+            self._hass,
+            1,
+            self.statistic_id,
+            True,
+            {"state", "sum"},
+        )
+        rows = result.get(self.statistic_id)
+        return rows[0] if rows else None
+
+    async def _async_history(
+        self, now: datetime, first: datetime
+    ) -> tuple[dict[datetime, float], float]:
+        """Return the blended water of the hours the device remembers.
+
+        Days are only returned if they start at first or later. The second
+        value is the water of the current, incomplete hour.
+        """
+        coordinator = self._coordinator
+        data = coordinator.data
+        factor = blended_factor_of(data.hardness_in, data.hardness_out)
+        today = dt_util.start_of_local_day(now)
+        try:
+            async with asyncio.timeout(_HISTORY_TIMEOUT):
+                daily = await coordinator.my_api.get_daily_data()
+                monthly = None
+                if first < dt_util.as_utc(today):
+                    monthly = await coordinator.my_api.get_monthly_data()
+        except (
+            BwtException, aiohttp.ClientError, TimeoutError, ValueError, KeyError
+        ) as err:
+            _LOGGER.debug("No history of %s, estimating: %r", coordinator.name, err)
+            return {}, 0.0
+
+        usage: dict[datetime, float] = {}
+        for index, value in enumerate(daily.values):
+            # Half hours in local wall clock time
+            moment = today + timedelta(minutes=30 * index)
+            hour = dt_util.as_utc(moment.replace(minute=0))
+            usage[hour] = usage.get(hour, 0.0) + value * factor
+        current_hour = dt_util.as_utc(now.replace(minute=0, second=0, microsecond=0))
+        partial = usage.get(current_hour, 0.0)
+        usage = {hour: value for hour, value in usage.items() if hour < current_hour}
+
+        if monthly is not None:
+            month_start = today.replace(day=1)
+            for index, value in enumerate(monthly.values):
+                day = month_start + timedelta(days=index)
+                if day.month != month_start.month or day >= today:
+                    break
+                if dt_util.as_utc(day) < first:
+                    # Partly imported already
+                    continue
+                # Only the day is known, not its hours
+                last_hour = dt_util.as_utc(day + timedelta(days=1)) - _HOUR
+                usage[last_hour] = value * factor
+        return usage, partial
+
+
+@callback
+def async_schedule_backfill(
+    hass: HomeAssistant, entry: ConfigEntry, coordinator: "BwtCoordinator"
+) -> CALLBACK_TYPE:
+    """Backfill after the first live poll and then every hour."""
+    backfill = coordinator.backfill
+
+    @callback
+    def run() -> None:
+        entry.async_create_background_task(
+            hass, backfill.async_backfill(), f"{DOMAIN} statistics backfill"
+        )
+
+    remove_listener: CALLBACK_TYPE | None = None
+
+    @callback
+    def after_poll() -> None:
+        nonlocal remove_listener
+        if coordinator.last_update_success and not coordinator.stale:
+            remove_listener()
+            remove_listener = None
+            run()
+
+    remove_listener = coordinator.async_add_listener(after_poll)
+
+    @callback
+    def hourly(_now: datetime) -> None:
+        run()
+
+    unsub_hourly = async_track_time_change(hass, hourly, minute=5, second=0)
+
+    @callback
+    def cancel() -> None:
+        if remove_listener is not None:
+            remove_listener()
+        unsub_hourly()
+
+    return cancel
@@ -2,18 +2,50 @@
 import logging
 from typing import Any
 
-from bwt_api.api import BwtApi, BwtSilkApi
-from bwt_api.bwt import determine_bwt_model, BwtModel
+from bwt_api.bwt import BwtModel
 from bwt_api.exception import ConnectException, WrongCodeException
 import voluptuous as vol
 
 from homeassistant import config_entries
 from homeassistant.const import CONF_CODE, CONF_HOST
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.config_entries import ConfigFlowResult
 from homeassistant.data_entry_flow import FlowResult
+from homeassistant.helpers import selector
 
-from .const import DOMAIN
+from .const import (
+    CONF_COLUMNS,
+    CONF_DEADBANDS,
+    CONF_FAST_POLL_DURATION,
+    CONF_FAST_POLL_ENTITIES,
+    CONF_FIRMWARE,
+    CONF_GRACE_PERIOD,
+    CONF_MAX_SILENCE,
+    CONF_MODEL,
+    CONF_POLL_POLICY,
+    CONF_REGISTER_ENTITIES,
+    CONF_REGISTER_JOURNAL,
+    CONF_SALT_THRESHOLD,
+    CONF_SLOW_INTERVAL,
+    CONF_STATE_AWARE,
+    DEFAULT_FAST_POLL_DURATION,
+    DEFAULT_GRACE_PERIOD,
+    DEFAULT_SALT_THRESHOLD,
+    DEFAULT_SLOW_INTERVAL,
+    DOMAIN,
+    POLICY_CLASSIC,
+    POLL_POLICIES,
+)
+from .coordinator import async_hand_over_snapshot
+from .data.local import LocalApiData
+from .data.silk import SilkApiData
+from .deadband import DEADBAND_KEYS, DEFAULT_MAX_SILENCE
+from .transport import (
+    PooledBwtApi,
+    PooledBwtSilkApi,
+    async_determine_bwt_model,
+    async_get_transport,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -33,40 +65,143 @@ def _code_schema(
     }
 )
 
+def _options_schema(
+        entry: config_entries.ConfigEntry,
+):
+    options = entry.options
+    schema = {
+        vol.Required(
+            CONF_POLL_POLICY,
+            default=options.get(CONF_POLL_POLICY, POLICY_CLASSIC),
+        ): vol.In(POLL_POLICIES),
+        vol.Required(
+            CONF_STATE_AWARE,
+            default=options.get(CONF_STATE_AWARE, False),
+        ): bool,
+        vol.Required(
+            CONF_SLOW_INTERVAL,
+            default=options.get(CONF_SLOW_INTERVAL, DEFAULT_SLOW_INTERVAL),
+        ): vol.All(vol.Coerce(int), vol.Range(min=1, max=1440)),
+        vol.Required(
+            CONF_SALT_THRESHOLD,
+            default=options.get(CONF_SALT_THRESHOLD, DEFAULT_SALT_THRESHOLD),
+        ): vol.All(vol.Coerce(int), vol.Range(min=0, max=100)),
+        vol.Required(
+            CONF_GRACE_PERIOD,
+            default=options.get(CONF_GRACE_PERIOD, DEFAULT_GRACE_PERIOD),
+        ): vol.All(vol.Coerce(int), vol.Range(min=0, max=86400)),
+        vol.Optional(
+            CONF_FAST_POLL_ENTITIES,
+            default=options.get(CONF_FAST_POLL_ENTITIES, []),
+        ): selector.EntitySelector(selector.EntitySelectorConfig(multiple=True)),
+        vol.Required(
+            CONF_FAST_POLL_DURATION,
+            default=options.get(CONF_FAST_POLL_DURATION, DEFAULT_FAST_POLL_DURATION),
+        ): vol.All(vol.Coerce(int), vol.Range(min=1, max=3600)),
+    }
+    if _entry_model(entry) == BwtModel.PERLA_SILK:
+        # Raw registers only exist on the Perla Silk
+        schema[vol.Required(
+            CONF_REGISTER_JOURNAL,
+            default=options.get(CONF_REGISTER_JOURNAL, False),
+        )] = bool
+        schema[vol.Required(
+            CONF_REGISTER_ENTITIES,
+            default=options.get(CONF_REGISTER_ENTITIES, False),
+        )] = bool
+    return vol.Schema(schema)
+
+
+def _deadband_schema(
+        options: dict[str, Any],
+        keys: list[str],
+):
+    deadbands = options.get(CONF_DEADBANDS, {})
+    schema = {}
+    for key in keys:
+        absolute, relative = deadbands.get(key, (0, 0))
+        schema[vol.Required(f"{key}_absolute", default=absolute)] = vol.All(
+            vol.Coerce(float), vol.Range(min=0)
+        )
+        schema[vol.Required(f"{key}_relative", default=relative)] = vol.All(
+            vol.Coerce(float), vol.Range(min=0, max=100)
+        )
+    schema[vol.Required(
+        CONF_MAX_SILENCE,
+        default=options.get(CONF_MAX_SILENCE, DEFAULT_MAX_SILENCE),
+    )] = vol.All(vol.Coerce(int), vol.Range(min=1))
+    return vol.Schema(schema)
+
 
-async def validate_input(hass: HomeAssistant, data: dict[str, Any]) -> dict[str, Any]:
+def _entry_model(entry: config_entries.ConfigEntry) -> BwtModel:
+    """Return the model of a configured device."""
+    return BwtModel(entry.data[CONF_MODEL])
+
+
+async def validate_input(
+    hass: HomeAssistant, data: dict[str, Any], model: BwtModel | None = None
+) -> dict[str, Any]:
     """Validate the user input allows us to connect.
 
     Data has the keys from _bwt_schema with values provided by the user.
+    The model is only detected if it is not known yet. The fetched snapshot
+    is returned too, None for the local api without code.
     """
-    model = await determine_bwt_model(data[CONF_HOST])
+    transport = async_get_transport(hass)
+    registers = None
+    if model is None:
+        model, registers = await async_determine_bwt_model(transport, data[CONF_HOST])
     name = "BWT Perla"
+    snapshot = None
     match model:
         case BwtModel.PERLA_LOCAL_API:
             _LOGGER.debug("BWT Perla with local api detected")
             if CONF_CODE in data:
-                async with BwtApi(data[CONF_HOST], data[CONF_CODE]) as api:
-                    data = await api.get_current_data()
-                    suffix = "One" if data.columns == 1 else "Duplex"
+                async with PooledBwtApi(transport, data[CONF_HOST], data[CONF_CODE]) as api:
+                    snapshot = LocalApiData(await api.get_current_data()).snapshot()
+                    suffix = "One" if snapshot.columns == 1 else "Duplex"
                     name = f"BWT Perla {suffix}"
         case BwtModel.PERLA_SILK:
             _LOGGER.debug("BWT Perla with Silk API detected")
-            async with BwtSilkApi(data[CONF_HOST]) as api:
-                await api.get_registers()
-                name = "BWT Perla Silk"
+            if registers is None:
+                async with PooledBwtSilkApi(transport, data[CONF_HOST]) as api:
+                    registers = await api.get_registers()
+            snapshot = SilkApiData(registers).snapshot()
+            name = "BWT Perla Silk"
         case _:
             _LOGGER.error("Unsupported BWT model: %s", model)
             raise ValueError(f"Unsupported BWT model: {model}")
 
     # Return info that you want to store in the config entry.
-    return {"model": model, "title": name}
+    return {"model": model, "title": name, "snapshot": snapshot}
+
+
+@callback
+def _entry_data(
+    hass: HomeAssistant, user_input: dict[str, Any], info: dict[str, Any]
+) -> dict[str, Any]:
+    """Return the config entry data and hand the snapshot over to the setup."""
+    data = {**user_input, CONF_MODEL: info["model"].value}
+    if (snapshot := info["snapshot"]) is not None:
+        async_hand_over_snapshot(hass, user_input[CONF_HOST], snapshot)
+        data[CONF_FIRMWARE] = snapshot.firmware_version
+        data[CONF_COLUMNS] = snapshot.columns
+    return data
 
 
 class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     """Handle a config flow for BWT Perla."""
 
     VERSION = 2
+    MINOR_VERSION = 2
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(
+        config_entry: config_entries.ConfigEntry,
+    ) -> config_entries.OptionsFlow:
+        """Create the options flow."""
+        return OptionsFlowHandler()
 
     async def async_step_user(
         self, user_input: dict[str, Any] | None = None
@@ -80,12 +215,15 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                     case BwtModel.PERLA_LOCAL_API:
                         # Ask user for login code
                         self._host = user_input[CONF_HOST]
+                        self._model = info["model"]
                         return await self.async_step_code()
                     case BwtModel.PERLA_SILK:
-                        return self.async_create_entry(title=info["title"], data=user_input)
+                        return self.async_create_entry(
+                            title=info["title"],
+                            data=_entry_data(self.hass, user_input, info),
+                        )
                     case _:
                         errors["base"] = "unsupported_model"
-                return self.async_create_entry(title=info["title"], data=user_input)
             except ConnectException:
                 _LOGGER.exception("Connection error setting up the Bwt Api")
                 errors["base"] = "cannot_connect"
@@ -106,8 +244,10 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         if user_input is not None:
             user_input[CONF_HOST] = self._host
             try:
-                info = await validate_input(self.hass, user_input)
-                return self.async_create_entry(title=info["title"], data=user_input)
+                info = await validate_input(self.hass, user_input, self._model)
+                return self.async_create_entry(
+                    title=info["title"], data=_entry_data(self.hass, user_input, info)
+                )
             except ConnectException:
                 _LOGGER.exception("Connection error setting up the Bwt Api")
                 errors["base"] = "cannot_connect"
@@ -128,11 +268,18 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         current = self._get_reconfigure_entry()
         errors: dict[str, str] = {}
         if user_input is not None:
+            # Keep the login code of the local api
+            user_input = {**current.data, **user_input}
             try:
-                await validate_input(self.hass, user_input)
-                self.hass.config_entries.async_update_entry(current, data=user_input)
-                await self.hass.config_entries.async_reload(current.entry_id)
-                return self.async_abort(reason="reconfiguration_successful")
+                info = await validate_input(
+                    self.hass, user_input, _entry_model(current)
+                )
+                # Reloads only once, the update listener would reload again
+                return self.async_update_reload_and_abort(
+                    current,
+                    data=_entry_data(self.hass, user_input, info),
+                    reason="reconfiguration_successful",
+                )
             except ConnectException:
                 _LOGGER.exception("Connection error setting up the Bwt Api")
                 errors["base"] = "cannot_connect"
@@ -148,3 +295,41 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 host=current.data[CONF_HOST],
             ), errors=errors
         )
+
+
+class OptionsFlowHandler(config_entries.OptionsFlow):
+    """Handle the options of a BWT Perla config entry."""
+
+    def __init__(self) -> None:
+        """Initialize the options flow."""
+        self._options: dict[str, Any] = {}
+
+    async def async_step_init(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Manage the options."""
+        if user_input is not None:
+            self._options.update(user_input)
+            return await self.async_step_deadbands()
+
+        return self.async_show_form(
+            step_id="init", data_schema=_options_schema(self.config_entry)
+        )
+
+    async def async_step_deadbands(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Manage the deadbands of the measurement sensors."""
+        keys = DEADBAND_KEYS[_entry_model(self.config_entry)]
+        if user_input is not None:
+            self._options[CONF_MAX_SILENCE] = user_input[CONF_MAX_SILENCE]
+            self._options[CONF_DEADBANDS] = {
+                key: [user_input[f"{key}_absolute"], user_input[f"{key}_relative"]]
+                for key in keys
+            }
+            return self.async_create_entry(data=self._options)
+
+        return self.async_show_form(
+            step_id="deadbands",
+            data_schema=_deadband_schema(self.config_entry.options, keys),
+        )
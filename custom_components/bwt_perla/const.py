@@ -1,3 +1,47 @@
 """Constants for the BWT Perla integration."""
 
 DOMAIN = "bwt_perla"
+
+# Keys of hass.data[DOMAIN] shared by all config entries
+DATA_SCHEDULER = "scheduler"
+DATA_TRANSPORT = "transport"
+DATA_HANDOVER = "handover"
+
+# Detected at setup, kept in the config entry data
+CONF_MODEL = "model"
+CONF_FIRMWARE = "firmware_version"
+CONF_COLUMNS = "columns"
+
+CONF_MAX_CONCURRENT_POLLS = "max_concurrent_polls"
+
+CONF_POLL_POLICY = "poll_policy"
+POLICY_CLASSIC = "classic"
+POLICY_LEARNED = "learned"
+POLL_POLICIES = [POLICY_CLASSIC, POLICY_LEARNED]
+# Holiday mode, regenerations and idle time adapt the poll policy
+CONF_STATE_AWARE = "state_aware"
+
+# Seconds the last values are still shown while the device does not answer
+CONF_GRACE_PERIOD = "grace_period"
+DEFAULT_GRACE_PERIOD = 300
+
+# Burst of fast polls, started by the service, the event or trigger entities
+CONF_FAST_POLL_ENTITIES = "fast_poll_entities"
+CONF_FAST_POLL_DURATION = "fast_poll_duration"
+DEFAULT_FAST_POLL_DURATION = 120
+DEFAULT_FAST_POLL_INTERVAL = 1
+EVENT_FAST_POLL = "bwt_perla_fast_poll"
+
+# Minutes between two polls decoding all values
+CONF_SLOW_INTERVAL = "slow_interval"
+DEFAULT_SLOW_INTERVAL = 10
+
+# Salt level in percent below which bwt_perla_salt_low is fired
+CONF_SALT_THRESHOLD = "salt_threshold"
+DEFAULT_SALT_THRESHOLD = 20
+
+CONF_REGISTER_JOURNAL = "register_journal"
+CONF_REGISTER_ENTITIES = "register_entities"
+
+CONF_DEADBANDS = "deadbands"
+CONF_MAX_SILENCE = "max_silence"
@@ -1,40 +1,295 @@
 """Coordinator to fetch the data once for all sensors."""
 
 import asyncio
-from datetime import timedelta
+from collections import Counter
+from collections.abc import Iterable
+from contextlib import AbstractContextManager, nullcontext
+from datetime import datetime, timedelta
 import logging
+import time
 
-from .data.data import ApiData
+import aiohttp
+
+from .backfill import StatisticsBackfill
 from .data.local import LocalApiData
-from .data.silk import SilkApiData
+from .data.silk import REGISTER_COUNT, SILK_REGISTERS, SilkApiData, register_ranges
+from .data.snapshot import BwtSnapshot
+from .events import TRANSITION_FIELDS, transitions
+from .flow import FlowIntegrator
+from .health import (
+    MAX_TIMEOUT,
+    STATE_HALF_OPEN,
+    STATE_OPEN,
+    CircuitBreaker,
+    RttEstimator,
+)
+from .stats import PollStats
+from .journal import RegisterJournal
+from .profiling import CoordinatorProfiler
+from .polling import UPDATE_INTERVAL_MAX, ClassicPolicy, PollPolicy
+from .scheduler import async_get_scheduler
 from bwt_api.bwt import BwtModel
+from bwt_api.exception import BwtException, WrongCodeException
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+from homeassistant.exceptions import ConfigEntryAuthFailed
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.storage import Store
+from homeassistant.util import dt as dt_util
 
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
-from homeassistant.exceptions import ConfigEntryNotReady
+from .const import (
+    CONF_COLUMNS,
+    CONF_FIRMWARE,
+    CONF_GRACE_PERIOD,
+    CONF_SALT_THRESHOLD,
+    CONF_SLOW_INTERVAL,
+    DATA_HANDOVER,
+    DEFAULT_GRACE_PERIOD,
+    DEFAULT_SALT_THRESHOLD,
+    DEFAULT_SLOW_INTERVAL,
+    DOMAIN,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
-_UPDATE_INTERVAL_MIN = 1
-_UPDATE_INTERVAL_MAX = 30
+_STORAGE_VERSION = 1
+# The last snapshot is written at most this often
+_SAVE_DELAY = 60
+# A snapshot handed over by the config flow is used if it is younger
+_HANDOVER_MAX_AGE = 60
+
+# Fast polls only decode the FAST_FIELDS, slow polls decode everything
+TIER_FAST = "fast"
+TIER_SLOW = "slow"
+
+# Values that are misleading long before the grace period ends, in seconds
+FIELD_MAX_AGE: dict[str, float] = {
+    "current_flow": 60,
+}
+
+# Seconds after an expiry the entities are updated, timers may fire early
+_EXPIRY_MARGIN = 0.5
+
+# Needed by the flow integration, the poll policy and the transition events,
+# with or without entities
+_ALWAYS_DEMANDED = (
+    "current_flow",
+    "total_output",
+    "hardness_in",
+    "hardness_out",
+    "columns",
+    "firmware_version",
+    *TRANSITION_FIELDS,
+)
+
+
+def _snapshot_store(hass: HomeAssistant, entry_id: str) -> Store:
+    return Store(hass, _STORAGE_VERSION, f"{DOMAIN}.{entry_id}.snapshot")
+
+
+async def async_remove_snapshot(hass: HomeAssistant, entry_id: str) -> None:
+    """Remove the persisted snapshot of a config entry."""
+    await _snapshot_store(hass, entry_id).async_remove()
+
+
+@callback
+def async_hand_over_snapshot(
+    hass: HomeAssistant, host: str, snapshot: BwtSnapshot
+) -> None:
+    """Keep the snapshot of a config flow probe for the setup of the entry."""
+    hass.data.setdefault(DOMAIN, {}).setdefault(DATA_HANDOVER, {})[host] = (
+        time.monotonic(),
+        snapshot,
+    )
+
+
+@callback
+def async_take_over_snapshot(hass: HomeAssistant, host: str) -> BwtSnapshot | None:
+    """Return the snapshot handed over for a host, if it is recent enough."""
+    handed_over = hass.data.get(DOMAIN, {}).get(DATA_HANDOVER, {}).pop(host, None)
+    if handed_over is None:
+        return None
+    moment, snapshot = handed_over
+    if time.monotonic() - moment > _HANDOVER_MAX_AGE:
+        return None
+    return snapshot
 
 
-class BwtCoordinator(DataUpdateCoordinator[ApiData]):
+class BwtCoordinator(DataUpdateCoordinator[BwtSnapshot]):
     """Bwt coordinator."""
     model: BwtModel
 
-    def __init__(self, hass: HomeAssistant, api, model: BwtModel) -> None:
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        entry: ConfigEntry,
+        api,
+        model: BwtModel,
+        policy: PollPolicy | None = None,
+        journal: RegisterJournal | None = None,
+    ) -> None:
         """Initialize my coordinator."""
         super().__init__(
             hass,
             _LOGGER,
+            config_entry=entry,
             # Name of the data. For logging purposes.
             name="My sensor",
-            # Polling interval. Will only be polled if there are subscribers.
-            update_interval=timedelta(seconds=_UPDATE_INTERVAL_MAX),
+            # Polls are triggered by the shared BwtPollScheduler
+            update_interval=None,
         )
         self.my_api = api
         self.model = model
+        self.policy = policy if policy is not None else ClassicPolicy()
+        self.journal = journal
+        # Silk only counts the total in steps of 100 litres
+        self.flow = FlowIntegrator(
+            SILK_REGISTERS[15].scale if model == BwtModel.PERLA_SILK else 1
+        )
+        self.poll_interval = timedelta(seconds=UPDATE_INTERVAL_MAX)
+        self.rtt = RttEstimator()
+        # Forced interval of a burst of fast polls and its end, monotonic
+        self._burst_interval = 0.0
+        self._burst_until = 0.0
+        self.stats = PollStats()
+        # Set while a profile of this device runs
+        self.profiler: CoordinatorProfiler | None = None
+        self.backfill = StatisticsBackfill(hass, self)
+        self.grace_period = timedelta(
+            seconds=entry.options.get(CONF_GRACE_PERIOD, DEFAULT_GRACE_PERIOD)
+        )
+        # Monotonic and wall clock time of the last successful poll
+        self.last_success: float | None = None
+        self.last_success_at: datetime | None = None
+        self._unsub_expiry: CALLBACK_TYPE | None = None
+        self.breaker = CircuitBreaker(entry.title)
+        self.slow_interval = timedelta(
+            minutes=entry.options.get(CONF_SLOW_INTERVAL, DEFAULT_SLOW_INTERVAL)
+        )
+        self.salt_threshold = entry.options.get(
+            CONF_SALT_THRESHOLD, DEFAULT_SALT_THRESHOLD
+        )
+        # Tier of the last poll and when the next slow poll is due
+        self.tier = TIER_SLOW
+        self._slow_due = 0.0
+        # Snapshot values used by the added entities and the Silk registers
+        # they are decoded from. None decodes everything, until the first
+        # entity is added.
+        self._demand: Counter[str] = Counter()
+        self.demanded: frozenset[str] | None = None
+        self.register_ranges: tuple[range, ...] | None = None
+        # Entity states written, skipped because nothing changed and
+        # suppressed by a deadband
+        self.state_writes = 0
+        self.state_writes_skipped = 0
+        self.state_writes_suppressed = 0
+        # True while the data is a snapshot restored from disk
+        self.stale = False
+        self._store = _snapshot_store(hass, entry.entry_id)
+        self._save_pending = False
+
+    async def async_restore(self) -> bool:
+        """Use the snapshot persisted by the last run, True if there is one."""
+        stored = await self._store.async_load()
+        if not stored:
+            return False
+        try:
+            self.data = BwtSnapshot.from_dict(stored)
+        except (TypeError, ValueError):
+            _LOGGER.warning("Ignoring invalid persisted snapshot: %s", stored)
+            return False
+        self.stale = True
+        # The grace period also covers a device that is down during startup
+        self.last_success = time.monotonic()
+        return True
+
+    @property
+    def data_age(self) -> float | None:
+        """Return the seconds since the last successful poll."""
+        if self.last_success is None:
+            return None
+        return time.monotonic() - self.last_success
+
+    def serves(self, fields: Iterable[str]) -> bool:
+        """Return True if the last values of the fields may still be shown.
+
+        After a failed poll the last snapshot is served until the grace
+        period, or the shorter max age of a field, has passed.
+        """
+        if self.last_update_success:
+            return True
+        if (age := self.data_age) is None:
+            return False
+        max_age = self.grace_period.total_seconds()
+        for field in fields:
+            max_age = min(max_age, FIELD_MAX_AGE.get(field, max_age))
+        return age <= max_age
+
+    @callback
+    def _async_schedule_expiry(self) -> None:
+        """Update the entities when the next of their values expires."""
+        if self._unsub_expiry is not None:
+            self._unsub_expiry()
+            self._unsub_expiry = None
+        if (age := self.data_age) is None:
+            return
+        grace = self.grace_period.total_seconds()
+        remaining = [
+            max_age - age
+            for max_age in {grace, *FIELD_MAX_AGE.values()}
+            if age < max_age <= grace
+        ]
+        if remaining:
+            self._unsub_expiry = async_call_later(
+                self.hass, min(remaining) + _EXPIRY_MARGIN, self._async_expired
+            )
+
+    @callback
+    def _async_expired(self, _now) -> None:
+        self._unsub_expiry = None
+        if not self.last_update_success:
+            self.async_update_listeners()
+            self._async_schedule_expiry()
+
+    @callback
+    def async_demand(self, fields: Iterable[str]) -> CALLBACK_TYPE:
+        """Decode the fields until the returned callback is called."""
+        fields = tuple(fields)
+        self._demand.update(fields)
+        self._update_demanded()
+        # Decode the new fields with the next poll
+        self._slow_due = 0.0
+
+        @callback
+        def release() -> None:
+            self._demand.subtract(fields)
+            self._update_demanded()
+
+        return release
+
+    def _update_demanded(self) -> None:
+        demanded = {field for field, count in self._demand.items() if count > 0}
+        self.demanded = frozenset(demanded.union(_ALWAYS_DEMANDED))
+        if self.model != BwtModel.PERLA_SILK:
+            return
+        ranges = register_ranges(self.demanded)
+        if sum(map(len, ranges)) == REGISTER_COUNT:
+            # The raw register entities need all of them
+            ranges = None
+        self.register_ranges = ranges
+
+    @callback
+    def async_seed(self, snapshot: BwtSnapshot) -> None:
+        """Use a snapshot fetched by the config flow as first poll."""
+        self.data = snapshot
+        self._accept(snapshot, TIER_SLOW)
+
+    def _data_to_save(self) -> dict:
+        self._save_pending = False
+        return self.data.as_dict()
 
     async def _async_update_data(self):
         """Fetch data from API endpoint.
@@ -42,45 +297,213 @@ class BwtCoordinator(DataUpdateCoordinator[ApiData]):
         This is the place to pre-process the data to lookup tables
         so entities can quickly look up their data.
         """
-        #        try:
-        # Note: asyncio.TimeoutError and aiohttp.ClientError are already
-        # handled by the data update coordinator.
-        async with asyncio.timeout(10):
-            if self.model == BwtModel.PERLA_LOCAL_API:
-                new_values = LocalApiData(await self.my_api.get_current_data())
-            elif self.model == BwtModel.PERLA_SILK:
-                new_values = SilkApiData(await self.my_api.get_registers())
-            else:
-                _LOGGER.error("Unsupported API type: %s", type(self.my_api))
-                raise Exception("Unsupported API type")
-            self.update_interval = calculate_update_interval(
-                self.update_interval, new_values.current_flow()
+        try:
+            return await self._async_poll()
+        except UpdateFailed:
+            # Only the first failure of a row reaches the entities, the
+            # expiry of their values is scheduled instead
+            self._async_schedule_expiry()
+            raise
+
+    async def _async_poll(self) -> BwtSnapshot:
+        if self.breaker.state == STATE_OPEN:
+            await self._async_probe()
+        tier = TIER_FAST
+        if self.data is None or self.stale or time.monotonic() >= self._slow_due:
+            tier = TIER_SLOW
+        previous = self.data if tier == TIER_FAST else None
+        timeout = self.rtt.timeout
+        if self.breaker.state == STATE_HALF_OPEN:
+            # A device that got slower must not be locked out by its old timeout
+            timeout = MAX_TIMEOUT
+        started = time.monotonic()
+        try:
+            async with asyncio.timeout(timeout):
+                if self.model == BwtModel.PERLA_LOCAL_API:
+                    response = await self.my_api.get_current_data()
+                elif self.model == BwtModel.PERLA_SILK:
+                    registers = await self.my_api.get_registers()
+                else:
+                    _LOGGER.error("Unsupported API type: %s", type(self.my_api))
+                    raise Exception("Unsupported API type")
+        except WrongCodeException as e:
+            raise ConfigEntryAuthFailed from e
+        except (
+            BwtException,
+            aiohttp.ClientError,
+            TimeoutError,
+            # Truncated or malformed responses
+            ValueError,
+            KeyError,
+        ) as e:
+            self.stats.polls += 1
+            self.stats.errors += 1
+            if isinstance(e, TimeoutError):
+                self.stats.timeouts += 1
+                self.rtt.timed_out()
+            self.breaker.record_failure(e)
+            raise UpdateFailed(f"Error communicating with the BWT: {e!r}") from e
+        fetched = time.monotonic()
+        self.rtt.add(fetched - started)
+        self.breaker.record_success()
+        if self.profiler is not None:
+            self.profiler.add("request", fetched - started)
+
+        if self.model == BwtModel.PERLA_LOCAL_API:
+            with self.profiled("LocalApiData.snapshot"):
+                new_values = LocalApiData(response, self.demanded).snapshot(previous)
+        else:
+            if self.journal is not None:
+                self.journal.async_record(dt_util.utcnow(), registers)
+            with self.profiled("SilkApiData.snapshot"):
+                new_values = SilkApiData(registers, self.register_ranges).snapshot(
+                    previous
+                )
+        stats = self.stats
+        stats.polls += 1
+        stats.request.add(fetched - started)
+        stats.decode.add(time.monotonic() - fetched)
+        if (payload := self.my_api.payload_bytes) is not None:
+            stats.payload_bytes = payload
+            stats.payload_bytes_total += payload
+        self._accept(new_values, tier)
+        return new_values
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """Update all entities and measure how long that takes."""
+        started = time.monotonic()
+        super().async_update_listeners()
+        elapsed = time.monotonic() - started
+        self.stats.fan_out.add(elapsed)
+        if self.profiler is not None:
+            self.profiler.add("async_update_listeners", elapsed)
+
+    def profiled(self, name: str) -> AbstractContextManager[None]:
+        """Profile a synchronous section while a profile of this device runs."""
+        if self.profiler is None:
+            return nullcontext()
+        return self.profiler.profiled(name)
+
+    async def _async_probe(self) -> None:
+        """Raise UpdateFailed unless the device of an open breaker answers again."""
+        if not await self.my_api.async_probe():
+            self.breaker.record_failure(None)
+            raise UpdateFailed("The BWT is still unreachable")
+        self.breaker.probe_succeeded()
+
+    @callback
+    def async_fast_poll(self, interval: float, duration: float) -> None:
+        """Poll every interval seconds for the next duration seconds.
+
+        Overlapping bursts are merged into one, with the shorter interval
+        and the later end. Afterwards the poll policy takes over again.
+        """
+        now = time.monotonic()
+        if now < self._burst_until:
+            interval = min(interval, self._burst_interval)
+        self._burst_interval = interval
+        self._burst_until = max(self._burst_until, now + duration)
+        async_get_scheduler(self.hass).async_expedite(
+            self.config_entry.entry_id, interval
+        )
+
+    @property
+    def fast_poll_remaining(self) -> float:
+        """Return the seconds left of the current burst, 0 without."""
+        return max(0.0, self._burst_until - time.monotonic())
+
+    @callback
+    def _async_fire_transitions(
+        self, previous: BwtSnapshot, new_values: BwtSnapshot
+    ) -> None:
+        events = transitions(previous, new_values, self.salt_threshold)
+        if not events:
+            return
+        entry_id = self.config_entry.entry_id
+        device = dr.async_get(self.hass).async_get_device(
+            identifiers={(DOMAIN, entry_id)}
+        )
+        for event_type, data in events:
+            _LOGGER.debug("%s of %s: %s", event_type, self.config_entry.title, data)
+            self.hass.bus.async_fire(
+                event_type,
+                {
+                    "config_entry_id": entry_id,
+                    "device_id": None if device is None else device.id,
+                    **data,
+                },
             )
-            return new_values
+
+    def next_poll_delay(self) -> float:
+        """Return the seconds until the next poll, backing off after failures."""
+        interval = self.poll_interval.total_seconds()
+        if time.monotonic() < self._burst_until:
+            interval = min(interval, self._burst_interval)
+        if (delay := self.breaker.retry_delay()) is not None:
+            return max(interval, delay)
+        return interval
+
+    @callback
+    def _accept(self, new_values: BwtSnapshot, tier: str) -> None:
+        """Process a successfully fetched snapshot."""
+        previous = self.data
+        if previous is not None and previous is not new_values:
+            # Fast polls copy the slow values, errors are compared every poll
+            self._async_fire_transitions(previous, new_values)
+        self.tier = tier
+        self.last_success = time.monotonic()
+        self.last_success_at = dt_util.utcnow()
+        if tier == TIER_SLOW:
+            self._slow_due = time.monotonic() + self.slow_interval.total_seconds()
+        now = dt_util.now()
+        self.flow.add(now.timestamp(), new_values.current_flow, new_values.total_output)
+        self.poll_interval = self.policy.next_interval(
+            self.poll_interval, new_values.current_flow, now, new_values
+        )
+        self.stale = False
+        # Every call restarts the delay, so only schedule once per write
+        if not self._save_pending:
+            self._save_pending = True
+            self._store.async_delay_save(self._data_to_save, _SAVE_DELAY)
+
+        entry = self.config_entry
+        if new_values.firmware_version is not None and (
+            entry.data.get(CONF_FIRMWARE) != new_values.firmware_version
+            or entry.data.get(CONF_COLUMNS) != new_values.columns
+        ):
+            # Reloads the entry, so the device info is updated after a firmware update
+            self.hass.config_entries.async_update_entry(
+                entry,
+                data={
+                    **entry.data,
+                    CONF_FIRMWARE: new_values.firmware_version,
+                    CONF_COLUMNS: new_values.columns,
+                },
+            )
+
+    async def async_shutdown(self) -> None:
+        """Flush the snapshot and the journal, release the connections of the api."""
+        await super().async_shutdown()
+        if self._save_pending:
+            # Also cancels the delayed save, it would write a removed entry back
+            await self._store.async_save(self._data_to_save())
+        if self._unsub_expiry is not None:
+            self._unsub_expiry()
+            self._unsub_expiry = None
+        if self.journal is not None:
+            await self.journal.async_close()
+        await self.my_api.close()
 
     def get_model_suffix(self) -> str:
         """Get the model suffix based on the number of columns."""
         if self.model == BwtModel.PERLA_LOCAL_API:
-            if self.data.columns() == 2:
+            if self.config_entry.data.get(CONF_COLUMNS) == 2:
                 return "Duplex"
             return "One"
         return "Silk"
 
     def get_firmware_version(self) -> str:
         """Get the firmware version."""
-        if self.model == BwtModel.PERLA_LOCAL_API:
-            return self.data.firmware_version()
-        return "Unknown"
-
-
-def calculate_update_interval(current_interval: timedelta | None, current_flow: int):
-    """Calculate the new update interval, based on the old one and the current flow."""
+        return self.config_entry.data.get(CONF_FIRMWARE) or "Unknown"
 
-    if current_flow > 0:
-        return timedelta(seconds=_UPDATE_INTERVAL_MIN)
-    if current_interval is None:
-        return timedelta(seconds=_UPDATE_INTERVAL_MAX)
-    if current_interval.seconds >= _UPDATE_INTERVAL_MAX:
-        return current_interval
-    # Increase the interval to max step by step if there is no flow at the moment
-    return timedelta(seconds=min(_UPDATE_INTERVAL_MAX, current_interval.seconds * 2))
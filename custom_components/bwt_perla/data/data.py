@@ -1,27 +1,12 @@
 from abc import ABC, abstractmethod
-from datetime import datetime
 
-class ApiData(ABC):
-    @abstractmethod
-    def current_flow(self) -> int: pass
-
-    @abstractmethod
-    def total_output(self) -> int: pass
-
-    @abstractmethod
-    def hardness_in(self) -> int: pass
-
-    @abstractmethod
-    def regenerativ_level(self) -> int: pass
-
-    @abstractmethod
-    def day_output(self) -> int: pass
-
-    @abstractmethod
-    def capacity_1(self) -> int: pass
+from .snapshot import BwtSnapshot
 
+class ApiData(ABC):
     @abstractmethod
-    def last_regeneration_1(self) -> datetime: pass
+    def snapshot(self, previous: BwtSnapshot | None = None) -> BwtSnapshot:
+        """Normalize the api response into a snapshot.
 
-    @abstractmethod
-    def regeneration_count_1(self) -> int: pass
+        With a previous snapshot only the FAST_FIELDS are decoded, all other
+        values are taken over from it.
+        """
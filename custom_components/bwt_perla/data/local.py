@@ -1,85 +1,104 @@
+from collections.abc import Callable, Collection
+from datetime import datetime
+from typing import Any
+
 from bwt_api.data import CurrentResponse
-from bwt_api.api import treated_to_blended 
 from .data import ApiData
-from datetime import datetime
+from .snapshot import BwtSnapshot
 
 
 class LocalApiData(ApiData):
     """Data class for local API data."""
     _data: CurrentResponse
 
-    def __init__(self, data: CurrentResponse) -> None:
-        """Initialize the LocalApiData with the provided data."""
+    def __init__(
+        self, data: CurrentResponse, fields: Collection[str] | None = None
+    ) -> None:
+        """Initialize the LocalApiData with the provided data.
+
+        Slow values not in fields are not decoded and None, all of them are
+        decoded without fields.
+        """
         self._data = data
-    
-    def columns(self) -> int:
-        return self._data.columns
-    
-    def firmware_version(self) -> str:
-        return self._data.firmware_version
-
-    def total_output(self) -> int:
-        return self._data.blended_total
-
-    def hardness_in(self) -> int:
-        return self._data.in_hardness.dH
-
-    def customer_service(self) -> datetime:
-        return self._data.service_customer.astimezone()
-
-    def regenerativ_level(self) -> int:
-        return self._data.regenerativ_level
-
-    def day_output(self) -> int:
-        return treated_to_blended(self._data.treated_day, self._data.in_hardness.dH, self._data.out_hardness.dH)
-
-    def capacity_1(self) -> int:
-        return self._data.capacity_1 / (self._data.in_hardness.dH - self._data.out_hardness.dH) / 1000.0
-
-    def capacity_2(self) -> int:
-        return self._data.capacity_2 / (self._data.in_hardness.dH - self._data.out_hardness.dH) / 1000.0
-
-    def last_regeneration_1(self) -> datetime:
-        return self._data.regeneration_last_1.astimezone()
-    
-    def last_regeneration_2(self) -> datetime:
-        return self._data.regeneration_last_2.astimezone()
-
-    def current_flow(self) -> int:
-        return self._data.current_flow
-    
-    def errors(self):
-        return self._data.errors
-    
-    def hardness_out(self) -> int:
-        return self._data.out_hardness.dH
-    
-    def technician_service(self) -> int:
-        return self._data.service_technician.astimezone()
-    
-    def state(self) -> int:
-        return self._data.state
-    
-    def holiday_mode(self):
-        return self._data.holiday_mode
-    
-    def service_technician(self):
-        return self._data.service_technician.astimezone()
-    
-    def regenerativ_days(self):
-        return self._data.regenerativ_days
-    
-    def regenerativ_total(self):
-        return self._data.regenerativ_total
-    
-    def month_output(self):
-        return treated_to_blended(self._data.treated_month, self._data.in_hardness.dH, self._data.out_hardness.dH)
-    
-    def year_output(self):
-        return treated_to_blended(self._data.treated_year, self._data.in_hardness.dH, self._data.out_hardness.dH)
-    
-    def regeneration_count_1(self):
-        return self._data.regeneration_count_1
-    
-    def regeneration_count_2(self):
-        return self._data.regeneration_count_2
+        self._fields = fields
+
+    def snapshot(self, previous: BwtSnapshot | None = None) -> BwtSnapshot:
+        """Normalize the current data into a snapshot."""
+        data = self._data
+        hardness_in = data.in_hardness.dH
+        hardness_out = data.out_hardness.dH
+        hardness_diff = hardness_in - hardness_out
+        blended_factor = blended_factor_of(hardness_in, hardness_out)
+        capacity_factor = (
+            None if hardness_diff == 0 else 1.0 / hardness_diff / 1000.0
+        )
+        errors = tuple(data.errors)
+        fast_values = {
+            "current_flow": data.current_flow,
+            "total_output": data.blended_total,
+            "day_output": data.treated_day * blended_factor,
+            "month_output": data.treated_month * blended_factor,
+            "year_output": data.treated_year * blended_factor,
+            "capacity_1": _capacity(data.capacity_1, capacity_factor),
+            "capacity_2": _capacity(data.capacity_2, capacity_factor),
+            "state": data.state.name,
+            "errors": errors,
+            "fatal_errors": ",".join(x.name for x in errors if x.is_fatal()),
+            "warnings": ",".join(x.name for x in errors if not x.is_fatal()),
+        }
+        if previous is not None:
+            return previous.replace(**fast_values)
+
+        fields = self._fields
+        return BwtSnapshot(
+            hardness_in=hardness_in,
+            hardness_out=hardness_out,
+            columns=data.columns,
+            firmware_version=data.firmware_version,
+            **fast_values,
+            **{
+                name: extract(data)
+                for name, extract in _SLOW_VALUES.items()
+                if fields is None or name in fields
+            },
+        )
+
+
+def _holiday_mode_start(data: CurrentResponse) -> datetime | None:
+    if data.holiday_mode > 1:
+        return datetime.fromtimestamp(data.holiday_mode)
+    return None
+
+
+# The slow values, only those in demand are decoded
+_SLOW_VALUES: dict[str, Callable[[CurrentResponse], Any]] = {
+    "regenerativ_level": lambda data: data.regenerativ_level,
+    "last_regeneration_1": lambda data: data.regeneration_last_1.astimezone(),
+    "regeneration_count_1": lambda data: data.regeneration_count_1,
+    "customer_service": lambda data: data.service_customer.astimezone(),
+    "technician_service": lambda data: data.service_technician.astimezone(),
+    "last_regeneration_2": lambda data: data.regeneration_last_2.astimezone(),
+    "regeneration_count_2": lambda data: data.regeneration_count_2,
+    "holiday_mode": lambda data: data.holiday_mode,
+    "holiday_mode_active": lambda data: data.holiday_mode == 1,
+    "holiday_mode_start": _holiday_mode_start,
+    "regenerativ_days": lambda data: data.regenerativ_days,
+    "regenerativ_total": lambda data: data.regenerativ_total,
+}
+
+
+def blended_factor_of(hardness_in: int, hardness_out: int) -> float:
+    """Return the factor converting treated into blended water.
+
+    Same as bwt_api.api.treated_to_blended, but the ratio only once.
+    """
+    if hardness_in == 0 or hardness_in == hardness_out:
+        return 1.0
+    return 1.0 / (1.0 - hardness_out / hardness_in)
+
+
+def _capacity(capacity: int, factor: float | None) -> float | None:
+    """Convert ml * dH into litres of blended water."""
+    if factor is None:
+        return None
+    return capacity * factor
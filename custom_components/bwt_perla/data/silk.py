@@ -1,93 +1,244 @@
 from .data import ApiData
+from .snapshot import FAST_FIELDS, BwtSnapshot
+from collections.abc import Iterable
 from datetime import datetime, timedelta
+from typing import NamedTuple
 import logging
 
 _LOGGER = logging.getLogger(__name__)
 
+
+class SilkEntity(NamedTuple):
+    """Sensor of a Silk only snapshot value, keyed by the value."""
+    key: str
+    device_class: str | None = None
+    unit: str | None = None
+    icon: str | None = None
+
+
+class SilkRegister(NamedTuple):
+    """Meaning of one register of the Silk register dump."""
+    index: int
+    name: str
+    scale: int = 1
+    unit: str | None = None
+    known: bool = True
+    # The sensor of the value decoded from this register, if only the Silk has it
+    entity: SilkEntity | None = None
+
+
+# Register layout of the Perla Silk, ordered by index without gaps.
+# Unknown registers are only exposed as raw debug entities.
+SILK_REGISTERS: tuple[SilkRegister, ...] = (
+    SilkRegister(0, "register_0", known=False),
+    SilkRegister(1, "register_1", known=False),
+    SilkRegister(2, "current_hour"), # useless
+    SilkRegister(3, "current_minute"), # useless
+    SilkRegister(4, "water_hardness", unit="ppm"), # hardness_in
+    SilkRegister(5, "register_5", known=False),
+    SilkRegister(6, "register_6", known=False),
+    SilkRegister(7, "last_regeneration_hour"), # last_regeneration_1
+    SilkRegister(8, "last_regeneration_minute"), # last_regeneration_1
+    SilkRegister(9, "register_9", known=False),
+    SilkRegister(10, "base_model_number"), # Probably useless?
+    SilkRegister(11, "duplex_setting"), # Probably useless?
+    SilkRegister(12, "register_12", known=False),
+    SilkRegister(13, "turbine_pulses_per_liter"), # Probably useless?
+    SilkRegister(14, "avg_water_served_per_day", unit="L"), # Probably useless? HA will have better statistics
+    SilkRegister(15, "total_water_served", 100, "L"), # total_output
+    SilkRegister(16, "current_flow_rate", 60, "L/h"), # current_flow, the device reports l/m
+    SilkRegister(
+        17, "days_in_service", unit="d",
+        entity=SilkEntity("days_in_service", icon="mdi:counter"),
+    ),
+    SilkRegister(
+        18, "warranty_days_remaining", unit="d",
+        entity=SilkEntity("warranty_days_remaining", icon="mdi:counter"),
+    ),
+    SilkRegister(19, "total_number_of_recharges"), # regeneration_count_1
+    SilkRegister(20, "register_20", known=False),
+    SilkRegister(21, "register_21", known=False),
+    SilkRegister(22, "register_22", known=False),
+    SilkRegister(23, "remaining_capacity", unit="L"), # capacity_1
+    SilkRegister(24, "register_24", known=False),
+    SilkRegister(25, "dwell_duration", unit="min"), # useless
+    SilkRegister(26, "brine_duration", unit="min"), # useless
+    SilkRegister(27, "allow_changing_salt_type"), # [bool] useless
+    SilkRegister(28, "allow_changing_regen_time"), # [bool] useless
+    SilkRegister(29, "register_29", known=False),
+    SilkRegister(30, "regenerativ_capacity"), # 31/30 = salt %
+    SilkRegister(31, "regenerativ_remaining"), # 31/30 = salt %
+    SilkRegister(32, "register_32", known=False),
+    SilkRegister(33, "register_33", known=False),
+    SilkRegister(
+        34, "days_until_service", unit="d",
+        entity=SilkEntity(
+            "next_customer_service", "timestamp", icon="mdi:wrench-clock"
+        ),
+    ),
+    SilkRegister(35, "register_35", known=False),
+    SilkRegister(36, "register_36", known=False),
+    SilkRegister(37, "register_37", known=False),
+    SilkRegister(38, "register_38", known=False),
+    SilkRegister(39, "register_39", known=False),
+    SilkRegister(40, "register_40", known=False),
+    SilkRegister(41, "register_41", known=False),
+    SilkRegister(42, "daily_water_usage", unit="L"), # day_output
+    SilkRegister(43, "register_43", known=False),
+    SilkRegister(44, "register_44", known=False),
+    SilkRegister(45, "register_45", known=False),
+    SilkRegister(46, "register_46", known=False),
+    SilkRegister(47, "register_47", known=False),
+)
+
+assert all(register.index == i for i, register in enumerate(SILK_REGISTERS))
+
+REGISTER_COUNT = len(SILK_REGISTERS)
+UNKNOWN_REGISTERS = tuple(r.index for r in SILK_REGISTERS if not r.known)
+SILK_ENTITIES = tuple(r.entity for r in SILK_REGISTERS if r.entity is not None)
+
+# Fixed layout record, one field per register, holding the scaled values
+SilkRecord = NamedTuple(
+    "SilkRecord", [(register.name, int | None) for register in SILK_REGISTERS]
+)
+
+_SCALES = tuple(register.scale for register in SILK_REGISTERS)
+
+# Registers every snapshot value is decoded from. The raw "registers" need
+# the whole dump, a single unknown register only itself.
+FIELD_REGISTERS: dict[str, tuple[int, ...]] = {
+    "current_flow": (16,),
+    "total_output": (15,),
+    "hardness_in": (4,),
+    "regenerativ_level": (30, 31),
+    "day_output": (42,),
+    "capacity_1": (23,),
+    "last_regeneration_1": (7, 8),
+    "regeneration_count_1": (19,),
+    "next_customer_service": (34,),
+    "days_in_service": (17,),
+    "warranty_days_remaining": (18,),
+    "registers": tuple(range(REGISTER_COUNT)),
+    **{r.name: (r.index,) for r in SILK_REGISTERS if not r.known},
+}
+
+# The fast values of the Silk, each decoded from a single register
+_FAST_REGISTERS: dict[str, int] = {
+    field: indices[0]
+    for field, indices in FIELD_REGISTERS.items()
+    if field in FAST_FIELDS
+}
+
+assert all(len(FIELD_REGISTERS[field]) == 1 for field in _FAST_REGISTERS)
+assert all(entity.key in FIELD_REGISTERS for entity in SILK_ENTITIES)
+
+
+def register_ranges(fields: Iterable[str]) -> tuple[range, ...]:
+    """Return the fewest contiguous register ranges holding the fields."""
+    indices = sorted(
+        {index for field in fields for index in FIELD_REGISTERS.get(field, ())}
+    )
+    ranges: list[range] = []
+    for index in indices:
+        if ranges and ranges[-1].stop == index:
+            ranges[-1] = range(ranges[-1].start, index + 1)
+        else:
+            ranges.append(range(index, index + 1))
+    return tuple(ranges)
+
+
+def decode_registers(
+    raw: list[int], ranges: Iterable[range] | None = None
+) -> SilkRecord:
+    """Decode a raw register dump in one pass, missing registers are None.
+
+    With ranges only these registers are decoded, all others are None.
+    """
+    if ranges is not None:
+        values: list[int | None] = [None] * REGISTER_COUNT
+        for register_range in ranges:
+            for index in register_range:
+                if index < len(raw):
+                    values[index] = raw[index] * _SCALES[index]
+        return SilkRecord._make(values)
+    if len(raw) < REGISTER_COUNT:
+        raw = list(raw) + [None] * (REGISTER_COUNT - len(raw))
+    return SilkRecord._make(
+        value if value is None or scale == 1 else value * scale
+        for value, scale in zip(raw, _SCALES)
+    )
+
+
 class SilkApiData(ApiData):
     """Data class for BWT Perla Silk API data."""
-    _registers: list[int]
-
-    def __init__(self, registers: list[int]) -> None:
-        """Initialize the SilkApiData with a list of registers."""
-        self._registers = registers
-    
-    def current_flow(self) -> int:
-        return self.get_register(CURRENT_FLOW_RATE) * 60 # l/m -> l/h
-
-    def total_output(self) -> int:
-        return self.get_register(TOTAL_WATER_SERVED) * 100
-
-    def hardness_in(self):
-        return self.get_register(WATER_HARDNESS)
-
-    def next_customer_service(self) -> int:
-        service_days = self.get_register(DAYS_UNTIL_SERVICE)
-        return (datetime.now().astimezone() + timedelta(days=service_days)).replace(hour = 0, minute = 0, second = 0, microsecond = 0)
-
-    def regenerativ_level(self) -> int:
-        return int(self.get_register(REGENERATIV_REMAINING) / self.get_register(REGENERATIV_CAPACITY) * 100)
-    
-    def day_output(self) -> int:
-        return self.get_register(DAILY_WATER_USAGE)
-    
-    def capacity_1(self) -> int:
-        return self.get_register(REMAINING_CAPACITY)
-    
-    def last_regeneration_1(self) -> datetime:
-        hour = self.get_register(LAST_REGENERATION_HOUR)
-        minute = self.get_register(LAST_REGENERATION_MINUTE)
+    _raw: list[int]
+    _record: SilkRecord
+
+    def __init__(
+        self, registers: list[int], ranges: tuple[range, ...] | None = None
+    ) -> None:
+        """Initialize the SilkApiData with a list of registers.
+
+        Values outside of the ranges are not decoded and None, all of them
+        are decoded without ranges.
+        """
+        self._raw = registers
+        self._ranges = ranges
+
+    def snapshot(self, previous: BwtSnapshot | None = None) -> BwtSnapshot:
+        """Normalize the registers into a snapshot."""
+        if previous is not None:
+            return previous.replace(
+                **{
+                    field: self._scaled(index)
+                    for field, index in _FAST_REGISTERS.items()
+                }
+            )
+
+        record = self._record = decode_registers(self._raw, self._ranges)
         now = datetime.now().astimezone()
+        return BwtSnapshot(
+            current_flow=record.current_flow_rate,
+            total_output=record.total_water_served,
+            hardness_in=record.water_hardness,
+            regenerativ_level=self._regenerativ_level(),
+            day_output=record.daily_water_usage,
+            capacity_1=record.remaining_capacity,
+            last_regeneration_1=self._last_regeneration(now),
+            regeneration_count_1=record.total_number_of_recharges,
+            next_customer_service=self._next_customer_service(now),
+            days_in_service=record.days_in_service,
+            warranty_days_remaining=record.warranty_days_remaining,
+            registers=record,
+        )
+
+    def _scaled(self, index: int) -> int | None:
+        """Decode a single register."""
+        if index >= len(self._raw):
+            return None
+        return self._raw[index] * _SCALES[index]
+
+    def _regenerativ_level(self) -> int | None:
+        remaining = self._record.regenerativ_remaining
+        capacity = self._record.regenerativ_capacity
+        if remaining is None or capacity is None:
+            return None
+        return int(remaining / capacity * 100)
+
+    def _next_customer_service(self, now: datetime) -> datetime | None:
+        days = self._record.days_until_service
+        if days is None:
+            return None
+        return (now + timedelta(days=days)).replace(hour = 0, minute = 0, second = 0, microsecond = 0)
+
+    def _last_regeneration(self, now: datetime) -> datetime | None:
+        hour = self._record.last_regeneration_hour
+        minute = self._record.last_regeneration_minute
+        if hour is None or minute is None:
+            return None
         if hour < now.hour or (hour == now.hour and minute <= now.minute):
             # today
             return now.replace(hour=hour, minute=minute, second=0, microsecond=0)
         
         # yesterday
         return now.replace(hour=hour, minute=minute, second=0, microsecond=0) - timedelta(days=1)
-    
-    def days_in_service(self) -> int:
-        return self.get_register(DAYS_IN_SERVICE)
-    
-    def warranty_days_remaining(self) -> int:
-        return self.get_register(WARRANTY_DAYS_REMAINING)
-    
-    def regeneration_count_1(self) -> int:
-        return self.get_register(TOTAL_NUMBER_OF_RECHARGES)
-
-    def get_register(self, index: int) -> int | None:
-        if index < 0 or index >= len(self._registers):
-            return None
-        return self._registers[index]
-
-CURRENT_HOUR = 2 # useless
-CURRENT_MINUTE = 3 # useless
-
-WATER_HARDNESS = 4 # ppm
-
-LAST_REGENERATION_HOUR = 7 # last_regeneration_1
-LAST_REGENERATION_MINUTE = 8 # last_regeneration_1
-
-BASE_MODEL_NUMBER = 10 # Probably useless?
-DUPLEX_SETTING = 11 # Probably useless?
-
-TURBINE_PULSES_PER_LITER = 13 # Probably useless?
-AVG_WATER_SERVED_PER_DAY = 14 # Probably useless? HA will have better statistics
-TOTAL_WATER_SERVED = 15 # total_output
-CURRENT_FLOW_RATE = 16 # current_flow
-DAYS_IN_SERVICE = 17 # days_in_service
-WARRANTY_DAYS_REMAINING = 18 # warranty_days_remaining
-TOTAL_NUMBER_OF_RECHARGES = 19 # regeneration_count_1
-
-REMAINING_CAPACITY = 23 # capacity_1
-
-DWELL_DURATION = 25 # [min] useless
-BRINE_DURATION = 26 # [min] useless
-ALLOW_CHANGING_SALT_TYPE = 27 # [bool] useless
-ALLOW_CHANGING_REGEN_TIME = 28 # [bool] useless
-
-REGENERATIV_CAPACITY = 30 # 31/30 = salt %
-REGENERATIV_REMAINING = 31 # 31/30 = salt %
-
-DAYS_UNTIL_SERVICE = 34 # next_customer_service
-
-DAILY_WATER_USAGE = 42 # day_output
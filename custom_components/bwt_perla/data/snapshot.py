@@ -0,0 +1,171 @@
+from datetime import datetime
+from typing import Any
+
+from bwt_api.error import BwtError
+
+_DATETIME_FIELDS = frozenset(
+    {
+        "last_regeneration_1",
+        "last_regeneration_2",
+        "customer_service",
+        "technician_service",
+        "holiday_mode_start",
+        "next_customer_service",
+    }
+)
+
+# Values changing with every draw of water, and the state and errors of the
+# device, which must not be missed. All others change a few times a year and
+# are only decoded on the slow cadence.
+FAST_FIELDS = frozenset(
+    {
+        "current_flow",
+        "total_output",
+        "day_output",
+        "month_output",
+        "year_output",
+        "capacity_1",
+        "capacity_2",
+        "state",
+        "errors",
+        "fatal_errors",
+        "warnings",
+    }
+)
+
+
+class BwtSnapshot:
+    """Immutable values of one poll, every derived value computed once.
+
+    Values the device model does not provide are None.
+    """
+
+    __slots__ = (
+        # All models
+        "current_flow",
+        "total_output",
+        "hardness_in",
+        "regenerativ_level",
+        "day_output",
+        "capacity_1",
+        "last_regeneration_1",
+        "regeneration_count_1",
+        # Local api
+        "columns",
+        "firmware_version",
+        "hardness_out",
+        "customer_service",
+        "technician_service",
+        "capacity_2",
+        "last_regeneration_2",
+        "regeneration_count_2",
+        "errors",
+        "fatal_errors",
+        "warnings",
+        "state",
+        "holiday_mode",
+        "holiday_mode_active",
+        "holiday_mode_start",
+        "regenerativ_days",
+        "regenerativ_total",
+        "month_output",
+        "year_output",
+        # Silk
+        "next_customer_service",
+        "days_in_service",
+        "warranty_days_remaining",
+        "registers",
+    )
+
+    current_flow: int
+    total_output: int
+    hardness_in: int
+    regenerativ_level: int
+    day_output: float
+    capacity_1: float
+    last_regeneration_1: datetime
+    regeneration_count_1: int
+    columns: int | None
+    firmware_version: str | None
+    hardness_out: int | None
+    customer_service: datetime | None
+    technician_service: datetime | None
+    capacity_2: float | None
+    last_regeneration_2: datetime | None
+    regeneration_count_2: int | None
+    errors: tuple[BwtError, ...] | None
+    fatal_errors: str | None
+    warnings: str | None
+    state: str | None
+    holiday_mode: int | None
+    holiday_mode_active: bool | None
+    holiday_mode_start: datetime | None
+    regenerativ_days: int | None
+    regenerativ_total: int | None
+    month_output: float | None
+    year_output: float | None
+    next_customer_service: datetime | None
+    days_in_service: int | None
+    warranty_days_remaining: int | None
+    registers: tuple[int | None, ...] | None
+
+    def __init__(self, **values) -> None:
+        """Initialize the snapshot, missing values are None."""
+        for name in self.__slots__:
+            object.__setattr__(self, name, values.pop(name, None))
+        if values:
+            raise TypeError(f"Unknown snapshot values: {', '.join(values)}")
+
+    def __setattr__(self, name, value) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __repr__(self) -> str:
+        values = ", ".join(
+            f"{name}={getattr(self, name)!r}"
+            for name in self.__slots__
+            if getattr(self, name) is not None
+        )
+        return f"{type(self).__name__}({values})"
+
+    def replace(self, **values) -> "BwtSnapshot":
+        """Return a copy with some values replaced."""
+        return type(self)(
+            **{name: getattr(self, name) for name in self.__slots__} | values
+        )
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the values as json serializable dict, without None values."""
+        values = {}
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if value is None:
+                continue
+            if name in _DATETIME_FIELDS:
+                value = value.isoformat()
+            elif name == "errors":
+                value = [error.value for error in value]
+            elif name == "registers":
+                value = list(value)
+            values[name] = value
+        return values
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "BwtSnapshot":
+        """Create a snapshot from the result of as_dict."""
+        values = {name: data[name] for name in cls.__slots__ if name in data}
+        for name in _DATETIME_FIELDS & values.keys():
+            values[name] = datetime.fromisoformat(values[name])
+        if "errors" in values:
+            values["errors"] = tuple(BwtError(value) for value in values["errors"])
+        if "registers" in values:
+            values["registers"] = tuple(values["registers"])
+        return cls(**values)
+
+    def register(self, index: int) -> int | None:
+        """Return a decoded Silk register, None if not available."""
+        if self.registers is None or index < 0 or index >= len(self.registers):
+            return None
+        return self.registers[index]
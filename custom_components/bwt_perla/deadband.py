@@ -0,0 +1,65 @@
+"""Deadbands suppressing insignificant changes of measurements."""
+
+from dataclasses import dataclass
+from typing import Any
+
+from bwt_api.bwt import BwtModel
+
+from .const import CONF_DEADBANDS, CONF_MAX_SILENCE
+
+DEFAULT_MAX_SILENCE = 900
+
+# Measurement sensors that can have a deadband
+DEADBAND_KEYS: dict[BwtModel, list[str]] = {
+    BwtModel.PERLA_LOCAL_API: [
+        "current_flow",
+        "capacity_1",
+        "capacity_2",
+        "regenerativ_level",
+        "regenerativ_days",
+        "regenerativ_mass",
+    ],
+    BwtModel.PERLA_SILK: [
+        "current_flow",
+        "capacity_1",
+        "regenerativ_level",
+    ],
+}
+
+
+@dataclass(frozen=True, slots=True)
+class Deadband:
+    """Changes within absolute or relative of the last written value are dropped.
+
+    A suppressed value is still written once max_silence seconds passed since
+    the last write, so the recorder never lags behind for long.
+    """
+
+    absolute: float
+    relative: float
+    max_silence: float
+
+    def suppresses(self, old: Any, new: Any, silence: float) -> bool:
+        """Return True if the new value does not need to be written."""
+        if not isinstance(old, (int, float)) or not isinstance(new, (int, float)):
+            return False
+        if silence >= self.max_silence:
+            return False
+        if (old == 0) != (new == 0):
+            # Starting and stopping is always significant
+            return False
+        diff = abs(new - old)
+        return diff <= self.absolute or diff <= self.relative * abs(old)
+
+
+def deadband_for(options: dict[str, Any], key: str) -> Deadband | None:
+    """Return the deadband configured for a sensor, None if there is none.
+
+    The options hold [absolute, relative in percent] per sensor key.
+    """
+    absolute, relative = options.get(CONF_DEADBANDS, {}).get(key, (0, 0))
+    if absolute <= 0 and relative <= 0:
+        return None
+    return Deadband(
+        absolute, relative / 100, options.get(CONF_MAX_SILENCE, DEFAULT_MAX_SILENCE)
+    )
@@ -0,0 +1,64 @@
+"""Diagnostics support for BWT Perla."""
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_CODE, CONF_HOST
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+from .coordinator import BwtCoordinator
+from .scheduler import async_get_scheduler
+
+TO_REDACT = {CONF_CODE, CONF_HOST}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    coordinator: BwtCoordinator = hass.data[DOMAIN][entry.entry_id]
+    scheduler = async_get_scheduler(hass)
+    return {
+        "entry": {
+            "data": async_redact_data(entry.data, TO_REDACT),
+            "options": dict(entry.options),
+        },
+        "polling": {
+            "update_interval": coordinator.poll_interval.total_seconds(),
+            "next_poll_delay": coordinator.next_poll_delay(),
+            "fast_poll_remaining": coordinator.fast_poll_remaining,
+            "tier": coordinator.tier,
+            "data_age": coordinator.data_age,
+            "last_update_success": coordinator.last_update_success,
+            "timeout": coordinator.rtt.timeout,
+            "timeout_backoff": coordinator.rtt.backoff,
+            "srtt": coordinator.rtt.srtt,
+            "rttvar": coordinator.rtt.rttvar,
+            "rtt_p95": coordinator.rtt.p95,
+            "breaker": coordinator.breaker.state,
+            "consecutive_failures": coordinator.breaker.failures,
+            "demanded": (
+                None
+                if coordinator.demanded is None
+                else sorted(coordinator.demanded)
+            ),
+            "register_ranges": (
+                None
+                if coordinator.register_ranges is None
+                else [[r.start, r.stop - 1] for r in coordinator.register_ranges]
+            ),
+            **coordinator.stats.as_dict(),
+        },
+        "scheduler": {
+            **scheduler.stats(),
+            "device": scheduler.device_stats(entry.entry_id),
+        },
+        "state_writes": {
+            "written": coordinator.state_writes,
+            "skipped": coordinator.state_writes_skipped,
+            "suppressed": coordinator.state_writes_suppressed,
+        },
+        "data": None if coordinator.data is None else coordinator.data.as_dict(),
+    }
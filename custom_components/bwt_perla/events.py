@@ -0,0 +1,93 @@
+"""Events fired on transitions of the device state.
+
+The snapshots of two polls are compared on every poll, so automations get an
+edge to trigger on instead of watching the states. Fast polls carry the slow
+values over from the previous snapshot, so these are only compared when a
+poll decodes them.
+"""
+
+from typing import Any
+
+from .const import DOMAIN
+from .data.snapshot import BwtSnapshot
+
+EVENT_REGENERATION = f"{DOMAIN}_regeneration"
+EVENT_ERROR_RAISED = f"{DOMAIN}_error_raised"
+EVENT_ERROR_CLEARED = f"{DOMAIN}_error_cleared"
+EVENT_SALT_LOW = f"{DOMAIN}_salt_low"
+EVENT_SALT_REFILLED = f"{DOMAIN}_salt_refilled"
+EVENT_HOLIDAY_MODE = f"{DOMAIN}_holiday_mode"
+
+# Snapshot values the transitions are computed from
+TRANSITION_FIELDS = (
+    "regeneration_count_1",
+    "regeneration_count_2",
+    "last_regeneration_1",
+    "last_regeneration_2",
+    "errors",
+    "regenerativ_level",
+    "holiday_mode_active",
+)
+
+
+def transitions(
+    previous: BwtSnapshot, current: BwtSnapshot, salt_threshold: int
+) -> list[tuple[str, dict[str, Any]]]:
+    """Return the events between two snapshots.
+
+    Values missing in either snapshot, e.g. of another model, are skipped.
+    """
+    events: list[tuple[str, dict[str, Any]]] = []
+
+    for column in (1, 2):
+        before = getattr(previous, f"regeneration_count_{column}")
+        after = getattr(current, f"regeneration_count_{column}")
+        if before is not None and after is not None and after > before:
+            # The devices only count finished regenerations
+            started = getattr(current, f"last_regeneration_{column}")
+            events.append(
+                (
+                    EVENT_REGENERATION,
+                    {
+                        "column": column,
+                        "count": after,
+                        "started": None if started is None else started.isoformat(),
+                    },
+                )
+            )
+
+    if previous.errors is not None and current.errors is not None:
+        before = set(previous.errors)
+        after = set(current.errors)
+        for event_type, errors in (
+            (EVENT_ERROR_RAISED, after - before),
+            (EVENT_ERROR_CLEARED, before - after),
+        ):
+            for error in sorted(errors, key=lambda error: error.value):
+                events.append(
+                    (
+                        event_type,
+                        {
+                            "error": error.name,
+                            "code": error.value,
+                            "fatal": error.is_fatal(),
+                        },
+                    )
+                )
+
+    before = previous.regenerativ_level
+    after = current.regenerativ_level
+    if before is not None and after is not None:
+        if before >= salt_threshold > after:
+            events.append((EVENT_SALT_LOW, {"level": after, "threshold": salt_threshold}))
+        elif before < salt_threshold <= after:
+            events.append(
+                (EVENT_SALT_REFILLED, {"level": after, "threshold": salt_threshold})
+            )
+
+    before = previous.holiday_mode_active
+    after = current.holiday_mode_active
+    if before is not None and after is not None and before != after:
+        events.append((EVENT_HOLIDAY_MODE, {"active": after}))
+
+    return events
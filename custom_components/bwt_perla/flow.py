@@ -0,0 +1,82 @@
+"""Litre resolution consumption, integrated from flow samples."""
+
+from array import array
+from collections.abc import Iterator
+
+_DEFAULT_CAPACITY = 256
+# Samples further apart than this are not interpolated
+_MAX_GAP = 120.0
+
+
+class FlowIntegrator:
+    """Ring buffer of (timestamp, flow) samples and their integral.
+
+    The device total only ticks every `resolution` litres. Between two ticks
+    the flow samples are integrated with the trapezoidal rule. The estimate is
+    kept below the next tick and re-anchored to the device total whenever it
+    ticks, so integration errors never add up.
+    """
+
+    def __init__(self, resolution: int, capacity: int = _DEFAULT_CAPACITY) -> None:
+        """Initialize the integrator for a device total of the given resolution."""
+        self.resolution = resolution
+        self._capacity = capacity
+        self._times = array("d", bytes(8 * capacity))
+        self._flows = array("d", bytes(8 * capacity))
+        self._next = 0
+        self._size = 0
+        self._anchor: int | None = None
+        self._integral = 0.0
+        self._restored: float | None = None
+        self.total: float | None = None
+
+    def __len__(self) -> int:
+        """Return the number of buffered samples."""
+        return self._size
+
+    def samples(self) -> Iterator[tuple[float, float]]:
+        """Yield the buffered samples, oldest first."""
+        start = (self._next - self._size) % self._capacity
+        for i in range(self._size):
+            index = (start + i) % self._capacity
+            yield self._times[index], self._flows[index]
+
+    def add(self, timestamp: float, flow: float, device_total: int) -> float:
+        """Add a flow sample in l/h and return the estimated total in litres."""
+        if self._size:
+            previous = (self._next - 1) % self._capacity
+            elapsed = timestamp - self._times[previous]
+            if 0 < elapsed <= _MAX_GAP:
+                self._integral += (self._flows[previous] + flow) / 2 * elapsed / 3600
+
+        self._times[self._next] = timestamp
+        self._flows[self._next] = flow
+        self._next = (self._next + 1) % self._capacity
+        self._size = min(self._size + 1, self._capacity)
+
+        if device_total != self._anchor:
+            if self._anchor is not None and device_total < self._anchor:
+                # The device was reset, start counting again
+                self.total = None
+            self._anchor = device_total
+            self._integral = 0.0
+            if self._restored is not None:
+                self._restore(self._restored)
+                self._restored = None
+
+        estimate = device_total + min(self._integral, self.resolution - 1)
+        self.total = estimate if self.total is None else max(self.total, estimate)
+        return self.total
+
+    def restore(self, total: float) -> None:
+        """Continue from a total estimated before a restart."""
+        if self._anchor is None:
+            # Applied once the first device total is known
+            self._restored = total
+            return
+        self._restore(total)
+
+    def _restore(self, total: float) -> None:
+        if self._anchor <= total < self._anchor + self.resolution:
+            self._integral = total - self._anchor
+            self.total = max(self.total or 0.0, total)
@@ -0,0 +1,122 @@
+"""Round trip times and reachability of a device."""
+
+import logging
+import random
+
+_LOGGER = logging.getLogger(__name__)
+
+# Smoothing like the TCP retransmission timer (RFC 6298)
+_ALPHA = 0.125
+_BETA = 0.25
+_QUANTILE = 0.95
+# Step of the quantile estimate, relative to the smoothed round trip time
+_QUANTILE_GAIN = 0.1
+
+# Timeout of a poll, before the first round trip the maximum is used
+MIN_TIMEOUT = 1.0
+MAX_TIMEOUT = 10.0
+
+# Failed polls in a row opening the breaker
+_OPEN_AFTER = 3
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 300.0
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class RttEstimator:
+    """Smoothed round trip time and a streaming estimate of its p95."""
+
+    def __init__(self) -> None:
+        """Initialize the estimator without samples."""
+        self.srtt: float | None = None
+        self.rttvar = 0.0
+        self.p95 = 0.0
+        # Factor of the timeout after timed out polls, they leave no sample
+        self.backoff = 1.0
+
+    def add(self, rtt: float) -> None:
+        """Add the round trip time of a successful poll in seconds."""
+        self.backoff = max(1.0, self.backoff / 2)
+        if self.srtt is None:
+            self.srtt = self.p95 = rtt
+            self.rttvar = rtt / 2
+            return
+        self.rttvar += _BETA * (abs(self.srtt - rtt) - self.rttvar)
+        self.srtt += _ALPHA * (rtt - self.srtt)
+        # Moves up 19 times as far as down, so it settles where 5% are above
+        step = _QUANTILE_GAIN * self.srtt
+        if rtt > self.p95:
+            self.p95 += step * _QUANTILE
+        else:
+            self.p95 = max(0.0, self.p95 - step * (1 - _QUANTILE))
+
+    def timed_out(self) -> None:
+        """Double the timeout after a timed out poll, like RFC 6298 does."""
+        self.backoff = min(self.backoff * 2, MAX_TIMEOUT / MIN_TIMEOUT)
+
+    @property
+    def timeout(self) -> float:
+        """Return the timeout for the next poll in seconds."""
+        if self.srtt is None:
+            return MAX_TIMEOUT
+        return min(
+            MAX_TIMEOUT,
+            self.backoff
+            * max(MIN_TIMEOUT, 2 * self.p95, self.srtt + 4 * self.rttvar),
+        )
+
+
+class CircuitBreaker:
+    """Stops polling a device that stopped answering.
+
+    After _OPEN_AFTER failed polls in a row the breaker opens. While it is
+    open the device only gets a TCP connect instead of a poll, at a jittered
+    exponential back-off. Once it connects the breaker is half open and the
+    next poll decides whether it closes or opens again. Transitions are
+    logged once, not every failure.
+    """
+
+    def __init__(self, name: str) -> None:
+        """Initialize a closed breaker."""
+        self.name = name
+        self.state = STATE_CLOSED
+        self.failures = 0
+
+    def record_success(self) -> None:
+        """Close the breaker after a successful poll."""
+        if self.state != STATE_CLOSED:
+            _LOGGER.info(
+                "%s answers again after %s failed polls", self.name, self.failures
+            )
+        self.state = STATE_CLOSED
+        self.failures = 0
+
+    def record_failure(self, error: Exception | None) -> None:
+        """Count a failed poll or probe."""
+        self.failures += 1
+        if self.state == STATE_HALF_OPEN or (
+            self.state == STATE_CLOSED and self.failures >= _OPEN_AFTER
+        ):
+            if self.state == STATE_CLOSED:
+                _LOGGER.warning(
+                    "%s stopped answering (%r), only probing it until it is back",
+                    self.name,
+                    error,
+                )
+            self.state = STATE_OPEN
+
+    def probe_succeeded(self) -> None:
+        """Let the next poll through."""
+        _LOGGER.debug("%s accepts connections again", self.name)
+        self.state = STATE_HALF_OPEN
+
+    def retry_delay(self) -> float | None:
+        """Return the back-off in seconds after failures, None without."""
+        if not self.failures:
+            return None
+        delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** min(self.failures - 1, 16))
+        # Equal jitter, keeps at least half of the delay
+        return delay / 2 + random.uniform(0, delay / 2)
@@ -0,0 +1,294 @@
+"""Append-only journal of the raw Silk registers.
+
+Only registers that changed since the previous poll are stored. The file is a
+magic header followed by records, all integers are LEB128 varints:
+
+    K <timestamp ms> <count> <value>...              all registers
+    D <ms since previous record> <count> (<index gap> <value delta>)...
+
+Index gaps are counted from the previous changed register + 1, value deltas
+are zigzag encoded. Every session starts with a keyframe, so a reader never
+needs state from an earlier session.
+
+Once the file reaches _MAX_SIZE it is renamed to <entry id>.journal.1,
+replacing the one before, and a new file is started with a keyframe.
+"""
+
+import asyncio
+from collections.abc import Iterator
+import csv
+from datetime import datetime
+import logging
+import os
+import threading
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+_MAGIC = b"BWTJ\x01"
+_KEYFRAME = ord("K")
+_DELTA = ord("D")
+# Buffered bytes are written at least this often
+_FLUSH_DELAY = 60
+_FLUSH_SIZE = 4096
+# Size of a file before it is rotated, weeks of one poll per second
+_MAX_SIZE = 32 * 1024 * 1024
+_ROTATED_SUFFIX = ".1"
+
+
+def _write_varint(buffer: bytearray, value: int) -> None:
+    while value > 0x7F:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def _read_varint(data: bytes, pos: int) -> tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _zigzag(value: int) -> int:
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def _unzigzag(value: int) -> int:
+    return value >> 1 if not value & 1 else -(value >> 1) - 1
+
+
+def decode_journal(data: bytes) -> Iterator[tuple[int, dict[int, int]]]:
+    """Yield the timestamp in ms and the changed registers of every record."""
+    if not data.startswith(_MAGIC):
+        raise ValueError("Not a register journal")
+    pos = len(_MAGIC)
+    timestamp = 0
+    registers: list[int] = []
+    while pos < len(data):
+        kind = data[pos]
+        pos += 1
+        if kind == _KEYFRAME:
+            timestamp, pos = _read_varint(data, pos)
+            count, pos = _read_varint(data, pos)
+            registers = []
+            for _ in range(count):
+                value, pos = _read_varint(data, pos)
+                registers.append(_unzigzag(value))
+            yield timestamp, dict(enumerate(registers))
+        elif kind == _DELTA:
+            delta, pos = _read_varint(data, pos)
+            timestamp += delta
+            count, pos = _read_varint(data, pos)
+            changes = {}
+            index = -1
+            for _ in range(count):
+                gap, pos = _read_varint(data, pos)
+                value, pos = _read_varint(data, pos)
+                index += gap + 1
+                registers[index] += _unzigzag(value)
+                changes[index] = registers[index]
+            yield timestamp, changes
+        else:
+            raise ValueError(f"Corrupt register journal at byte {pos - 1}")
+
+
+class RegisterJournal:
+    """Journal of register changes of one device."""
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        """Initialize the journal, nothing is written before the first poll."""
+        self._hass = hass
+        self.path = journal_path(hass, entry_id)
+        self._buffer = bytearray()
+        self._last: list[int] | None = None
+        self._last_timestamp = 0
+        self._unsub_flush: CALLBACK_TYPE | None = None
+        # Writes run one after another, every record depends on the one before
+        self._write: asyncio.Task | None = None
+        # Size of the file before the first write and bytes written since,
+        # unknown until the first write
+        self._initial_size: int | None = None
+        self._written = 0
+        self._rotate = False
+        # Exports read the file while a write may run
+        self._lock = threading.Lock()
+
+    @callback
+    def async_record(self, moment: datetime, registers: list[int]) -> None:
+        """Add the registers of a poll, if any of them changed."""
+        timestamp = int(moment.timestamp() * 1000)
+        if (
+            self._initial_size is not None
+            and self._initial_size + self._written + len(self._buffer) >= _MAX_SIZE
+        ):
+            # The rest goes to the old file, the new one starts with a keyframe
+            self.async_flush()
+            self._initial_size = 0
+            self._written = 0
+            self._rotate = True
+            self._last = None
+        buffer = self._buffer
+        last = self._last
+        if last is None or len(last) != len(registers):
+            buffer.append(_KEYFRAME)
+            _write_varint(buffer, timestamp)
+            _write_varint(buffer, len(registers))
+            for value in registers:
+                _write_varint(buffer, _zigzag(value))
+        else:
+            changed = [i for i, value in enumerate(registers) if value != last[i]]
+            if not changed:
+                return
+            buffer.append(_DELTA)
+            _write_varint(buffer, max(0, timestamp - self._last_timestamp))
+            _write_varint(buffer, len(changed))
+            previous = -1
+            for index in changed:
+                _write_varint(buffer, index - previous - 1)
+                _write_varint(buffer, _zigzag(registers[index] - last[index]))
+                previous = index
+        self._last = list(registers)
+        self._last_timestamp = timestamp
+
+        if len(buffer) >= _FLUSH_SIZE:
+            self.async_flush()
+        elif self._unsub_flush is None:
+            self._unsub_flush = async_call_later(
+                self._hass, _FLUSH_DELAY, self._async_flush_later
+            )
+
+    @callback
+    def _async_flush_later(self, _now: datetime) -> None:
+        self._unsub_flush = None
+        self.async_flush()
+
+    @callback
+    def async_flush(self) -> None:
+        """Write the buffered records in the executor, after earlier writes."""
+        if self._unsub_flush is not None:
+            self._unsub_flush()
+            self._unsub_flush = None
+        if not self._buffer:
+            return
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        self._written += len(data)
+        rotate = self._rotate
+        self._rotate = False
+        self._write = self._hass.async_create_task(
+            self._async_write(self._write, data, rotate),
+            f"{DOMAIN} register journal write",
+        )
+
+    async def _async_write(
+        self, previous: asyncio.Task | None, data: bytes, rotate: bool
+    ) -> None:
+        if previous is not None:
+            await previous
+        try:
+            size = await self._hass.async_add_executor_job(self._append, data, rotate)
+        except OSError as err:
+            _LOGGER.error("Could not write the register journal %s: %s", self.path, err)
+            return
+        if self._initial_size is None:
+            self._initial_size = size
+
+    async def async_close(self) -> None:
+        """Write everything that is still buffered."""
+        self.async_flush()
+        if self._write is not None:
+            await self._write
+
+    def _append(self, data: bytes, rotate: bool) -> int:
+        """Append to the file and return its size before."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._lock:
+            if rotate and os.path.exists(self.path):
+                os.replace(self.path, self.path + _ROTATED_SUFFIX)
+            with open(self.path, "ab") as file:
+                size = file.tell()
+                if size == 0:
+                    file.write(_MAGIC)
+                file.write(data)
+        return size
+
+    async def async_export(
+        self, start: datetime | None, end: datetime | None
+    ) -> tuple[str, int]:
+        """Write the changes between start and end to a csv file.
+
+        The first row of every register is its value at the start of the range.
+        Returns the path of the file and the number of rows.
+        """
+        await self.async_close()
+        suffix = dt_util.utcnow().strftime("%Y%m%d%H%M%S")
+        target = f"{os.path.splitext(self.path)[0]}_{suffix}.csv"
+        return target, await self._hass.async_add_executor_job(
+            self._export, target, start, end
+        )
+
+    def _export(self, target: str, start: datetime | None, end: datetime | None) -> int:
+        start_ms = None if start is None else int(start.timestamp() * 1000)
+        end_ms = None if end is None else int(end.timestamp() * 1000)
+        files = []
+        with self._lock:
+            for path in (self.path + _ROTATED_SUFFIX, self.path):
+                if os.path.exists(path):
+                    with open(path, "rb") as file:
+                        files.append(file.read())
+        if not files:
+            return 0
+
+        rows = 0
+        state: dict[int, int] = {}
+        emitted_start = False
+        with open(target, "w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(["timestamp", "register", "value"])
+            for timestamp, changes in (
+                record for data in files for record in decode_journal(data)
+            ):
+                if start_ms is not None and timestamp < start_ms:
+                    state.update(changes)
+                    continue
+                if end_ms is not None and timestamp > end_ms:
+                    break
+                if not emitted_start and state:
+                    moment = dt_util.utc_from_timestamp(start_ms / 1000).isoformat()
+                    for index, value in sorted(state.items()):
+                        writer.writerow([moment, index, value])
+                        rows += 1
+                emitted_start = True
+                moment = dt_util.utc_from_timestamp(timestamp / 1000).isoformat()
+                for index, value in sorted(changes.items()):
+                    writer.writerow([moment, index, value])
+                    rows += 1
+        return rows
+
+
+def journal_path(hass: HomeAssistant, entry_id: str) -> str:
+    """Return the path of the register journal of a config entry."""
+    return hass.config.path(DOMAIN, f"{entry_id}.journal")
+
+
+async def async_remove_journal(hass: HomeAssistant, entry_id: str) -> None:
+    """Remove the register journal of a config entry."""
+    path = journal_path(hass, entry_id)
+
+    def remove() -> None:
+        for file in (path, path + _ROTATED_SUFFIX):
+            if os.path.exists(file):
+                os.remove(file)
+
+    await hass.async_add_executor_job(remove)
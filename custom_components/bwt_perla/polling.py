@@ -0,0 +1,289 @@
+"""Policies deciding how often the coordinator polls the device."""
+
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+import logging
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .const import (
+    CONF_POLL_POLICY,
+    CONF_STATE_AWARE,
+    DOMAIN,
+    POLICY_CLASSIC,
+    POLICY_LEARNED,
+)
+from .data.snapshot import BwtSnapshot
+
+_LOGGER = logging.getLogger(__name__)
+
+UPDATE_INTERVAL_MIN = 1
+UPDATE_INTERVAL_MAX = 30
+
+_STORAGE_VERSION = 1
+_SAVE_DELAY = 300
+
+_HOURS_PER_WEEK = 7 * 24
+# Weight of the previous week compared to the current one
+_WEEKLY_DECAY = 0.8
+# Observation time a bucket needs before it is trusted
+_MIN_OBSERVED = 3600.0
+# Samples are capped, so a long outage does not count as one huge idle sample
+_MAX_SAMPLE = 900.0
+# How far ahead a likely draw already speeds up polling
+_LOOKAHEAD = timedelta(minutes=15)
+# Usage probability at which we poll every _LIKELY_INTERVAL seconds
+_P_REFERENCE = 0.1
+_LIKELY_INTERVAL = 5
+_IDLE_INTERVAL_MAX = 300
+
+# In holiday mode nobody should draw water
+_HOLIDAY_INTERVAL = 600
+# Regenerations usually start at the same time of day as the last one
+_REGENERATION_WINDOW = timedelta(minutes=30)
+_REGENERATION_INTERVAL = 10
+# Without flow the interval grows by this share of the idle time
+_IDLE_BACKOFF_SHARE = 0.1
+
+
+def calculate_update_interval(current_interval: timedelta | None, current_flow: int):
+    """Calculate the new update interval, based on the old one and the current flow."""
+
+    if current_flow > 0:
+        return timedelta(seconds=UPDATE_INTERVAL_MIN)
+    if current_interval is None:
+        return timedelta(seconds=UPDATE_INTERVAL_MAX)
+    if current_interval.seconds >= UPDATE_INTERVAL_MAX:
+        return current_interval
+    # Increase the interval to max step by step if there is no flow at the moment
+    return timedelta(seconds=min(UPDATE_INTERVAL_MAX, current_interval.seconds * 2))
+
+
+class PollPolicy(ABC):
+    """Decides the interval until the next poll."""
+
+    async def async_load(self) -> None:
+        """Load persisted state of the policy."""
+
+    async def async_unload(self) -> None:
+        """Persist the state of the policy."""
+
+    @abstractmethod
+    def next_interval(
+        self,
+        current: timedelta | None,
+        current_flow: int,
+        now: datetime,
+        data: BwtSnapshot | None = None,
+    ) -> timedelta:
+        """Return the interval until the next poll."""
+
+
+class ClassicPolicy(PollPolicy):
+    """Poll every second while water flows, double the interval otherwise."""
+
+    def next_interval(
+        self,
+        current: timedelta | None,
+        current_flow: int,
+        now: datetime,
+        data: BwtSnapshot | None = None,
+    ) -> timedelta:
+        """Return the interval until the next poll."""
+        return calculate_update_interval(current, current_flow)
+
+
+class UsageHistogram:
+    """Share of time water was drawn, per hour of the week.
+
+    Every bucket holds [active seconds, observed seconds, week number].
+    Old weeks fade out lazily when a bucket is touched again.
+    """
+
+    def __init__(self, buckets: list[list[float]] | None = None) -> None:
+        """Initialize an empty histogram or restore a persisted one."""
+        if buckets is None or len(buckets) != _HOURS_PER_WEEK:
+            buckets = [[0.0, 0.0, 0] for _ in range(_HOURS_PER_WEEK)]
+        self.buckets = buckets
+
+    @staticmethod
+    def _position(moment: datetime) -> tuple[int, int]:
+        """Return the bucket index and absolute week number of the moment."""
+        iso = moment.isocalendar()
+        week = iso.year * 53 + iso.week
+        return moment.weekday() * 24 + moment.hour, week
+
+    def add(self, moment: datetime, observed: float, active: float) -> None:
+        """Add a sample covering the given seconds."""
+        index, week = self._position(moment)
+        bucket = self.buckets[index]
+        if bucket[2] != week:
+            factor = _WEEKLY_DECAY ** max(1, week - int(bucket[2]))
+            bucket[0] *= factor
+            bucket[1] *= factor
+            bucket[2] = week
+        bucket[0] += active
+        bucket[1] += observed
+
+    def probability(self, moment: datetime) -> float | None:
+        """Return the share of time with flow, None if not learned yet."""
+        active, observed, _ = self.buckets[self._position(moment)[0]]
+        if observed < _MIN_OBSERVED:
+            return None
+        return active / observed
+
+
+class LearnedPolicy(PollPolicy):
+    """Poll ahead of the hours water is usually drawn, back off in the others."""
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        """Initialize the policy, the histogram is loaded in async_load."""
+        self._store: Store = Store(hass, _STORAGE_VERSION, storage_key(entry_id))
+        self.histogram = UsageHistogram()
+        self._last_sample: datetime | None = None
+        self._save_pending = False
+
+    async def async_load(self) -> None:
+        """Restore the learned histogram."""
+        if (stored := await self._store.async_load()) is not None:
+            self.histogram = UsageHistogram(stored.get("buckets"))
+
+    async def async_unload(self) -> None:
+        """Write the learned histogram."""
+        await self._store.async_save(self._data_to_save())
+
+    def _data_to_save(self) -> dict:
+        self._save_pending = False
+        return {"buckets": self.histogram.buckets}
+
+    def next_interval(
+        self,
+        current: timedelta | None,
+        current_flow: int,
+        now: datetime,
+        data: BwtSnapshot | None = None,
+    ) -> timedelta:
+        """Return the interval until the next poll."""
+        if self._last_sample is not None:
+            observed = min(_MAX_SAMPLE, (now - self._last_sample).total_seconds())
+            self.histogram.add(now, observed, observed if current_flow > 0 else 0.0)
+            # Every call restarts the delay, so only schedule once per write
+            if not self._save_pending:
+                self._save_pending = True
+                self._store.async_delay_save(self._data_to_save, _SAVE_DELAY)
+        self._last_sample = now
+
+        if current_flow > 0:
+            return timedelta(seconds=UPDATE_INTERVAL_MIN)
+
+        probabilities = [
+            p
+            for p in (
+                self.histogram.probability(now),
+                self.histogram.probability(now + _LOOKAHEAD),
+            )
+            if p is not None
+        ]
+        if not probabilities:
+            # Nothing learned for this hour yet
+            return calculate_update_interval(current, current_flow)
+
+        likelihood = max(probabilities)
+        if likelihood <= 0:
+            target = _IDLE_INTERVAL_MAX
+        else:
+            target = _LIKELY_INTERVAL * _P_REFERENCE / likelihood
+        target = min(_IDLE_INTERVAL_MAX, max(UPDATE_INTERVAL_MIN, target))
+
+        # Back off step by step after a draw, but speed up right away
+        if current is not None:
+            target = min(target, max(UPDATE_INTERVAL_MIN, current.total_seconds() * 2))
+        return timedelta(seconds=round(target))
+
+
+class StateAwarePolicy(PollPolicy):
+    """Adapts the interval of another policy to the state of the device.
+
+    Polls fast around the time of day of the last regeneration, slowly in
+    holiday mode and backs off the longer no water was drawn. Flow always
+    gets the interval of the other policy.
+    """
+
+    def __init__(self, policy: PollPolicy) -> None:
+        """Initialize the policy on top of another one."""
+        self.policy = policy
+        # The other policy continues from its own interval, not from ours
+        self._interval: timedelta | None = None
+        self._last_flow: datetime | None = None
+
+    async def async_load(self) -> None:
+        """Load persisted state of the other policy."""
+        await self.policy.async_load()
+
+    async def async_unload(self) -> None:
+        """Persist the state of the other policy."""
+        await self.policy.async_unload()
+
+    def next_interval(
+        self,
+        current: timedelta | None,
+        current_flow: int,
+        now: datetime,
+        data: BwtSnapshot | None = None,
+    ) -> timedelta:
+        """Return the interval until the next poll."""
+        interval = self._interval = self.policy.next_interval(
+            self._interval, current_flow, now, data
+        )
+        if current_flow > 0 or self._last_flow is None:
+            self._last_flow = now
+        if current_flow > 0 or data is None:
+            return interval
+
+        if _near_regeneration(data, now):
+            return min(interval, timedelta(seconds=_REGENERATION_INTERVAL))
+        if data.holiday_mode_active:
+            return max(interval, timedelta(seconds=_HOLIDAY_INTERVAL))
+        idle = (now - self._last_flow) * _IDLE_BACKOFF_SHARE
+        return max(interval, min(idle, timedelta(seconds=_IDLE_INTERVAL_MAX)))
+
+
+def _near_regeneration(data: BwtSnapshot, now: datetime) -> bool:
+    """Return True close to the time of day of the last regeneration."""
+    for last in (data.last_regeneration_1, data.last_regeneration_2):
+        if last is None:
+            continue
+        last = last.astimezone(now.tzinfo)
+        expected = now.replace(
+            hour=last.hour, minute=last.minute, second=0, microsecond=0
+        )
+        distance = abs(now - expected)
+        if min(distance, timedelta(days=1) - distance) <= _REGENERATION_WINDOW:
+            return True
+    return False
+
+
+def storage_key(entry_id: str) -> str:
+    """Return the storage key of the learned usage of a config entry."""
+    return f"{DOMAIN}.{entry_id}.usage"
+
+
+async def async_remove_usage(hass: HomeAssistant, entry_id: str) -> None:
+    """Remove the learned usage of a config entry."""
+    await Store(hass, _STORAGE_VERSION, storage_key(entry_id)).async_remove()
+
+
+def create_policy(hass: HomeAssistant, entry: ConfigEntry) -> PollPolicy:
+    """Create the poll policy configured for the config entry."""
+    name = entry.options.get(CONF_POLL_POLICY, POLICY_CLASSIC)
+    if name == POLICY_LEARNED:
+        policy: PollPolicy = LearnedPolicy(hass, entry.entry_id)
+    else:
+        if name != POLICY_CLASSIC:
+            _LOGGER.warning("Unknown poll policy %s, using %s", name, POLICY_CLASSIC)
+        policy = ClassicPolicy()
+    if entry.options.get(CONF_STATE_AWARE, False):
+        return StateAwarePolicy(policy)
+    return policy
@@ -0,0 +1,119 @@
+"""On demand profile of the poll and entity update path of one device.
+
+While a profile runs the coordinator of the device holds it and reports to
+it: the decoding and the entity updates run under cProfile, and they, the
+requests and the whole fan-out are timed by wall clock. Nothing is measured
+while no profile runs, and other devices are never measured.
+"""
+
+import cProfile
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import timedelta
+import json
+import logging
+import os
+import time
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.components import persistent_notification
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN
+from .stats import LatencyHistogram
+
+if TYPE_CHECKING:
+    from .coordinator import BwtCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+# cProfile allows one active profiler, so only one profile at a time
+_active: "CoordinatorProfiler | None" = None
+
+
+class CoordinatorProfiler:
+    """Profile of one coordinator for a fixed time."""
+
+    def __init__(self, hass: HomeAssistant, coordinator: "BwtCoordinator") -> None:
+        """Initialize the profiler, nothing is measured yet."""
+        self._hass = hass
+        self._coordinator = coordinator
+        self._profile = cProfile.Profile()
+        self._timings: dict[str, LatencyHistogram] = {}
+        self._base = ""
+
+    @staticmethod
+    def running() -> bool:
+        """Return True while any profile runs."""
+        return _active is not None
+
+    @callback
+    def async_start(self, duration: float) -> dict[str, Any]:
+        """Profile for duration seconds, return the files written afterwards.
+
+        A persistent notification tells when the files are written.
+        """
+        global _active  # pylint: disable=global-statement
+        if _active is not None:
+            raise RuntimeError("A profile is already running")
+        _active = self
+        suffix = dt_util.utcnow().strftime("%Y%m%d%H%M%S")
+        self._base = self._hass.config.path(DOMAIN, f"profile_{suffix}")
+        self._coordinator.profiler = self
+        async_call_later(self._hass, duration, self._async_stop)
+        return {
+            "profile": f"{self._base}.prof",
+            "timings": f"{self._base}.json",
+            "end": (dt_util.utcnow() + timedelta(seconds=duration)).isoformat(),
+        }
+
+    async def _async_stop(self, _now: Any = None) -> None:
+        global _active  # pylint: disable=global-statement
+        self._coordinator.profiler = None
+        _active = None
+
+        timings = {name: h.as_dict() for name, h in sorted(self._timings.items())}
+        await self._hass.async_add_executor_job(self._write, timings)
+        _LOGGER.info(
+            "Profile of %s written to %s.prof and %s.json",
+            self._coordinator.config_entry.title,
+            self._base,
+            self._base,
+        )
+        persistent_notification.async_create(
+            self._hass,
+            f"Written to `{self._base}.prof` and `{self._base}.json`.",
+            title=f"Profile of {self._coordinator.config_entry.title}",
+            notification_id=f"{DOMAIN}_profile",
+        )
+
+    def _write(self, timings: dict[str, Any]) -> None:
+        os.makedirs(os.path.dirname(self._base), exist_ok=True)
+        self._profile.dump_stats(f"{self._base}.prof")
+        with open(f"{self._base}.json", "w", encoding="utf-8") as file:
+            json.dump(timings, file, indent=2)
+
+    def add(self, name: str, seconds: float) -> None:
+        """Add a wall clock timing."""
+        if (histogram := self._timings.get(name)) is None:
+            histogram = self._timings[name] = LatencyHistogram()
+        histogram.add(seconds)
+
+    @contextmanager
+    def profiled(self, name: str) -> Iterator[None]:
+        """Run a synchronous section under cProfile and time it."""
+        try:
+            self._profile.enable()
+            enabled = True
+        except ValueError:
+            # Another profiler, like the one of HA, is active
+            enabled = False
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+            if enabled:
+                self._profile.disable()
@@ -0,0 +1,211 @@
+"""Scheduler sharing the poll deadlines of all BWT devices."""
+
+import asyncio
+from collections.abc import Callable
+from dataclasses import dataclass
+import logging
+from typing import TYPE_CHECKING
+
+from homeassistant.core import HomeAssistant, callback
+
+from .const import DATA_SCHEDULER, DOMAIN
+
+if TYPE_CHECKING:
+    from .coordinator import BwtCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_MAX_IN_FLIGHT = 2
+# Minimum distance between two poll deadlines
+_STAGGER = 0.25
+# A poll starting later than this after its deadline counts as missed
+_MISSED_TOLERANCE = 1.0
+# Weight of the newest sample in the average lateness
+_EWMA_ALPHA = 0.1
+
+
+@dataclass
+class _Device:
+    """Poll state of one device."""
+
+    coordinator: "BwtCoordinator"
+    deadline: float
+    running: bool = False
+    lateness: float = 0.0
+    missed: int = 0
+
+
+class BwtPollScheduler:
+    """Owns the poll deadline of every device.
+
+    Deadlines are kept at least _STAGGER seconds apart, so devices polling at
+    the same interval do not hit the network at the same instant. At most
+    max_in_flight polls run at the same time, the others wait in the queue.
+    """
+
+    def __init__(self, hass: HomeAssistant, max_in_flight: int) -> None:
+        """Initialize the scheduler."""
+        self._hass = hass
+        self._loop = hass.loop
+        self.max_in_flight = max_in_flight
+        self._devices: dict[str, _Device] = {}
+        self._in_flight = 0
+        self._timer: asyncio.TimerHandle | None = None
+        self.queue_depth = 0
+        self.lateness_avg = 0.0
+        self.lateness_max = 0.0
+        self.missed_deadlines = 0
+
+    @callback
+    def async_register(
+        self, key: str, coordinator: "BwtCoordinator", delay: float | None = None
+    ) -> Callable[[], None]:
+        """Start polling the coordinator, returns a callback to stop it.
+
+        The first poll is after delay seconds, by default after the poll
+        interval of the coordinator.
+        """
+        device = _Device(coordinator, 0.0)
+        self._devices[key] = device
+        if delay is None:
+            delay = coordinator.poll_interval.total_seconds()
+        self._set_deadline(device, delay)
+        self._arm()
+
+        @callback
+        def unregister() -> None:
+            self._devices.pop(key, None)
+            if not self._devices:
+                self._cancel()
+            else:
+                self._arm()
+
+        return unregister
+
+    @callback
+    def async_expedite(self, key: str, delay: float) -> None:
+        """Move the next poll of a device forward to at most delay seconds."""
+        device = self._devices.get(key)
+        if device is None or device.running:
+            # A running poll picks the next delay when it is done
+            return
+        deadline = self._loop.time() + delay
+        if deadline < device.deadline:
+            device.deadline = deadline
+            self._arm()
+
+    @callback
+    def async_shutdown(self) -> None:
+        """Stop all polls."""
+        self._devices.clear()
+        self._cancel()
+
+    def device_stats(self, key: str) -> dict[str, float | int]:
+        """Return the lateness of the polls of one device."""
+        device = self._devices[key]
+        return {"lateness": device.lateness, "missed_deadlines": device.missed}
+
+    def stats(self) -> dict[str, float | int]:
+        """Return the current load of the scheduler."""
+        return {
+            "devices": len(self._devices),
+            "in_flight": self._in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queue_depth": self.queue_depth,
+            "lateness_avg": self.lateness_avg,
+            "lateness_max": self.lateness_max,
+            "missed_deadlines": self.missed_deadlines,
+        }
+
+    def _set_deadline(self, device: _Device, delay: float) -> None:
+        """Set the deadline, moved away from the deadlines of other devices."""
+        deadline = self._loop.time() + delay
+        others = sorted(
+            other.deadline
+            for other in self._devices.values()
+            if other is not device and not other.running
+        )
+        for other in others:
+            if other - _STAGGER < deadline < other + _STAGGER:
+                deadline = other + _STAGGER
+        device.deadline = deadline
+
+    def _cancel(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _arm(self) -> None:
+        """Wake up at the earliest deadline of an idle device."""
+        self._cancel()
+        if self._in_flight >= self.max_in_flight:
+            # The next finished poll starts the waiting ones
+            return
+        deadlines = [
+            device.deadline for device in self._devices.values() if not device.running
+        ]
+        if deadlines:
+            self._timer = self._loop.call_at(min(deadlines), self._run_due)
+
+    @callback
+    def _run_due(self) -> None:
+        """Start the polls that are due, as far as the cap allows."""
+        self._timer = None
+        if self._hass.is_stopping:
+            return
+        now = self._loop.time()
+        due = sorted(
+            (
+                device
+                for device in self._devices.values()
+                if not device.running and device.deadline <= now
+            ),
+            key=lambda device: device.deadline,
+        )
+        started = 0
+        for device in due:
+            if self._in_flight >= self.max_in_flight:
+                break
+            self._start(device, now)
+            started += 1
+        self.queue_depth = len(due) - started
+        if self.queue_depth:
+            _LOGGER.debug(
+                "%s polls waiting, %s in flight", self.queue_depth, self._in_flight
+            )
+        self._arm()
+
+    def _start(self, device: _Device, now: float) -> None:
+        lateness = now - device.deadline
+        device.lateness = lateness
+        self.lateness_avg += _EWMA_ALPHA * (lateness - self.lateness_avg)
+        self.lateness_max = max(self.lateness_max, lateness)
+        if lateness > _MISSED_TOLERANCE:
+            device.missed += 1
+            self.missed_deadlines += 1
+        device.running = True
+        self._in_flight += 1
+        self._hass.async_create_background_task(
+            self._poll(device), f"{DOMAIN} poll {device.coordinator.name}"
+        )
+
+    async def _poll(self, device: _Device) -> None:
+        try:
+            await device.coordinator.async_refresh()
+        finally:
+            self._in_flight -= 1
+            device.running = False
+            self._set_deadline(device, device.coordinator.next_poll_delay())
+            # Also starts the polls that waited for a free slot
+            self._run_due()
+
+
+@callback
+def async_get_scheduler(
+    hass: HomeAssistant, max_in_flight: int = DEFAULT_MAX_IN_FLIGHT
+) -> BwtPollScheduler:
+    """Return the scheduler shared by all config entries."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if (scheduler := domain_data.get(DATA_SCHEDULER)) is None:
+        scheduler = domain_data[DATA_SCHEDULER] = BwtPollScheduler(hass, max_in_flight)
+    return scheduler
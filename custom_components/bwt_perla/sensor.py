@@ -1,25 +1,28 @@
 """BWT Sensors."""
 
-from bwt_api.api import BwtApi
+from operator import attrgetter
+
 from bwt_api.bwt import BwtModel
-from bwt_api.exception import WrongCodeException
 
 from homeassistant.components.sensor import (
     SensorDeviceClass,
+    SensorStateClass,
 )
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import (
     PERCENTAGE,
+    UnitOfInformation,
     UnitOfMass,
     UnitOfTime,
 )
 from homeassistant.core import HomeAssistant
-from homeassistant.exceptions import ConfigEntryAuthFailed
 from homeassistant.helpers.device_registry import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
-from .const import DOMAIN
+from .const import CONF_REGISTER_ENTITIES, DOMAIN
 from .coordinator import BwtCoordinator
+from .data.silk import SILK_ENTITIES, UNKNOWN_REGISTERS, SilkEntity
+from .scheduler import async_get_scheduler
 from .sensors.base import *
 
 _GLASS = "mdi:cup-water"
@@ -43,15 +46,8 @@ async def async_setup_entry(
     async_add_entities: AddEntitiesCallback,
 ) -> None:
     """Set up bwt sensors from config entry."""
-    my_api = hass.data[DOMAIN][config_entry.entry_id]
-    model = BwtModel.PERLA_LOCAL_API if isinstance(
-        my_api, BwtApi) else BwtModel.PERLA_SILK
-    coordinator = BwtCoordinator(hass, my_api, model)
-
-    try:
-        await coordinator.async_config_entry_first_refresh()
-    except WrongCodeException as e:
-        raise ConfigEntryAuthFailed from e
+    coordinator: BwtCoordinator = hass.data[DOMAIN][config_entry.entry_id]
+    model = coordinator.model
 
     model_suffix = coordinator.get_model_suffix()
     device_info = DeviceInfo(
@@ -76,7 +72,7 @@ async def async_setup_entry(
             device_info,
             config_entry.entry_id,
             "hardness_in",
-            lambda data: data.hardness_in(),
+            lambda data: data.hardness_in,
             _WATER_PLUS,
         ),
         UnitSensor(
@@ -84,7 +80,7 @@ async def async_setup_entry(
             device_info,
             config_entry.entry_id,
             "regenerativ_level",
-            lambda data: data.regenerativ_level(),
+            lambda data: data.regenerativ_level,
             PERCENTAGE,
             _PERCENTAGE,
         ),
@@ -93,7 +89,7 @@ async def async_setup_entry(
             device_info,
             config_entry.entry_id,
             "day_output",
-            lambda data: data.day_output(),
+            lambda data: data.day_output,
             _DAY,
         ),
         CurrentFlowSensor(coordinator, device_info, config_entry.entry_id),
@@ -102,7 +98,7 @@ async def async_setup_entry(
             device_info,
             config_entry.entry_id,
             "capacity_1",
-            lambda data: data.capacity_1(),
+            lambda data: data.capacity_1,
             UnitOfVolume.LITERS,
             _GLASS,
         ),
@@ -111,7 +107,7 @@ async def async_setup_entry(
             device_info,
             config_entry.entry_id,
             "last_regeneration_1",
-            lambda data: data.last_regeneration_1(),
+            lambda data: data.last_regeneration_1,
             SensorDeviceClass.TIMESTAMP,
             _TIME,
         ),
@@ -120,7 +116,7 @@ async def async_setup_entry(
             device_info,
             config_entry.entry_id,
             "counter_regeneration_1",
-            lambda data: data.regeneration_count_1(),
+            lambda data: data.regeneration_count_1,
             _COUNTER,
         ),
     ]
@@ -138,7 +134,7 @@ async def async_setup_entry(
                 device_info,
                 config_entry.entry_id,
                 "hardness_out",
-                lambda data: data.hardness_out(),
+                lambda data: data.hardness_out,
                 _WATER_MINUS,
             )
         )
@@ -148,7 +144,7 @@ async def async_setup_entry(
                 device_info,
                 config_entry.entry_id,
                 "technician_service",
-                lambda data: data.service_technician(),
+                lambda data: data.technician_service,
                 SensorDeviceClass.TIMESTAMP,
                 _WRENCH_PERSON,
             )
@@ -162,7 +158,7 @@ async def async_setup_entry(
                 device_info,
                 config_entry.entry_id,
                 "regenerativ_days",
-                lambda data: data.regenerativ_days(),
+                lambda data: data.regenerativ_days,
                 UnitOfTime.DAYS,
                 _DAYS_LEFT,
             )
@@ -173,7 +169,7 @@ async def async_setup_entry(
                 device_info,
                 config_entry.entry_id,
                 "regenerativ_mass",
-                lambda data: data.regenerativ_total(),
+                lambda data: data.regenerativ_total,
                 UnitOfMass.GRAMS,
                 _MASS,
             )
@@ -191,7 +187,7 @@ async def async_setup_entry(
                 device_info,
                 config_entry.entry_id,
                 "month_output",
-                lambda data: data.month_output(),
+                lambda data: data.month_output,
                 _MONTH,
             )
         )
@@ -201,7 +197,7 @@ async def async_setup_entry(
                 device_info,
                 config_entry.entry_id,
                 "year_output",
-                lambda data: data.year_output(),
+                lambda data: data.year_output,
                 _YEAR,
             )
         )
@@ -211,18 +207,18 @@ async def async_setup_entry(
                 device_info,
                 config_entry.entry_id,
                "customer_service",
-                lambda data: data.customer_service(),
+                lambda data: data.customer_service,
                 SensorDeviceClass.TIMESTAMP,
                 _WRENCH_CLOCK,
             )
         )
-        if coordinator.data.columns() == 2:
+        if coordinator.data.columns == 2:
             entities.append(UnitSensor(
                 coordinator,
                 device_info,
                 config_entry.entry_id,
                 "capacity_2",
-                lambda data: data.capacity_2(),
+                lambda data: data.capacity_2,
                 UnitOfVolume.LITERS,
                 _GLASS,
             ))
@@ -231,7 +227,7 @@ async def async_setup_entry(
                 device_info,
                 config_entry.entry_id,
                 "last_regeneration_2",
-                lambda data: data.last_regeneration_2(),
+                lambda data: data.last_regeneration_2,
                 SensorDeviceClass.TIMESTAMP,
                 _TIME,
             ))
@@ -240,51 +236,147 @@ async def async_setup_entry(
                 device_info,
                 config_entry.entry_id,
                 "counter_regeneration_2",
-                lambda data: data.regeneration_count_2(),
+                lambda data: data.regeneration_count_2,
                 _COUNTER,
             ))
 
     elif model == BwtModel.PERLA_SILK:
         entities.append(
-            DeviceClassSensor(
-                coordinator,
-                device_info,
-                config_entry.entry_id,
-               "next_customer_service",
-                lambda data: data.next_customer_service(),
-                SensorDeviceClass.TIMESTAMP,
-                _WRENCH_CLOCK,
-            )
-        )
-        entities.append(
-            SimpleSensor(
-                coordinator,
-                device_info,
-                config_entry.entry_id,
-                "days_in_service",
-                lambda data: data.days_in_service(),
-                _COUNTER,
-            )
-        )
-        entities.append(
-            SimpleSensor(
-                coordinator,
-                device_info,
-                config_entry.entry_id,
-                "warranty_days_remaining",
-                lambda data: data.warranty_days_remaining(),
-                _COUNTER,
-            )
+            IntegratedOutputSensor(coordinator, device_info, config_entry.entry_id)
         )
-        for index in [0, 1, 5, 6, 9, 12, 20, 21, 22, 24, 29, 32, 33, 35, 36, 37, 38, 39, 40, 41, 42, 44, 45, 46, 47]:
+        for entity in SILK_ENTITIES:
             entities.append(
-                UnknownSensor(
-                    coordinator,
-                    device_info,
-                    config_entry.entry_id,
-                    index
-                )
+                _silk_sensor(coordinator, device_info, config_entry.entry_id, entity)
             )
+        if config_entry.options.get(CONF_REGISTER_ENTITIES, False):
+            for index in UNKNOWN_REGISTERS:
+                entities.append(
+                    UnknownSensor(
+                        coordinator,
+                        device_info,
+                        config_entry.entry_id,
+                        index
+                    )
+                )
+
+    entities.extend(_poll_stat_sensors(coordinator, device_info, config_entry.entry_id))
 
     async_add_entities(entities)
 
+
+def _silk_sensor(
+    coordinator: BwtCoordinator,
+    device_info: DeviceInfo,
+    entry_id: str,
+    entity: SilkEntity,
+) -> SimpleSensor:
+    """Sensor of a value described by the Silk register table."""
+    extract = attrgetter(entity.key)
+    if entity.device_class is not None:
+        return DeviceClassSensor(
+            coordinator,
+            device_info,
+            entry_id,
+            entity.key,
+            extract,
+            SensorDeviceClass(entity.device_class),
+            entity.icon,
+        )
+    if entity.unit is not None:
+        return UnitSensor(
+            coordinator,
+            device_info,
+            entry_id,
+            entity.key,
+            extract,
+            entity.unit,
+            entity.icon,
+        )
+    return SimpleSensor(
+        coordinator, device_info, entry_id, entity.key, extract, entity.icon
+    )
+
+
+def _milliseconds(seconds: float | None) -> float | None:
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+def _poll_stat_sensors(
+    coordinator: BwtCoordinator, device_info: DeviceInfo, entry_id: str
+) -> list[PollStatSensor]:
+    """Diagnostic sensors of the polling, disabled by default."""
+    scheduler = async_get_scheduler(coordinator.hass)
+    stats = coordinator.stats
+    return [
+        PollStatSensor(
+            coordinator,
+            device_info,
+            entry_id,
+            "poll_latency",
+            lambda c: _milliseconds(stats.request.quantile(0.95)),
+            UnitOfTime.MILLISECONDS,
+            SensorDeviceClass.DURATION,
+            SensorStateClass.MEASUREMENT,
+        ),
+        PollStatSensor(
+            coordinator,
+            device_info,
+            entry_id,
+            "decode_time",
+            lambda c: _milliseconds(stats.decode.quantile(0.95)),
+            UnitOfTime.MILLISECONDS,
+            SensorDeviceClass.DURATION,
+            SensorStateClass.MEASUREMENT,
+        ),
+        PollStatSensor(
+            coordinator,
+            device_info,
+            entry_id,
+            "update_interval",
+            lambda c: c.next_poll_delay(),
+            UnitOfTime.SECONDS,
+            SensorDeviceClass.DURATION,
+            SensorStateClass.MEASUREMENT,
+        ),
+        PollStatSensor(
+            coordinator,
+            device_info,
+            entry_id,
+            "payload_size",
+            lambda c: stats.payload_bytes,
+            UnitOfInformation.BYTES,
+            SensorDeviceClass.DATA_SIZE,
+            SensorStateClass.MEASUREMENT,
+        ),
+        PollStatSensor(
+            coordinator,
+            device_info,
+            entry_id,
+            "poll_errors",
+            lambda c: stats.errors,
+            None,
+            None,
+            SensorStateClass.TOTAL_INCREASING,
+        ),
+        PollStatSensor(
+            coordinator,
+            device_info,
+            entry_id,
+            "poll_timeouts",
+            lambda c: stats.timeouts,
+            None,
+            None,
+            SensorStateClass.TOTAL_INCREASING,
+        ),
+        PollStatSensor(
+            coordinator,
+            device_info,
+            entry_id,
+            "missed_deadlines",
+            lambda c: scheduler.device_stats(entry_id)["missed_deadlines"],
+            None,
+            None,
+            SensorStateClass.TOTAL_INCREASING,
+        ),
+    ]
+
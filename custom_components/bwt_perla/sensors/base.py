@@ -1,16 +1,17 @@
+from abc import ABC, abstractmethod
+import time
 
-from datetime import datetime
-
-from bwt_api.api import treated_to_blended
 from bwt_api.data import BwtStatus
 
 from homeassistant.components.binary_sensor import BinarySensorEntity
 from homeassistant.components.sensor import (
+    RestoreSensor,
     SensorDeviceClass,
     SensorEntity,
     SensorStateClass,
 )
 from homeassistant.const import (
+    EntityCategory,
     UnitOfVolume,
     UnitOfVolumeFlowRate,
 )
@@ -19,7 +20,9 @@ from homeassistant.helpers.device_registry import DeviceInfo
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
 from ..const import DOMAIN
-from ..coordinator import BwtCoordinator
+from ..coordinator import TIER_FAST, TIER_SLOW, BwtCoordinator
+from ..data.snapshot import FAST_FIELDS
+from ..deadband import deadband_for
 
 _FAUCET = "mdi:faucet"
 _WATER = "mdi:water"
@@ -28,8 +31,32 @@ _ERROR = "mdi:alert-decagram"
 _WATER_CHECK = "mdi:water-check"
 _HOLIDAY = "mdi:location-exit"
 _UNKNOWN = "mdi:help-circle"
+_POLL = "mdi:timer-sync-outline"
+
+# Snapshot values of the entities whose key is not the name of the value
+_ENTITY_FIELDS = {
+    "total_output_integrated": ("current_flow", "total_output"),
+    "counter_regeneration_1": ("regeneration_count_1",),
+    "counter_regeneration_2": ("regeneration_count_2",),
+    "errors": ("fatal_errors",),
+    "holiday_mode": ("holiday_mode_active",),
+    "regenerativ_mass": ("regenerativ_total",),
+}
+
+# Rarely looked at, disabled in the entity registry unless the user enables
+# them. Disabled entities are not added, so their values are neither decoded
+# nor written.
+_RARELY_USED = frozenset(
+    {
+        "days_in_service",
+        "warranty_days_remaining",
+        "technician_service",
+        "regenerativ_mass",
+    }
+)
+
 
-class BwtEntity(CoordinatorEntity[BwtCoordinator]):
+class BwtEntity(CoordinatorEntity[BwtCoordinator], ABC):
     """General bwt entity with common properties."""
 
     def __init__(
@@ -46,6 +73,91 @@ class BwtEntity(CoordinatorEntity[BwtCoordinator]):
         self._attr_has_entity_name = True
         self.entity_id = f"sensor.${DOMAIN}_${key}"
         self._attr_unique_id = entry_id + "_" + key
+        self._last_written: tuple | None = None
+        self._last_write_time = 0.0
+        self._deadband = deadband_for(coordinator.config_entry.options, key)
+        # Entities of the slow tier ignore the fast polls
+        self.tier = TIER_FAST if key in FAST_FIELDS else TIER_SLOW
+        self._fields = _ENTITY_FIELDS.get(key, (key,))
+        if key in _RARELY_USED:
+            self._attr_entity_registry_enabled_default = False
+
+    @abstractmethod
+    def _update_from_data(self, data) -> None:
+        """Extract the values of this entity from the coordinator data."""
+
+    def _written_value(self):
+        """Return the value compared to decide if the state changed."""
+        return self._attr_native_value
+
+    @property
+    def available(self) -> bool:
+        """Keep serving the last values for the grace period of the coordinator."""
+        return self.coordinator.serves(self._fields)
+
+    @property
+    def extra_state_attributes(self) -> dict | None:
+        """Mark values restored from the last run or kept after failed polls."""
+        if self.coordinator.stale:
+            return {"stale": True}
+        if not self.coordinator.last_update_success and self.available:
+            # A fixed time instead of an age, the state is not written on
+            # every failed poll
+            return {"last_success": self.coordinator.last_success_at.isoformat()}
+        return None
+
+    def _current_state(self) -> tuple:
+        return (self.available, self._written_value(), self.extra_state_attributes)
+
+    async def async_added_to_hass(self) -> None:
+        """Remember the state the platform writes when adding the entity."""
+        await super().async_added_to_hass()
+        # Disabled entities are never added, their values are not decoded
+        self.async_on_remove(self.coordinator.async_demand(self._fields))
+        self._last_written = self._current_state()
+        self._last_write_time = time.monotonic()
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Handle updated data from the coordinator."""
+        if (
+            self.tier == TIER_SLOW
+            and self.coordinator.tier == TIER_FAST
+            and self.coordinator.last_update_success
+            and self._last_written is not None
+            and self._last_written[0] == self.available
+            and self._last_written[2] == self.extra_state_attributes
+        ):
+            # Nothing but the fast values was decoded, and no last_success
+            # or stale mark has to be removed after a recovery
+            return
+        with self.coordinator.profiled(f"_handle_coordinator_update {self.entity_id}"):
+            self._update_from_data(self.coordinator.data)
+            self._async_write_if_changed()
+
+    @callback
+    def _async_write_if_changed(self) -> None:
+        """Write the state, unless it is the same as the last written one."""
+        current = self._current_state()
+        last = self._last_written
+        if current == last:
+            self.coordinator.state_writes_skipped += 1
+            return
+        now = time.monotonic()
+        if (
+            self._deadband is not None
+            and last is not None
+            and current[0] == last[0]
+            and current[2] == last[2]
+            and self._deadband.suppresses(last[1], current[1], now - self._last_write_time)
+        ):
+            # Compared against the last written value, so small steps cannot add up
+            self.coordinator.state_writes_suppressed += 1
+            return
+        self._last_written = current
+        self._last_write_time = now
+        self.coordinator.state_writes += 1
+        self.async_write_ha_state()
 
 
 class TotalOutputSensor(BwtEntity, SensorEntity):
@@ -59,13 +171,40 @@ class TotalOutputSensor(BwtEntity, SensorEntity):
     def __init__(self, coordinator, device_info, entry_id) -> None:
         """Initialize the sensor with the common coordinator."""
         super().__init__(coordinator, device_info, entry_id, "total_output")
-        self._attr_native_value = coordinator.data.total_output()
+        self._update_from_data(coordinator.data)
 
-    @callback
-    def _handle_coordinator_update(self) -> None:
-        """Handle updated data from the coordinator."""
-        self._attr_native_value = self.coordinator.data.total_output()
-        self.async_write_ha_state()
+    def _update_from_data(self, data) -> None:
+        """Extract the values of this entity from the coordinator data."""
+        self._attr_native_value = data.total_output
+
+
+class IntegratedOutputSensor(BwtEntity, RestoreSensor):
+    """Total water [liter], refined between the coarse device steps by the flow."""
+
+    _attr_icon = _WATER
+    _attr_native_unit_of_measurement = UnitOfVolume.LITERS
+    _attr_device_class = SensorDeviceClass.WATER
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+    _attr_suggested_display_precision = 0
+
+    def __init__(self, coordinator, device_info, entry_id) -> None:
+        """Initialize the sensor with the common coordinator."""
+        super().__init__(coordinator, device_info, entry_id, "total_output_integrated")
+        self.tier = TIER_FAST
+        self._update_from_data(coordinator.data)
+
+    async def async_added_to_hass(self) -> None:
+        """Continue from the total estimated before the restart."""
+        await super().async_added_to_hass()
+        last = await self.async_get_last_sensor_data()
+        if last is not None and last.native_value is not None:
+            self.coordinator.flow.restore(float(last.native_value))
+            self._update_from_data(self.coordinator.data)
+            self._last_written = self._current_state()
+
+    def _update_from_data(self, data) -> None:
+        """Extract the values of this entity from the coordinator data."""
+        self._attr_native_value = self.coordinator.flow.total
 
 
 class CurrentFlowSensor(BwtEntity, SensorEntity):
@@ -80,14 +219,12 @@ class CurrentFlowSensor(BwtEntity, SensorEntity):
     def __init__(self, coordinator, device_info, entry_id) -> None:
         """Initialize the sensor with the common coordinator."""
         super().__init__(coordinator, device_info, entry_id, "current_flow")
-        self._attr_native_value = coordinator.data.current_flow() / 1000.0
+        self._update_from_data(coordinator.data)
 
-    @callback
-    def _handle_coordinator_update(self) -> None:
-        """Handle updated data from the coordinator."""
+    def _update_from_data(self, data) -> None:
+        """Extract the values of this entity from the coordinator data."""
         # HA only has m3 / h, we get the values in l/h
-        self._attr_native_value = self.coordinator.data.current_flow() / 1000.0
-        self.async_write_ha_state()
+        self._attr_native_value = data.current_flow / 1000.0
 
 
 class ErrorSensor(BwtEntity, SensorEntity):
@@ -98,15 +235,11 @@ class ErrorSensor(BwtEntity, SensorEntity):
     def __init__(self, coordinator, device_info, entry_id) -> None:
         """Initialize the sensor with the common coordinator."""
         super().__init__(coordinator, device_info, entry_id, "errors")
-        values = [x.name for x in self.coordinator.data.errors() if x.is_fatal()]
-        self._attr_native_value = ",".join(values)
+        self._update_from_data(coordinator.data)
 
-    @callback
-    def _handle_coordinator_update(self) -> None:
-        """Handle updated data from the coordinator."""
-        values = [x.name for x in self.coordinator.data.errors() if x.is_fatal()]
-        self._attr_native_value = ",".join(values)
-        self.async_write_ha_state()
+    def _update_from_data(self, data) -> None:
+        """Extract the values of this entity from the coordinator data."""
+        self._attr_native_value = data.fatal_errors
 
 
 class WarningSensor(BwtEntity, SensorEntity):
@@ -117,15 +250,11 @@ class WarningSensor(BwtEntity, SensorEntity):
     def __init__(self, coordinator, device_info, entry_id) -> None:
         """Initialize the sensor with the common coordinator."""
         super().__init__(coordinator, device_info, entry_id, "warnings")
-        values = [x.name for x in self.coordinator.data.errors() if not x.is_fatal()]
-        self._attr_native_value = ",".join(values)
+        self._update_from_data(coordinator.data)
 
-    @callback
-    def _handle_coordinator_update(self) -> None:
-        """Handle updated data from the coordinator."""
-        values = [x.name for x in self.coordinator.data.errors() if not x.is_fatal()]
-        self._attr_native_value = ",".join(values)
-        self.async_write_ha_state()
+    def _update_from_data(self, data) -> None:
+        """Extract the values of this entity from the coordinator data."""
+        self._attr_native_value = data.warnings
 
 
 class SimpleSensor(BwtEntity, SensorEntity):
@@ -144,13 +273,11 @@ class SimpleSensor(BwtEntity, SensorEntity):
         super().__init__(coordinator, device_info, entry_id, key)
         self._attr_icon = icon
         self._extract = extract
-        self._attr_native_value = self._extract(self.coordinator.data)
+        self._update_from_data(coordinator.data)
 
-    @callback
-    def _handle_coordinator_update(self) -> None:
-        """Handle updated data from the coordinator."""
-        self._attr_native_value = self._extract(self.coordinator.data)
-        self.async_write_ha_state()
+    def _update_from_data(self, data) -> None:
+        """Extract the values of this entity from the coordinator data."""
+        self._attr_native_value = self._extract(data)
 
 
 class DeviceClassSensor(SimpleSensor):
@@ -200,13 +327,11 @@ class StateSensor(BwtEntity, SensorEntity):
     def __init__(self, coordinator, device_info: DeviceInfo, entry_id: str) -> None:
         """Initialize the sensor with the common coordinator."""
         super().__init__(coordinator, device_info, entry_id, "state")
-        self._attr_native_value = self.coordinator.data.state().name
+        self._update_from_data(coordinator.data)
 
-    @callback
-    def _handle_coordinator_update(self) -> None:
-        """Handle updated data from the coordinator."""
-        self._attr_native_value = self.coordinator.data.state().name
-        self.async_write_ha_state()
+    def _update_from_data(self, data) -> None:
+        """Extract the values of this entity from the coordinator data."""
+        self._attr_native_value = data.state
 
 
 class HolidayModeSensor(BwtEntity, BinarySensorEntity):
@@ -217,13 +342,15 @@ class HolidayModeSensor(BwtEntity, BinarySensorEntity):
     def __init__(self, coordinator, device_info: DeviceInfo, entry_id: str) -> None:
         """Initialize the sensor with the common coordinator."""
         super().__init__(coordinator, device_info, entry_id, "holiday_mode")
-        self._attr_is_on = self.coordinator.data.holiday_mode() == 1
+        self._update_from_data(coordinator.data)
 
-    @callback
-    def _handle_coordinator_update(self) -> None:
-        """Handle updated data from the coordinator."""
-        self._attr_is_on = self.coordinator.data.holiday_mode() == 1
-        self.async_write_ha_state()
+    def _update_from_data(self, data) -> None:
+        """Extract the values of this entity from the coordinator data."""
+        self._attr_is_on = data.holiday_mode_active
+
+    def _written_value(self):
+        """Return the value compared to decide if the state changed."""
+        return self._attr_is_on
 
 
 class HolidayStartSensor(BwtEntity, SensorEntity):
@@ -235,25 +362,11 @@ class HolidayStartSensor(BwtEntity, SensorEntity):
     def __init__(self, coordinator, device_info: DeviceInfo, entry_id: str) -> None:
         """Initialize the sensor with the common coordinator."""
         super().__init__(coordinator, device_info, entry_id, "holiday_mode_start")
-        holiday_mode = self.coordinator.data.holiday_mode()
-        if holiday_mode > 1:
-            self._attr_native_value = datetime.fromtimestamp(
-                holiday_mode
-            )
-        else:
-            self._attr_native_value = None
+        self._update_from_data(coordinator.data)
 
-    @callback
-    def _handle_coordinator_update(self) -> None:
-        """Handle updated data from the coordinator."""
-        holiday_mode = self.coordinator.data.holiday_mode()
-        if holiday_mode > 1:
-            self._attr_native_value = datetime.fromtimestamp(
-                holiday_mode
-            )
-        else:
-            self._attr_native_value = None
-        self.async_write_ha_state()
+    def _update_from_data(self, data) -> None:
+        """Extract the values of this entity from the coordinator data."""
+        self._attr_native_value = data.holiday_mode_start
 
 
 class CalculatedWaterSensor(BwtEntity, SensorEntity):
@@ -276,18 +389,19 @@ class CalculatedWaterSensor(BwtEntity, SensorEntity):
         self._attr_icon = icon
         self._extract = extract
         self.suggested_display_precision = 0
-        self._attr_native_value = self._extract(self.coordinator.data)
+        self._update_from_data(coordinator.data)
 
-    @callback
-    def _handle_coordinator_update(self) -> None:
-        """Handle updated data from the coordinator."""
-        self._attr_native_value = self._extract(self.coordinator.data)
-        self.async_write_ha_state()
+    def _update_from_data(self, data) -> None:
+        """Extract the values of this entity from the coordinator data."""
+        self._attr_native_value = self._extract(data)
 
 
 
 class UnknownSensor(BwtEntity, SensorEntity):
-    """Unknown sensor for debugging."""
+    """Unknown sensor for debugging, disabled by default."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
 
     def __init__(
         self,
@@ -298,13 +412,56 @@ class UnknownSensor(BwtEntity, SensorEntity):
     ) -> None:
         """Initialize the sensor with the common coordinator."""
         super().__init__(coordinator, device_info, entry_id, f"silk_register_{index}")
+        # Only the enabled registers are decoded
+        self._fields = (f"register_{index}",)
         self._index = index
         self._attr_icon = _UNKNOWN
-        self._attr_native_value = coordinator.data.get_register(index)
+        self._update_from_data(coordinator.data)
 
-    @callback
-    def _handle_coordinator_update(self) -> None:
-        """Handle updated data from the coordinator."""
-        self._attr_native_value = self.coordinator.data.get_register(self._index)
-        self.async_write_ha_state()
-        
+    def _update_from_data(self, data) -> None:
+        """Extract the values of this entity from the coordinator data."""
+        self._attr_native_value = data.register(self._index)
+
+
+class PollStatSensor(BwtEntity, SensorEntity):
+    """How the polling of the device performs, disabled by default."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+
+    def __init__(
+        self,
+        coordinator: BwtCoordinator,
+        device_info: DeviceInfo,
+        entry_id: str,
+        key: str,
+        extract,
+        unit: str | None,
+        device_class: SensorDeviceClass | None,
+        state_class: SensorStateClass,
+    ) -> None:
+        """Initialize the sensor with the common coordinator."""
+        super().__init__(coordinator, device_info, entry_id, key)
+        self._attr_icon = _POLL
+        self._attr_native_unit_of_measurement = unit
+        self._attr_device_class = device_class
+        self._attr_state_class = state_class
+        self._extract = extract
+        # Changes with every poll and needs nothing decoded
+        self.tier = TIER_FAST
+        self._fields = ()
+        self._update_from_data(coordinator.data)
+
+    @property
+    def available(self) -> bool:
+        """Failing polls are what these sensors are about."""
+        return True
+
+    @property
+    def extra_state_attributes(self) -> dict | None:
+        """No attributes, the value is always current."""
+        return None
+
+    def _update_from_data(self, data) -> None:
+        """Extract the values of this entity from the coordinator."""
+        self._attr_native_value = self._extract(self.coordinator)
@@ -0,0 +1,142 @@
+"""Services of the BWT Perla integration."""
+
+from datetime import datetime
+
+import voluptuous as vol
+
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+    callback,
+)
+from homeassistant.exceptions import ServiceValidationError
+from homeassistant.helpers import config_validation as cv
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN
+from .profiling import CoordinatorProfiler
+from .triggers import ATTR_INTERVAL, FAST_POLL_SCHEMA, async_fast_poll
+
+ATTR_CONFIG_ENTRY_ID = "config_entry_id"
+ATTR_START = "start"
+ATTR_END = "end"
+ATTR_DURATION = "duration"
+
+SERVICE_EXPORT_REGISTER_JOURNAL = "export_register_journal"
+SERVICE_PROFILE = "profile"
+SERVICE_FAST_POLL = "fast_poll"
+SERVICE_BACKFILL_STATISTICS = "backfill_statistics"
+
+_EXPORT_REGISTER_JOURNAL_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_CONFIG_ENTRY_ID): cv.string,
+        vol.Optional(ATTR_START): cv.datetime,
+        vol.Optional(ATTR_END): cv.datetime,
+    }
+)
+
+_BACKFILL_STATISTICS_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_CONFIG_ENTRY_ID): cv.string,
+    }
+)
+
+_PROFILE_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_CONFIG_ENTRY_ID): cv.string,
+        vol.Optional(ATTR_DURATION, default=60): vol.All(
+            vol.Coerce(float), vol.Range(min=1, max=3600)
+        ),
+    }
+)
+
+
+def _get_coordinator(hass: HomeAssistant, call: ServiceCall):
+    """Return the coordinator of the config entry of the call."""
+    entry_id = call.data[ATTR_CONFIG_ENTRY_ID]
+    if (coordinator := hass.data.get(DOMAIN, {}).get(entry_id)) is None:
+        raise ServiceValidationError(
+            translation_domain=DOMAIN,
+            translation_key="entry_not_loaded",
+            translation_placeholders={"entry_id": entry_id},
+        )
+    return coordinator
+
+
+def _as_aware(value: datetime | None) -> datetime | None:
+    """Interpret datetimes without timezone as local time."""
+    if value is None or value.tzinfo is not None:
+        return value
+    return value.replace(tzinfo=dt_util.get_default_time_zone())
+
+
+@callback
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the services of the integration."""
+
+    async def export_register_journal(call: ServiceCall) -> ServiceResponse:
+        """Write the journaled register changes of a time range to a csv file."""
+        coordinator = _get_coordinator(hass, call)
+        if coordinator.journal is None:
+            raise ServiceValidationError(
+                translation_domain=DOMAIN,
+                translation_key="journal_disabled",
+            )
+        path, rows = await coordinator.journal.async_export(
+            _as_aware(call.data.get(ATTR_START)), _as_aware(call.data.get(ATTR_END))
+        )
+        return {"path": path, "rows": rows}
+
+    async def profile(call: ServiceCall) -> ServiceResponse:
+        """Start profiling the polls and entity updates of a device."""
+        coordinator = _get_coordinator(hass, call)
+        if CoordinatorProfiler.running():
+            raise ServiceValidationError(
+                translation_domain=DOMAIN,
+                translation_key="profile_running",
+            )
+        return CoordinatorProfiler(hass, coordinator).async_start(
+            call.data[ATTR_DURATION]
+        )
+
+    async def fast_poll(call: ServiceCall) -> None:
+        """Poll one or all devices faster for a while."""
+        entry_id = call.data.get(ATTR_CONFIG_ENTRY_ID)
+        if entry_id is not None:
+            _get_coordinator(hass, call)
+        async_fast_poll(
+            hass, entry_id, call.data[ATTR_INTERVAL], call.data[ATTR_DURATION]
+        )
+
+    async def backfill_statistics(call: ServiceCall) -> ServiceResponse:
+        """Import the hours missing in the water statistic of a device."""
+        coordinator = _get_coordinator(hass, call)
+        hours = await coordinator.backfill.async_backfill()
+        return {"statistic_id": coordinator.backfill.statistic_id, "hours": hours}
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_FAST_POLL, fast_poll, schema=FAST_POLL_SCHEMA
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_BACKFILL_STATISTICS,
+        backfill_statistics,
+        schema=_BACKFILL_STATISTICS_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_PROFILE,
+        profile,
+        schema=_PROFILE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_EXPORT_REGISTER_JOURNAL,
+        export_register_journal,
+        schema=_EXPORT_REGISTER_JOURNAL_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
@@ -0,0 +1,82 @@
+"""Counters and latency histograms of the polls of one device."""
+
+from bisect import bisect_left
+from typing import Any
+
+# Upper bounds of the histogram buckets in seconds, the last one is open
+_BOUNDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class LatencyHistogram:
+    """Fixed bucket histogram, cheap enough to record every poll."""
+
+    def __init__(self) -> None:
+        """Initialize an empty histogram."""
+        self.buckets = [0] * (len(_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last: float | None = None
+
+    def add(self, seconds: float) -> None:
+        """Record one duration."""
+        self.buckets[bisect_left(_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.last = seconds
+
+    def quantile(self, q: float) -> float | None:
+        """Return the upper bound of the bucket holding the quantile."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(_BOUNDS, self.buckets):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.max
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the histogram for the diagnostics."""
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "max": self.max,
+            "last": self.last,
+            "buckets": {
+                **{f"<={bound}": count for bound, count in zip(_BOUNDS, self.buckets)},
+                f">{_BOUNDS[-1]}": self.buckets[-1],
+            },
+        }
+
+
+class PollStats:
+    """What the polls of one device cost and how often they failed."""
+
+    def __init__(self) -> None:
+        """Initialize the counters."""
+        self.request = LatencyHistogram()
+        self.decode = LatencyHistogram()
+        self.fan_out = LatencyHistogram()
+        self.polls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.payload_bytes: int | None = None
+        self.payload_bytes_total = 0
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the counters for the diagnostics."""
+        return {
+            "polls": self.polls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "payload_bytes": self.payload_bytes,
+            "payload_bytes_total": self.payload_bytes_total,
+            "request": self.request.as_dict(),
+            "decode": self.decode.as_dict(),
+            "fan_out": self.fan_out.as_dict(),
+        }
@@ -0,0 +1,231 @@
+"""Pooled HTTP transport shared by all BWT apis."""
+
+import asyncio
+from collections import Counter
+from collections.abc import Callable
+import json
+import logging
+from typing import Any
+
+import aiohttp
+from bwt_api.api import BwtApi, BwtSilkApi
+from bwt_api.bwt import BwtModel
+from bwt_api.exception import ConnectException
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+
+from .const import DATA_TRANSPORT, DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+# The devices are small embedded web servers, one request at a time is plenty
+_CONNECTIONS_PER_HOST = 1
+_PROBE_TIMEOUT = aiohttp.ClientTimeout(total=3)
+# A device answering the TCP handshake slower than this counts as down
+_CONNECT_TIMEOUT = 2
+
+
+class BwtTransport:
+    """Keep-alive client session and per host connection limits.
+
+    The limit of a host is kept as long as a session of it is open.
+    """
+
+    def __init__(self, session: aiohttp.ClientSession) -> None:
+        """Initialize the transport on top of the shared session."""
+        self._session = session
+        self._limits: dict[str, asyncio.Semaphore] = {}
+        self._open: Counter[str] = Counter()
+
+    def session(self, host: str, auth: aiohttp.BasicAuth | None = None) -> "BwtSession":
+        """Return a session for the requests of one api object."""
+        if (limit := self._limits.get(host)) is None:
+            limit = self._limits[host] = asyncio.Semaphore(_CONNECTIONS_PER_HOST)
+        self._open[host] += 1
+        return BwtSession(self._session, limit, auth, lambda: self._closed(host))
+
+    def _closed(self, host: str) -> None:
+        self._open[host] -= 1
+        if self._open[host] <= 0:
+            del self._open[host]
+            del self._limits[host]
+
+
+class BwtSession:
+    """View on the shared session, used by one api object.
+
+    Behaves like the aiohttp.ClientSession the apis expect, but close() only
+    drops the connections of its own requests instead of the shared pool.
+    """
+
+    def __init__(
+        self,
+        session: aiohttp.ClientSession,
+        limit: asyncio.Semaphore,
+        auth: aiohttp.BasicAuth | None,
+        on_close: Callable[[], None] | None = None,
+    ) -> None:
+        """Initialize the session, on_close is called on the first close."""
+        self._session = session
+        self._limit = limit
+        self._auth = auth
+        self._on_close = on_close
+        self._responses: set[aiohttp.ClientResponse] = set()
+        self.closed = False
+        # Body size of the last finished response
+        self.payload_bytes: int | None = None
+
+    def get(self, url: str, **kwargs: Any) -> "_Request":
+        """Start a GET request, to be used with async with."""
+        return _Request(self, url, kwargs)
+
+    async def close(self) -> None:
+        """Drop the connections of the requests still in flight."""
+        if not self.closed and self._on_close is not None:
+            self._on_close()
+        self.closed = True
+        for response in self._responses:
+            response.close()
+        self._responses.clear()
+
+
+class _Request:
+    """Request of a BwtSession holding a slot of the host limit."""
+
+    def __init__(self, session: BwtSession, url: str, kwargs: dict[str, Any]) -> None:
+        self._session = session
+        self._url = url
+        self._kwargs = kwargs
+        self._response: aiohttp.ClientResponse | None = None
+
+    async def __aenter__(self) -> aiohttp.ClientResponse:
+        session = self._session
+        if session.closed:
+            raise aiohttp.ClientConnectionError("Session is closed")
+        await session._limit.acquire()
+        try:
+            self._response = await session._session.get(
+                self._url, auth=session._auth, **self._kwargs
+            )
+        except BaseException:
+            session._limit.release()
+            raise
+        session._responses.add(self._response)
+        return self._response
+
+    async def __aexit__(self, *err) -> None:
+        session = self._session
+        session._responses.discard(self._response)
+        session.payload_bytes = self._response.content.total_bytes
+        # Hands the connection back to the pool for the next poll
+        self._response.release()
+        session._limit.release()
+
+
+async def async_probe_host(host: str, port: int) -> bool:
+    """Return True if the host accepts a TCP connection on the port.
+
+    Much cheaper for the device than a request, used to find out when a
+    device that stopped answering is back.
+    """
+    try:
+        async with asyncio.timeout(_CONNECT_TIMEOUT):
+            _reader, writer = await asyncio.open_connection(host, port)
+    except (OSError, TimeoutError):
+        return False
+    writer.close()
+    return True
+
+
+class PooledBwtApi(BwtApi):
+    """BwtApi sending its requests through the shared transport."""
+
+    port = 8080
+
+    def __init__(self, transport: BwtTransport, host: str, code: str) -> None:
+        """Initialize the api without opening a private session."""
+        self._host = host
+        self._headers = {}
+        self._session = transport.session(host, aiohttp.BasicAuth("user", code))
+
+    async def async_probe(self) -> bool:
+        """Return True if the device accepts connections."""
+        return await async_probe_host(self._host, self.port)
+
+    @property
+    def payload_bytes(self) -> int | None:
+        """Return the body size of the last response."""
+        return self._session.payload_bytes
+
+
+class PooledBwtSilkApi(BwtSilkApi):
+    """BwtSilkApi sending its requests through the shared transport."""
+
+    port = 80
+
+    def __init__(self, transport: BwtTransport, host: str) -> None:
+        """Initialize the api without opening a private session."""
+        self._host = host
+        self._session = transport.session(host)
+
+    async def async_probe(self) -> bool:
+        """Return True if the device accepts connections."""
+        return await async_probe_host(self._host, self.port)
+
+    @property
+    def payload_bytes(self) -> int | None:
+        """Return the body size of the last response."""
+        return self._session.payload_bytes
+
+
+async def async_determine_bwt_model(
+    transport: BwtTransport, host: str
+) -> tuple[BwtModel, list[int] | None]:
+    """Determine the BWT model like bwt_api does, but on the shared transport.
+
+    The Silk probe already returns all registers, they are returned with the
+    model so they do not need to be fetched again. None for other models.
+    """
+    session = transport.session(host)
+    try:
+        try:
+            async with session.get(
+                f"http://{host}:8080/api", timeout=_PROBE_TIMEOUT
+            ) as response:
+                res = await response.text()
+                _LOGGER.debug("Response from %s:8080/api: %s", host, response.status)
+                if response.status == 404 and res == "Not Found":
+                    return BwtModel.PERLA_LOCAL_API, None
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            pass
+
+        try:
+            async with session.get(
+                f"http://{host}:80/silk/registers", timeout=_PROBE_TIMEOUT
+            ) as response:
+                res = await response.text()
+                _LOGGER.debug(
+                    "Response from %s:80/silk/registers: %s", host, response.status
+                )
+                if response.status == 200 and res.startswith('{"params":['):
+                    return BwtModel.PERLA_SILK, json.loads(res)["params"]
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+            pass
+    finally:
+        await session.close()
+
+    raise ConnectException(
+        f"Could not determine BWT model for host {host}. Please check the connection or the host address."
+    )
+
+
+@callback
+def async_get_transport(hass: HomeAssistant) -> BwtTransport:
+    """Return the transport shared by all config entries."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if (transport := domain_data.get(DATA_TRANSPORT)) is None:
+        transport = domain_data[DATA_TRANSPORT] = BwtTransport(
+            async_get_clientsession(hass)
+        )
+    return transport
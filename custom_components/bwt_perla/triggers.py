@@ -0,0 +1,119 @@
+"""Start bursts of fast polls from events and state changes of other entities."""
+
+import logging
+
+import voluptuous as vol
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import STATE_UNAVAILABLE, STATE_UNKNOWN
+from homeassistant.core import (
+    CALLBACK_TYPE,
+    Event,
+    EventStateChangedData,
+    HomeAssistant,
+    callback,
+)
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers.event import async_track_state_change_event
+
+from .const import (
+    CONF_FAST_POLL_DURATION,
+    CONF_FAST_POLL_ENTITIES,
+    DEFAULT_FAST_POLL_DURATION,
+    DEFAULT_FAST_POLL_INTERVAL,
+    DOMAIN,
+    EVENT_FAST_POLL,
+)
+from .coordinator import BwtCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+ATTR_CONFIG_ENTRY_ID = "config_entry_id"
+ATTR_INTERVAL = "interval"
+ATTR_DURATION = "duration"
+
+FAST_POLL_SCHEMA = vol.Schema(
+    {
+        vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+        vol.Optional(ATTR_INTERVAL, default=DEFAULT_FAST_POLL_INTERVAL): vol.All(
+            vol.Coerce(float), vol.Range(min=1, max=30)
+        ),
+        vol.Optional(ATTR_DURATION, default=DEFAULT_FAST_POLL_DURATION): vol.All(
+            vol.Coerce(float), vol.Range(min=1, max=3600)
+        ),
+    },
+    extra=vol.REMOVE_EXTRA,
+)
+
+_IGNORED_STATES = (STATE_UNAVAILABLE, STATE_UNKNOWN)
+
+
+@callback
+def async_fast_poll(
+    hass: HomeAssistant, entry_id: str | None, interval: float, duration: float
+) -> int:
+    """Start a burst on one device, or all without entry id.
+
+    Returns the number of devices polling faster.
+    """
+    domain_data = hass.data.get(DOMAIN, {})
+    coordinators = [
+        coordinator
+        for key, coordinator in domain_data.items()
+        if isinstance(coordinator, BwtCoordinator) and entry_id in (None, key)
+    ]
+    for coordinator in coordinators:
+        coordinator.async_fast_poll(interval, duration)
+    return len(coordinators)
+
+
+@callback
+def async_listen_fast_poll_event(hass: HomeAssistant) -> CALLBACK_TYPE:
+    """Start bursts on bwt_perla_fast_poll events."""
+
+    @callback
+    def handle_event(event: Event) -> None:
+        try:
+            data = FAST_POLL_SCHEMA(dict(event.data))
+        except vol.Invalid as err:
+            _LOGGER.warning("Ignoring invalid %s event: %s", EVENT_FAST_POLL, err)
+            return
+        async_fast_poll(
+            hass,
+            data.get(ATTR_CONFIG_ENTRY_ID),
+            data[ATTR_INTERVAL],
+            data[ATTR_DURATION],
+        )
+
+    return hass.bus.async_listen(EVENT_FAST_POLL, handle_event)
+
+
+@callback
+def async_track_fast_poll_entities(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> CALLBACK_TYPE | None:
+    """Start a burst whenever one of the trigger entities of the entry changes.
+
+    A faucet or the power of a washing machine announce a draw of water
+    before the flow shows up in a slow poll.
+    """
+    entity_ids = entry.options.get(CONF_FAST_POLL_ENTITIES)
+    if not entity_ids:
+        return None
+    duration = entry.options.get(CONF_FAST_POLL_DURATION, DEFAULT_FAST_POLL_DURATION)
+
+    @callback
+    def handle_state_change(event: Event[EventStateChangedData]) -> None:
+        old_state = event.data["old_state"]
+        new_state = event.data["new_state"]
+        if (
+            old_state is None
+            or new_state is None
+            or new_state.state in _IGNORED_STATES
+            or old_state.state == new_state.state
+        ):
+            return
+        _LOGGER.debug("%s changed, polling faster", new_state.entity_id)
+        async_fast_poll(hass, entry.entry_id, DEFAULT_FAST_POLL_INTERVAL, duration)
+
+    return async_track_state_change_event(hass, entity_ids, handle_state_change)
@@ -0,0 +1 @@
+"""Tests for the BWT Perla integration."""
@@ -0,0 +1,40 @@
+"""Helpers for the BWT Perla tests."""
+
+from dataclasses import replace
+from datetime import datetime
+
+from bwt_api.data import BwtStatus, CurrentResponse, Hardness
+
+CURRENT_RESPONSE = CurrentResponse(
+    errors=[],
+    blended_total=12345,
+    capacity_1=1_200_000,
+    capacity_2=1_350_000,
+    current_flow=0,
+    dosing_total=0,
+    firmware_version="2.0201",
+    in_hardness=Hardness(357, 20, 36, 3.57),
+    out_hardness=Hardness(71, 4, 7, 0.71),
+    holiday_mode=0,
+    regeneration_last_1=datetime(2024, 5, 1, 2, 0),
+    regeneration_last_2=datetime(2024, 5, 2, 2, 0),
+    service_customer=datetime(2024, 1, 10, 10, 0),
+    service_technician=datetime(2023, 6, 1, 9, 30),
+    out_of_service=0,
+    regeneration_count_1=310,
+    regeneration_count_2=305,
+    regeneration_count=615,
+    regenerativ_level=64,
+    regenerativ_days=41,
+    regenerativ_total=98_000,
+    state=BwtStatus.OK,
+    treated_day=240,
+    treated_month=7200,
+    treated_year=86_000,
+    columns=2,
+)
+
+
+def current_response(**values) -> CurrentResponse:
+    """Return a response of the local api with some values changed."""
+    return replace(CURRENT_RESPONSE, **values)
@@ -0,0 +1,173 @@
+"""Tests for the hours of the water statistic."""
+
+from datetime import datetime
+from typing import Any
+from unittest.mock import AsyncMock, Mock, patch
+
+from bwt_api.bwt import BwtModel
+from bwt_api.data import DailyResponse, MonthlyResponse
+from freezegun.api import FrozenDateTimeFactory
+import pytest
+
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+
+from custom_components.bwt_perla.backfill import StatisticsBackfill
+
+
+def _coordinator(model: BwtModel, total: float) -> Mock:
+    coordinator = Mock()
+    coordinator.model = model
+    coordinator.data = Mock(total_output=total, hardness_in=20, hardness_out=20)
+    coordinator.stale = False
+    coordinator.last_update_success = True
+    coordinator.flow.total = None
+    coordinator.config_entry.entry_id = "abc"
+    coordinator.config_entry.title = "Perla"
+    return coordinator
+
+
+def _daily(**half_hours: float) -> DailyResponse:
+    """Return the water of the half hours, keyed like _1130."""
+    values = [0.0] * 48
+    for key, value in half_hours.items():
+        values[int(key[1:3]) * 2 + int(key[3:]) // 30] = value
+    return DailyResponse(values)
+
+
+async def _async_backfill(
+    hass: HomeAssistant, coordinator: Mock, last: dict[str, Any] | None
+) -> list:
+    backfill = StatisticsBackfill(hass, coordinator)
+    with (
+        patch.object(backfill, "_async_last_statistic", AsyncMock(return_value=last)),
+        patch(
+            "custom_components.bwt_perla.backfill.async_add_external_statistics"
+        ) as add,
+    ):
+        await backfill.async_backfill()
+    if not add.called:
+        return []
+    return [(row["start"], row["state"], row["sum"]) for row in add.call_args[0][2]]
+
+
+def _last(start: str, state: float, total: float) -> dict[str, Any]:
+    return {
+        "start": datetime.fromisoformat(start).timestamp(),
+        "state": state,
+        "sum": total,
+    }
+
+
+def _utc(value: str) -> datetime:
+    return datetime.fromisoformat(value).replace(tzinfo=dt_util.UTC)
+
+
+@pytest.fixture(autouse=True)
+async def utc(hass: HomeAssistant) -> None:
+    """Use UTC as local time."""
+    await hass.config.async_set_time_zone("UTC")
+
+
+async def test_silk_unknown_hours_not_estimated(
+    hass: HomeAssistant, freezer: FrozenDateTimeFactory
+) -> None:
+    """The water of the missed hours is written into the last one at once."""
+    freezer.move_to("2024-05-10 13:30:00+00:00")
+    coordinator = _coordinator(BwtModel.PERLA_SILK, 1100)
+    rows = await _async_backfill(
+        hass, coordinator, _last("2024-05-10T10:00:00+00:00", 1000, 50)
+    )
+    assert rows == [
+        (_utc("2024-05-10T11:00:00"), 1000, 50),
+        (_utc("2024-05-10T12:00:00"), 1100, 150),
+    ]
+
+
+async def test_first_import(
+    hass: HomeAssistant, freezer: FrozenDateTimeFactory
+) -> None:
+    """Without a statistic the last complete hour starts it at the total."""
+    freezer.move_to("2024-05-10 13:30:00+00:00")
+    coordinator = _coordinator(BwtModel.PERLA_SILK, 1100)
+    rows = await _async_backfill(hass, coordinator, None)
+    assert rows == [(_utc("2024-05-10T12:00:00"), 1100, 0)]
+
+
+async def test_complete_statistic(
+    hass: HomeAssistant, freezer: FrozenDateTimeFactory
+) -> None:
+    """Nothing is imported while the current hour is not complete."""
+    freezer.move_to("2024-05-10 13:30:00+00:00")
+    coordinator = _coordinator(BwtModel.PERLA_SILK, 1100)
+    rows = await _async_backfill(
+        hass, coordinator, _last("2024-05-10T12:00:00+00:00", 1000, 50)
+    )
+    assert rows == []
+
+
+async def test_local_half_hours(
+    hass: HomeAssistant, freezer: FrozenDateTimeFactory
+) -> None:
+    """The half hours of the day are summed, the current hour left out."""
+    freezer.move_to("2024-05-10 13:30:00+00:00")
+    # 10 l in the half hours, 20 l in the current hour, 30 l unexplained
+    coordinator = _coordinator(BwtModel.PERLA_LOCAL_API, 1060)
+    coordinator.my_api.get_daily_data = AsyncMock(
+        return_value=_daily(_1100=5, _1130=5, _1300=20)
+    )
+    rows = await _async_backfill(
+        hass, coordinator, _last("2024-05-10T10:00:00+00:00", 1000, 50)
+    )
+    assert rows == [
+        (_utc("2024-05-10T11:00:00"), 1010, 60),
+        (_utc("2024-05-10T12:00:00"), 1040, 90),
+    ]
+
+
+async def test_local_days(
+    hass: HomeAssistant, freezer: FrozenDateTimeFactory
+) -> None:
+    """A day of the month is written into its last hour."""
+    freezer.move_to("2024-05-10 01:30:00+00:00")
+    coordinator = _coordinator(BwtModel.PERLA_LOCAL_API, 1360)
+    coordinator.my_api.get_daily_data = AsyncMock(
+        return_value=_daily(_0000=3, _0030=3, _0100=4)
+    )
+    monthly = [0.0] * 31
+    monthly[7] = 100
+    monthly[8] = 200
+    coordinator.my_api.get_monthly_data = AsyncMock(
+        return_value=MonthlyResponse(monthly)
+    )
+    rows = await _async_backfill(
+        hass, coordinator, _last("2024-05-07T23:00:00+00:00", 1000, 50)
+    )
+    assert len(rows) == 49
+    used = {start: row_sum for start, _, row_sum in rows}
+    assert used[_utc("2024-05-08T22:00:00")] == 50
+    assert used[_utc("2024-05-08T23:00:00")] == 150
+    assert used[_utc("2024-05-09T22:00:00")] == 150
+    assert used[_utc("2024-05-09T23:00:00")] == 350
+    # The half hours and the 50 l left over
+    assert rows[-1] == (_utc("2024-05-10T00:00:00"), 1356, 406)
+
+
+async def test_local_partly_imported_day(
+    hass: HomeAssistant, freezer: FrozenDateTimeFactory
+) -> None:
+    """A day partly imported already is not written again."""
+    freezer.move_to("2024-05-09 00:30:00+00:00")
+    coordinator = _coordinator(BwtModel.PERLA_LOCAL_API, 1100)
+    coordinator.my_api.get_daily_data = AsyncMock(return_value=_daily())
+    monthly = [0.0] * 31
+    monthly[7] = 150
+    coordinator.my_api.get_monthly_data = AsyncMock(
+        return_value=MonthlyResponse(monthly)
+    )
+    rows = await _async_backfill(
+        hass, coordinator, _last("2024-05-08T11:00:00+00:00", 1000, 50)
+    )
+    assert len(rows) == 12
+    assert all(state == 1000 for _, state, _ in rows[:-1])
+    assert rows[-1] == (_utc("2024-05-08T23:00:00"), 1100, 150)
@@ -0,0 +1,285 @@
+"""Tests for the coordinator."""
+
+from datetime import timedelta
+import time
+from typing import Any
+from unittest.mock import AsyncMock, Mock
+
+import aiohttp
+from bwt_api.bwt import BwtModel
+import pytest
+from pytest_homeassistant_custom_component.common import (
+    MockConfigEntry,
+    async_fire_time_changed,
+)
+
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+
+from custom_components.bwt_perla.const import (
+    CONF_GRACE_PERIOD,
+    DATA_HANDOVER,
+    DOMAIN,
+)
+from custom_components.bwt_perla.coordinator import (
+    TIER_FAST,
+    TIER_SLOW,
+    BwtCoordinator,
+    async_hand_over_snapshot,
+    async_take_over_snapshot,
+)
+from custom_components.bwt_perla.data.silk import REGISTER_COUNT, SilkApiData
+
+SNAPSHOT = SilkApiData(list(range(REGISTER_COUNT))).snapshot()
+
+
+@pytest.fixture
+def entry(hass: HomeAssistant) -> MockConfigEntry:
+    """Return the config entry of a Silk."""
+    entry = MockConfigEntry(
+        domain=DOMAIN, title="Perla", data={}, options={CONF_GRACE_PERIOD: 300}
+    )
+    entry.add_to_hass(hass)
+    return entry
+
+
+@pytest.fixture
+def api() -> Mock:
+    """Return the api of a Silk that stopped answering."""
+    api = Mock()
+    api.get_registers = AsyncMock(side_effect=aiohttp.ClientError("down"))
+    api.close = AsyncMock()
+    return api
+
+
+@pytest.fixture
+def answering_api() -> Mock:
+    """Return the api of an answering Silk."""
+    api = Mock()
+    api.get_registers = AsyncMock(return_value=list(range(REGISTER_COUNT)))
+    api.payload_bytes = None
+    api.close = AsyncMock()
+    return api
+
+
+@pytest.fixture
+async def coordinator(hass: HomeAssistant, entry: MockConfigEntry, api: Mock):
+    """Return a coordinator seeded with a snapshot."""
+    coordinator = BwtCoordinator(hass, entry, api, BwtModel.PERLA_SILK)
+    coordinator.async_seed(SNAPSHOT)
+    yield coordinator
+    await coordinator.async_shutdown()
+
+
+def _pass_time(hass: HomeAssistant, coordinator: BwtCoordinator, seconds: float) -> None:
+    """Move the poll clock and the timers forward."""
+    coordinator.last_success -= seconds
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=seconds))
+
+
+async def test_listeners_updated_on_first_failure(
+    hass: HomeAssistant, coordinator: BwtCoordinator
+) -> None:
+    """Only the first failed poll of a row updates the entities."""
+    success = coordinator.last_success_at
+    updates = Mock()
+    coordinator.async_add_listener(updates)
+    await coordinator.async_refresh()
+    assert updates.call_count == 1
+    await coordinator.async_refresh()
+    assert updates.call_count == 1
+    assert not coordinator.last_update_success
+    assert coordinator.last_success_at == success
+
+
+async def test_values_expire_during_outage(
+    hass: HomeAssistant, coordinator: BwtCoordinator
+) -> None:
+    """The field max age and the grace period run out without another poll."""
+    updates = Mock()
+    coordinator.async_add_listener(updates)
+    await coordinator.async_refresh()
+    assert coordinator.serves(("current_flow",))
+    assert coordinator.serves(("total_output",))
+
+    _pass_time(hass, coordinator, 61)
+    await hass.async_block_till_done()
+    assert updates.call_count == 2
+    assert not coordinator.serves(("current_flow",))
+    assert coordinator.serves(("total_output",))
+
+    _pass_time(hass, coordinator, 240)
+    await hass.async_block_till_done()
+    assert updates.call_count == 3
+    assert not coordinator.serves(("total_output",))
+
+
+async def test_restore(
+    hass: HomeAssistant,
+    entry: MockConfigEntry,
+    api: Mock,
+    hass_storage: dict[str, Any],
+) -> None:
+    """The persisted snapshot is used, marked stale, until the first poll."""
+    hass_storage[f"{DOMAIN}.{entry.entry_id}.snapshot"] = {
+        "version": 1,
+        "key": f"{DOMAIN}.{entry.entry_id}.snapshot",
+        "data": SNAPSHOT.as_dict(),
+    }
+    coordinator = BwtCoordinator(hass, entry, api, BwtModel.PERLA_SILK)
+    assert await coordinator.async_restore()
+    assert coordinator.stale
+    assert coordinator.data.as_dict() == SNAPSHOT.as_dict()
+    await coordinator.async_shutdown()
+
+
+async def test_restore_without_snapshot(
+    hass: HomeAssistant, entry: MockConfigEntry, api: Mock
+) -> None:
+    """Without a persisted snapshot the first poll is awaited."""
+    coordinator = BwtCoordinator(hass, entry, api, BwtModel.PERLA_SILK)
+    assert not await coordinator.async_restore()
+    assert coordinator.data is None
+    await coordinator.async_shutdown()
+
+
+async def test_restore_invalid(
+    hass: HomeAssistant,
+    entry: MockConfigEntry,
+    api: Mock,
+    hass_storage: dict[str, Any],
+) -> None:
+    """An unreadable snapshot is ignored."""
+    hass_storage[f"{DOMAIN}.{entry.entry_id}.snapshot"] = {
+        "version": 1,
+        "key": f"{DOMAIN}.{entry.entry_id}.snapshot",
+        "data": {"last_regeneration_1": "yesterday"},
+    }
+    coordinator = BwtCoordinator(hass, entry, api, BwtModel.PERLA_SILK)
+    assert not await coordinator.async_restore()
+    await coordinator.async_shutdown()
+
+
+async def test_shutdown_saves_snapshot(
+    hass: HomeAssistant, coordinator: BwtCoordinator, hass_storage: dict[str, Any]
+) -> None:
+    """A pending snapshot is saved on shutdown instead of after the delay."""
+    await coordinator.async_shutdown()
+    key = f"{DOMAIN}.{coordinator.config_entry.entry_id}.snapshot"
+    assert hass_storage[key]["data"] == SNAPSHOT.as_dict()
+
+
+async def test_handover(hass: HomeAssistant) -> None:
+    """The snapshot of the config flow probe is taken over once."""
+    async_hand_over_snapshot(hass, "perla", SNAPSHOT)
+    assert async_take_over_snapshot(hass, "other") is None
+    assert async_take_over_snapshot(hass, "perla") is SNAPSHOT
+    assert async_take_over_snapshot(hass, "perla") is None
+
+
+async def test_handover_expired(hass: HomeAssistant) -> None:
+    """An old snapshot of the config flow is not used."""
+    async_hand_over_snapshot(hass, "perla", SNAPSHOT)
+    handover = hass.data[DOMAIN][DATA_HANDOVER]
+    handover["perla"] = (time.monotonic() - 61, SNAPSHOT)
+    assert async_take_over_snapshot(hass, "perla") is None
+
+
+async def test_seed(hass: HomeAssistant, coordinator: BwtCoordinator) -> None:
+    """A seeded snapshot counts as a successful poll."""
+    assert coordinator.data is SNAPSHOT
+    assert not coordinator.stale
+    assert coordinator.data_age < 1
+    assert coordinator.serves(("current_flow",))
+
+
+async def test_tiers(
+    hass: HomeAssistant, entry: MockConfigEntry, answering_api: Mock
+) -> None:
+    """Only every slow interval a poll decodes all values."""
+    coordinator = BwtCoordinator(hass, entry, answering_api, BwtModel.PERLA_SILK)
+    await coordinator.async_refresh()
+    assert coordinator.tier == TIER_SLOW
+    answering_api.get_registers.return_value = [
+        value + 1 for value in range(REGISTER_COUNT)
+    ]
+    await coordinator.async_refresh()
+    assert coordinator.tier == TIER_FAST
+    assert coordinator.data.current_flow == 17 * 60
+    assert coordinator.data.hardness_in == 4
+    await coordinator.async_shutdown()
+
+
+async def test_slow_interval(
+    hass: HomeAssistant, entry: MockConfigEntry, answering_api: Mock
+) -> None:
+    """Without a slow interval every poll decodes all values."""
+    coordinator = BwtCoordinator(hass, entry, answering_api, BwtModel.PERLA_SILK)
+    coordinator.slow_interval = timedelta(0)
+    await coordinator.async_refresh()
+    answering_api.get_registers.return_value = [
+        value + 1 for value in range(REGISTER_COUNT)
+    ]
+    await coordinator.async_refresh()
+    assert coordinator.tier == TIER_SLOW
+    assert coordinator.data.hardness_in == 5
+    await coordinator.async_shutdown()
+
+
+async def test_slow_poll_after_failure(
+    hass: HomeAssistant, entry: MockConfigEntry, answering_api: Mock
+) -> None:
+    """The first poll after an outage decodes everything."""
+    coordinator = BwtCoordinator(hass, entry, answering_api, BwtModel.PERLA_SILK)
+    await coordinator.async_refresh()
+    coordinator.stale = True
+    await coordinator.async_refresh()
+    assert coordinator.tier == TIER_SLOW
+    await coordinator.async_shutdown()
+
+
+async def test_demand(
+    hass: HomeAssistant, entry: MockConfigEntry, answering_api: Mock
+) -> None:
+    """Only the registers of the values in demand are read."""
+    coordinator = BwtCoordinator(hass, entry, answering_api, BwtModel.PERLA_SILK)
+    assert coordinator.register_ranges is None
+    release = coordinator.async_demand(["capacity_1"])
+    assert "capacity_1" in coordinator.demanded
+    assert any(23 in registers for registers in coordinator.register_ranges)
+    assert not any(17 in registers for registers in coordinator.register_ranges)
+
+    await coordinator.async_refresh()
+    assert coordinator.data.capacity_1 == 23
+    assert coordinator.data.days_in_service is None
+
+    release()
+    assert "capacity_1" not in coordinator.demanded
+    assert not any(23 in registers for registers in coordinator.register_ranges)
+    await coordinator.async_shutdown()
+
+
+async def test_demand_raw_registers(
+    hass: HomeAssistant, entry: MockConfigEntry, answering_api: Mock
+) -> None:
+    """The raw register entities need the whole dump."""
+    coordinator = BwtCoordinator(hass, entry, answering_api, BwtModel.PERLA_SILK)
+    coordinator.async_demand(["registers"])
+    assert coordinator.register_ranges is None
+    await coordinator.async_shutdown()
+
+
+async def test_stats(
+    hass: HomeAssistant, entry: MockConfigEntry, answering_api: Mock
+) -> None:
+    """Every poll is counted, failed ones also as errors."""
+    coordinator = BwtCoordinator(hass, entry, answering_api, BwtModel.PERLA_SILK)
+    await coordinator.async_refresh()
+    answering_api.get_registers.side_effect = TimeoutError
+    await coordinator.async_refresh()
+    stats = coordinator.stats
+    assert (stats.polls, stats.errors, stats.timeouts) == (2, 1, 1)
+    assert stats.request.count == 1
+    assert stats.decode.count == 1
+    assert stats.fan_out.count == 2
+    await coordinator.async_shutdown()
@@ -0,0 +1,54 @@
+"""Tests for the deadbands of the measurement sensors."""
+
+from custom_components.bwt_perla.const import CONF_DEADBANDS, CONF_MAX_SILENCE
+from custom_components.bwt_perla.deadband import (
+    DEFAULT_MAX_SILENCE,
+    Deadband,
+    deadband_for,
+)
+
+
+def test_suppresses_within_either_band() -> None:
+    """A change is only written if it exceeds both bands."""
+    deadband = Deadband(absolute=10, relative=0.05, max_silence=900)
+    # Within the absolute band
+    assert deadband.suppresses(1000, 1008, 0)
+    # Within the relative band
+    assert deadband.suppresses(1000, 1040, 0)
+    assert not deadband.suppresses(1000, 1060, 0)
+    assert not deadband.suppresses(1000, 940, 0)
+
+
+def test_start_and_stop_always_written() -> None:
+    """Going from or to 0 is never suppressed."""
+    deadband = Deadband(absolute=100, relative=0.5, max_silence=900)
+    assert not deadband.suppresses(0, 5, 0)
+    assert not deadband.suppresses(5, 0, 0)
+    assert deadband.suppresses(0, 0, 0)
+
+
+def test_max_silence() -> None:
+    """A suppressed value is written once the silence is long enough."""
+    deadband = Deadband(absolute=10, relative=0, max_silence=900)
+    assert deadband.suppresses(100, 105, 899)
+    assert not deadband.suppresses(100, 105, 900)
+
+
+def test_non_numeric_values_written() -> None:
+    """Unknown values are always written."""
+    deadband = Deadband(absolute=10, relative=0, max_silence=900)
+    assert not deadband.suppresses(None, 5, 0)
+    assert not deadband.suppresses(5, None, 0)
+    assert not deadband.suppresses("OK", "OK", 0)
+
+
+def test_deadband_for() -> None:
+    """The options hold the bands per key, the relative one in percent."""
+    assert deadband_for({}, "current_flow") is None
+    options = {CONF_DEADBANDS: {"current_flow": [0, 0], "capacity_1": [5, 2]}}
+    assert deadband_for(options, "current_flow") is None
+    assert deadband_for(options, "capacity_1") == Deadband(
+        5, 0.02, DEFAULT_MAX_SILENCE
+    )
+    options[CONF_MAX_SILENCE] = 60
+    assert deadband_for(options, "capacity_1").max_silence == 60
@@ -0,0 +1,86 @@
+"""Tests for the transition events."""
+
+from datetime import datetime
+
+from bwt_api.error import BwtError
+
+from custom_components.bwt_perla.data.snapshot import BwtSnapshot
+from custom_components.bwt_perla.events import (
+    EVENT_ERROR_CLEARED,
+    EVENT_ERROR_RAISED,
+    EVENT_HOLIDAY_MODE,
+    EVENT_REGENERATION,
+    EVENT_SALT_LOW,
+    EVENT_SALT_REFILLED,
+    transitions,
+)
+
+PREVIOUS = BwtSnapshot(
+    regeneration_count_1=10,
+    regeneration_count_2=20,
+    last_regeneration_1=datetime(2024, 5, 1, 2, 0),
+    last_regeneration_2=datetime(2024, 5, 1, 3, 0),
+    errors=(BwtError(1),),
+    regenerativ_level=30,
+    holiday_mode_active=False,
+)
+
+
+def test_no_change() -> None:
+    """Equal snapshots have no transitions."""
+    assert transitions(PREVIOUS, PREVIOUS.replace(), 20) == []
+
+
+def test_regeneration() -> None:
+    """A higher counter is a finished regeneration of that column."""
+    current = PREVIOUS.replace(
+        regeneration_count_2=21, last_regeneration_2=datetime(2024, 5, 2, 3, 0)
+    )
+    assert transitions(PREVIOUS, current, 20) == [
+        (
+            EVENT_REGENERATION,
+            {"column": 2, "count": 21, "started": "2024-05-02T03:00:00"},
+        )
+    ]
+
+
+def test_errors() -> None:
+    """New errors are raised, missing ones cleared."""
+    current = PREVIOUS.replace(errors=(BwtError(2), BwtError(3)))
+    events = transitions(PREVIOUS, current, 20)
+    assert [(event_type, data["code"]) for event_type, data in events] == [
+        (EVENT_ERROR_RAISED, 2),
+        (EVENT_ERROR_RAISED, 3),
+        (EVENT_ERROR_CLEARED, 1),
+    ]
+    assert events[0][1] == {
+        "error": BwtError(2).name,
+        "code": 2,
+        "fatal": BwtError(2).is_fatal(),
+    }
+
+
+def test_salt_threshold() -> None:
+    """The salt level fires once when crossing the threshold."""
+    low = PREVIOUS.replace(regenerativ_level=19)
+    assert transitions(PREVIOUS, low, 20) == [
+        (EVENT_SALT_LOW, {"level": 19, "threshold": 20})
+    ]
+    assert transitions(low, low.replace(regenerativ_level=10), 20) == []
+    assert transitions(low, PREVIOUS.replace(regenerativ_level=20), 20) == [
+        (EVENT_SALT_REFILLED, {"level": 20, "threshold": 20})
+    ]
+
+
+def test_holiday_mode() -> None:
+    """Switching the holiday mode fires its new state."""
+    current = PREVIOUS.replace(holiday_mode_active=True)
+    assert transitions(PREVIOUS, current, 20) == [
+        (EVENT_HOLIDAY_MODE, {"active": True})
+    ]
+
+
+def test_missing_values_skipped() -> None:
+    """Values unknown in either snapshot never fire."""
+    assert transitions(PREVIOUS, BwtSnapshot(), 20) == []
+    assert transitions(BwtSnapshot(), PREVIOUS, 20) == []
@@ -0,0 +1,73 @@
+"""Tests for the flow integration between the ticks of the device total."""
+
+import pytest
+
+from custom_components.bwt_perla.flow import FlowIntegrator
+
+
+def test_integrates_between_ticks() -> None:
+    """The flow is integrated on top of the device total."""
+    flow = FlowIntegrator(100)
+    assert flow.add(0, 600, 1000) == 1000
+    # 600 l/h for a minute
+    assert flow.add(60, 600, 1000) == pytest.approx(1010)
+    # Trapezoidal rule between two samples
+    assert flow.add(120, 0, 1000) == pytest.approx(1015)
+
+
+def test_estimate_stays_below_next_tick() -> None:
+    """The estimate never reaches the next tick of the device."""
+    flow = FlowIntegrator(100)
+    flow.add(0, 6000, 1000)
+    for second in range(60, 1200, 60):
+        total = flow.add(second, 6000, 1000)
+    assert total == 1099
+
+
+def test_reanchors_on_tick() -> None:
+    """The integral restarts at every tick and the total never decreases."""
+    flow = FlowIntegrator(100)
+    flow.add(0, 600, 1000)
+    assert flow.add(60, 600, 1000) == pytest.approx(1010)
+    assert flow.add(120, 600, 1100) == pytest.approx(1100)
+    assert flow.add(180, 600, 1100) == pytest.approx(1110)
+
+
+def test_gap_not_interpolated() -> None:
+    """Samples too far apart are not integrated."""
+    flow = FlowIntegrator(100)
+    flow.add(0, 600, 1000)
+    assert flow.add(600, 600, 1000) == 1000
+
+
+def test_device_reset() -> None:
+    """A lower device total starts counting from it again."""
+    flow = FlowIntegrator(100)
+    flow.add(0, 600, 5000)
+    flow.add(60, 600, 5000)
+    assert flow.add(120, 0, 0) == 0
+
+
+def test_restore() -> None:
+    """A restored total is used once the device total matches it."""
+    flow = FlowIntegrator(100)
+    flow.restore(1042)
+    assert flow.add(0, 0, 1000) == 1042
+    assert flow.add(60, 600, 1000) == pytest.approx(1047)
+
+
+def test_restore_outside_tick_ignored() -> None:
+    """A restored total of another tick is ignored."""
+    flow = FlowIntegrator(100)
+    flow.add(0, 0, 1200)
+    flow.restore(1042)
+    assert flow.add(60, 0, 1200) == 1200
+
+
+def test_ring_buffer() -> None:
+    """Only the newest samples are kept, oldest first."""
+    flow = FlowIntegrator(1, capacity=4)
+    for second in range(6):
+        flow.add(second, second * 10, 0)
+    assert len(flow) == 4
+    assert list(flow.samples()) == [(2, 20), (3, 30), (4, 40), (5, 50)]
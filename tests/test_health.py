@@ -0,0 +1,96 @@
+"""Tests for the round trip estimator and the circuit breaker."""
+
+from custom_components.bwt_perla.health import (
+    BACKOFF_MAX,
+    MAX_TIMEOUT,
+    MIN_TIMEOUT,
+    STATE_CLOSED,
+    STATE_HALF_OPEN,
+    STATE_OPEN,
+    CircuitBreaker,
+    RttEstimator,
+)
+
+
+def test_timeout_without_samples() -> None:
+    """Before the first round trip the maximum timeout is used."""
+    assert RttEstimator().timeout == MAX_TIMEOUT
+
+
+def test_timeout_follows_fast_device() -> None:
+    """A fast device gets the minimum timeout."""
+    rtt = RttEstimator()
+    for _ in range(200):
+        rtt.add(0.05)
+    assert rtt.srtt == 0.05
+    assert rtt.timeout == MIN_TIMEOUT
+
+
+def test_timeout_recovers_after_slowdown() -> None:
+    """A device answering slower than the learned timeout is not locked out."""
+    rtt = RttEstimator()
+    for _ in range(200):
+        rtt.add(0.05)
+
+    results = []
+    for _ in range(20):
+        if rtt.timeout >= 1.5:
+            rtt.add(1.5)
+            results.append(True)
+        else:
+            rtt.timed_out()
+            results.append(False)
+    assert results.count(False) == 1
+    assert all(results[1:])
+
+
+def test_timeout_backoff_capped_and_decays() -> None:
+    """Timeouts double the timeout up to the maximum, successes halve it."""
+    rtt = RttEstimator()
+    rtt.add(0.05)
+    for _ in range(20):
+        rtt.timed_out()
+    assert rtt.timeout == MAX_TIMEOUT
+    for _ in range(20):
+        rtt.add(0.05)
+    assert rtt.backoff == 1.0
+    assert rtt.timeout == MIN_TIMEOUT
+
+
+def test_breaker_opens_after_failures() -> None:
+    """The breaker opens after three failed polls in a row."""
+    breaker = CircuitBreaker("test")
+    assert breaker.retry_delay() is None
+    breaker.record_failure(TimeoutError())
+    breaker.record_failure(TimeoutError())
+    assert breaker.state == STATE_CLOSED
+    breaker.record_failure(TimeoutError())
+    assert breaker.state == STATE_OPEN
+
+
+def test_breaker_half_open() -> None:
+    """A successful probe lets one poll through, which decides the state."""
+    breaker = CircuitBreaker("test")
+    for _ in range(3):
+        breaker.record_failure(None)
+    breaker.probe_succeeded()
+    assert breaker.state == STATE_HALF_OPEN
+    breaker.record_failure(None)
+    assert breaker.state == STATE_OPEN
+
+    breaker.probe_succeeded()
+    breaker.record_success()
+    assert breaker.state == STATE_CLOSED
+    assert breaker.failures == 0
+    assert breaker.retry_delay() is None
+
+
+def test_breaker_retry_delay() -> None:
+    """The back-off grows with the failures, jittered and capped."""
+    breaker = CircuitBreaker("test")
+    breaker.record_failure(None)
+    assert 1.0 <= breaker.retry_delay() <= 2.0
+    for _ in range(50):
+        breaker.record_failure(None)
+    for _ in range(20):
+        assert BACKOFF_MAX / 2 <= breaker.retry_delay() <= BACKOFF_MAX
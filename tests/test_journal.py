@@ -0,0 +1,156 @@
+"""Tests for the Silk register journal."""
+
+import os
+import time
+from unittest.mock import patch
+
+import pytest
+
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+
+from custom_components.bwt_perla import journal
+from custom_components.bwt_perla.journal import (
+    RegisterJournal,
+    _read_varint,
+    _unzigzag,
+    _write_varint,
+    _zigzag,
+    async_remove_journal,
+    decode_journal,
+)
+
+START = dt_util.parse_datetime("2024-05-01T00:00:00+00:00")
+
+
+@pytest.fixture
+async def register_journal(hass: HomeAssistant):
+    """Return a journal, removed after the test."""
+    yield RegisterJournal(hass, "entry")
+    await async_remove_journal(hass, "entry")
+
+
+def _registers(step: int) -> list[int]:
+    return [index * 10 + step * (index % 3) for index in range(48)]
+
+
+def _moment(step: int):
+    return dt_util.utc_from_timestamp(START.timestamp() + step)
+
+
+def _replay(data: bytes) -> list[tuple[int, list[int]]]:
+    """Return the timestamp and all registers after every record."""
+    registers: dict[int, int] = {}
+    states = []
+    for timestamp, changes in decode_journal(data):
+        registers.update(changes)
+        states.append((timestamp, [registers[index] for index in sorted(registers)]))
+    return states
+
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as file:
+        return file.read()
+
+
+def test_varint_roundtrip() -> None:
+    """Varints and zigzag encoding survive a round trip."""
+    for value in (0, 1, 127, 128, 300, 2**40):
+        buffer = bytearray()
+        _write_varint(buffer, value)
+        assert _read_varint(bytes(buffer), 0) == (value, len(buffer))
+    for value in range(-300, 300):
+        assert _zigzag(value) >= 0
+        assert _unzigzag(_zigzag(value)) == value
+
+
+async def test_record_and_decode(
+    hass: HomeAssistant, register_journal: RegisterJournal
+) -> None:
+    """A keyframe is followed by deltas of the changed registers only."""
+    register_journal.async_record(_moment(0), _registers(0))
+    # Nothing changed, nothing recorded
+    register_journal.async_record(_moment(1), _registers(0))
+    register_journal.async_record(_moment(2), _registers(1))
+    await register_journal.async_close()
+
+    records = list(decode_journal(_read(register_journal.path)))
+    assert len(records) == 2
+    assert records[0] == (int(_moment(0).timestamp() * 1000), dict(enumerate(_registers(0))))
+    timestamp, changes = records[1]
+    assert timestamp == int(_moment(2).timestamp() * 1000)
+    assert changes == {
+        index: value
+        for index, value in enumerate(_registers(1))
+        if value != _registers(0)[index]
+    }
+
+
+async def test_writes_keep_their_order(
+    hass: HomeAssistant, register_journal: RegisterJournal
+) -> None:
+    """Chunks are appended in order, even if an earlier write is slower."""
+    append = RegisterJournal._append
+    delays = iter([0.2, 0.1, 0.0])
+
+    def slow_append(self, data, rotate):
+        time.sleep(next(delays, 0.0))
+        return append(self, data, rotate)
+
+    with (
+        patch.object(journal, "_FLUSH_SIZE", 1),
+        patch.object(RegisterJournal, "_append", slow_append),
+    ):
+        for step in range(5):
+            register_journal.async_record(_moment(step), _registers(step))
+        await register_journal.async_close()
+
+    states = _replay(_read(register_journal.path))
+    assert [registers for _, registers in states] == [
+        _registers(step) for step in range(5)
+    ]
+
+
+async def test_rotation(
+    hass: HomeAssistant, register_journal: RegisterJournal
+) -> None:
+    """A full journal is rotated and the new file starts with a keyframe."""
+    with (
+        patch.object(journal, "_FLUSH_SIZE", 1),
+        patch.object(journal, "_MAX_SIZE", 500),
+    ):
+        for step in range(100):
+            register_journal.async_record(_moment(step), _registers(step))
+            await hass.async_block_till_done()
+        await register_journal.async_close()
+
+    rotated = register_journal.path + ".1"
+    assert os.path.exists(rotated)
+    assert os.path.getsize(register_journal.path) < 600
+    # Each file can be decoded on its own and ends with the newest registers
+    assert _replay(_read(rotated))
+    states = _replay(_read(register_journal.path))
+    assert states[-1][1] == _registers(99)
+
+    await async_remove_journal(hass, "entry")
+    assert not os.path.exists(register_journal.path)
+    assert not os.path.exists(rotated)
+
+
+async def test_export(
+    hass: HomeAssistant, register_journal: RegisterJournal
+) -> None:
+    """The export starts with the registers at the start of the range."""
+    for step in range(10):
+        register_journal.async_record(_moment(step), _registers(step))
+    path, rows = await register_journal.async_export(_moment(5), _moment(7))
+
+    with open(path, encoding="utf-8") as file:
+        lines = file.read().splitlines()
+    assert lines[0] == "timestamp,register,value"
+    assert len(lines) == rows + 1
+    # All registers at the start, then the changes of steps 5 to 7
+    changed = sum(1 for index in range(48) if index % 3)
+    assert rows == 48 + 3 * changed
+    assert lines[1] == f"{_moment(5).isoformat()},0,0"
+    os.remove(path)
@@ -0,0 +1,61 @@
+"""Tests for decoding the local api."""
+
+from bwt_api.data import BwtStatus
+from bwt_api.error import BwtError
+import pytest
+
+from custom_components.bwt_perla.data.local import LocalApiData
+
+from .common import current_response
+
+
+def test_snapshot() -> None:
+    """A slow poll decodes every value."""
+    snapshot = LocalApiData(current_response()).snapshot()
+    assert snapshot.total_output == 12345
+    assert snapshot.hardness_in == 20
+    assert snapshot.hardness_out == 4
+    # Treated water is converted into blended water
+    assert snapshot.day_output == pytest.approx(240 / (1 - 4 / 20))
+    # ml * dH into litres of blended water
+    assert snapshot.capacity_1 == pytest.approx(1_200_000 / 16 / 1000)
+    assert snapshot.regeneration_count_2 == 305
+    assert snapshot.state == "OK"
+    assert snapshot.errors == ()
+    assert not snapshot.holiday_mode_active
+
+
+def test_snapshot_fast() -> None:
+    """A fast poll takes all but the fast values from the previous snapshot."""
+    previous = LocalApiData(current_response()).snapshot()
+    errors = [BwtError(1), BwtError(3)]
+    response = current_response(
+        current_flow=600,
+        blended_total=12400,
+        regeneration_count_1=311,
+        regenerativ_level=10,
+        state=BwtStatus.ERROR,
+        errors=errors,
+    )
+    snapshot = LocalApiData(response).snapshot(previous)
+    assert snapshot.current_flow == 600
+    assert snapshot.total_output == 12400
+    # State and errors must not be missed, they are decoded on every poll
+    assert snapshot.state == "ERROR"
+    assert snapshot.errors == tuple(errors)
+    assert snapshot.fatal_errors == ",".join(
+        error.name for error in errors if error.is_fatal()
+    )
+    assert snapshot.regeneration_count_1 == 310
+    assert snapshot.regenerativ_level == 64
+
+
+def test_snapshot_fields() -> None:
+    """Slow values nobody uses are not decoded."""
+    snapshot = LocalApiData(current_response(), {"regeneration_count_1"}).snapshot()
+    assert snapshot.regeneration_count_1 == 310
+    assert snapshot.regeneration_count_2 is None
+    assert snapshot.customer_service is None
+    # Fast values and the hardness are always decoded
+    assert snapshot.total_output == 12345
+    assert snapshot.hardness_out == 4
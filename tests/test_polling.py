@@ -0,0 +1,136 @@
+"""Tests for the poll policies."""
+
+from datetime import datetime, timedelta
+from typing import Any
+
+import pytest
+
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+
+from custom_components.bwt_perla.data.snapshot import BwtSnapshot
+from custom_components.bwt_perla.polling import (
+    ClassicPolicy,
+    LearnedPolicy,
+    StateAwarePolicy,
+    UsageHistogram,
+    storage_key,
+)
+
+# A Monday
+MORNING = datetime(2024, 5, 6, 7, 0)
+NIGHT = datetime(2024, 5, 6, 2, 0, tzinfo=dt_util.UTC)
+
+
+def test_histogram_not_learned() -> None:
+    """An hour observed for less than an hour has no probability."""
+    histogram = UsageHistogram()
+    histogram.add(MORNING, 1800, 180)
+    assert histogram.probability(MORNING) is None
+    histogram.add(MORNING, 1800, 180)
+    assert histogram.probability(MORNING) == 0.1
+    # Same hour of another day
+    assert histogram.probability(MORNING + timedelta(days=1)) is None
+
+
+def test_histogram_weekly_decay() -> None:
+    """Older weeks count less than the current one."""
+    histogram = UsageHistogram()
+    histogram.add(MORNING, 3600, 3600)
+    histogram.add(MORNING + timedelta(weeks=1), 3600, 0)
+    # 0.8 * 3600 active of 1.8 * 3600 observed
+    assert histogram.probability(MORNING) == pytest.approx(0.8 / 1.8)
+
+
+def test_histogram_restore_invalid() -> None:
+    """Persisted buckets of another size are dropped."""
+    histogram = UsageHistogram([[1.0, 2.0, 0]])
+    assert len(histogram.buckets) == 7 * 24
+
+
+async def test_learned_policy_unlearned(hass: HomeAssistant) -> None:
+    """Without learned usage the classic intervals are used."""
+    policy = LearnedPolicy(hass, "abc")
+    assert policy.next_interval(None, 0, MORNING) == timedelta(seconds=30)
+    assert policy.next_interval(None, 5, MORNING) == timedelta(seconds=1)
+
+
+async def test_learned_policy_likely_hour(hass: HomeAssistant) -> None:
+    """Hours with usage are polled often, idle ones rarely."""
+    policy = LearnedPolicy(hass, "abc")
+    policy.histogram.add(MORNING, 3600, 360)
+    policy.histogram.add(MORNING + timedelta(hours=3), 3600, 0)
+    assert policy.next_interval(None, 0, MORNING) == timedelta(seconds=5)
+    # The hour before is sped up by the lookahead
+    assert policy.next_interval(
+        None, 0, MORNING - timedelta(minutes=10)
+    ) == timedelta(seconds=5)
+    idle = MORNING + timedelta(hours=3)
+    assert policy.next_interval(None, 0, idle) == timedelta(seconds=300)
+    # Backs off step by step
+    assert policy.next_interval(timedelta(seconds=5), 0, idle) == timedelta(
+        seconds=10
+    )
+
+
+async def test_learned_policy_learns(hass: HomeAssistant) -> None:
+    """The time between two polls is added to the histogram."""
+    policy = LearnedPolicy(hass, "abc")
+    moment = MORNING - timedelta(minutes=15)
+    for _ in range(5):
+        policy.next_interval(None, 10, moment)
+        moment += timedelta(minutes=15)
+    assert policy.histogram.probability(MORNING) == 1.0
+
+
+async def test_learned_policy_persisted(
+    hass: HomeAssistant, hass_storage: dict[str, Any]
+) -> None:
+    """The histogram survives a restart."""
+    policy = LearnedPolicy(hass, "abc")
+    policy.histogram.add(MORNING, 3600, 360)
+    await policy.async_unload()
+    assert storage_key("abc") in hass_storage
+
+    restored = LearnedPolicy(hass, "abc")
+    await restored.async_load()
+    assert restored.histogram.probability(MORNING) == 0.1
+
+
+def _state_aware() -> StateAwarePolicy:
+    return StateAwarePolicy(ClassicPolicy())
+
+
+def test_state_aware_flow() -> None:
+    """Flow gets the interval of the other policy."""
+    policy = _state_aware()
+    data = BwtSnapshot(holiday_mode_active=True)
+    assert policy.next_interval(None, 5, NIGHT, data) == timedelta(seconds=1)
+    assert policy.next_interval(None, 0, NIGHT, None) == timedelta(seconds=2)
+
+
+def test_state_aware_regeneration() -> None:
+    """Around the time of the last regeneration it polls fast."""
+    policy = _state_aware()
+    data = BwtSnapshot(last_regeneration_1=NIGHT - timedelta(days=3, minutes=20))
+    assert policy.next_interval(None, 0, NIGHT, data) == timedelta(seconds=10)
+    data = BwtSnapshot(last_regeneration_1=NIGHT - timedelta(days=3, hours=2))
+    assert policy.next_interval(None, 0, NIGHT, data) == timedelta(seconds=30)
+
+
+def test_state_aware_holiday_mode() -> None:
+    """In holiday mode it polls rarely."""
+    policy = _state_aware()
+    data = BwtSnapshot(holiday_mode_active=True)
+    assert policy.next_interval(None, 0, NIGHT, data) == timedelta(seconds=600)
+
+
+def test_state_aware_idle_backoff() -> None:
+    """The longer no water was drawn, the longer the interval."""
+    policy = _state_aware()
+    data = BwtSnapshot(holiday_mode_active=False)
+    policy.next_interval(None, 5, NIGHT, data)
+    later = NIGHT + timedelta(minutes=10)
+    assert policy.next_interval(None, 0, later, data) == timedelta(seconds=60)
+    later = NIGHT + timedelta(hours=2)
+    assert policy.next_interval(None, 0, later, data) == timedelta(seconds=300)
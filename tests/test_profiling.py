@@ -0,0 +1,61 @@
+"""Tests for the profile of one device."""
+
+from datetime import timedelta
+import json
+import os
+from unittest.mock import AsyncMock, Mock
+
+from bwt_api.bwt import BwtModel
+from pytest_homeassistant_custom_component.common import (
+    MockConfigEntry,
+    async_fire_time_changed,
+)
+
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+
+from custom_components.bwt_perla.const import DOMAIN
+from custom_components.bwt_perla.coordinator import BwtCoordinator
+from custom_components.bwt_perla.data.silk import REGISTER_COUNT
+from custom_components.bwt_perla.profiling import CoordinatorProfiler
+
+
+def _coordinator(hass: HomeAssistant) -> BwtCoordinator:
+    entry = MockConfigEntry(domain=DOMAIN, title="Perla", data={})
+    entry.add_to_hass(hass)
+    api = Mock()
+    api.get_registers = AsyncMock(return_value=list(range(REGISTER_COUNT)))
+    api.payload_bytes = None
+    api.close = AsyncMock()
+    return BwtCoordinator(hass, entry, api, BwtModel.PERLA_SILK)
+
+
+async def test_profile(hass: HomeAssistant) -> None:
+    """Only the profiled device is measured, the files are written at the end."""
+    coordinator = _coordinator(hass)
+    other = _coordinator(hass)
+    result = CoordinatorProfiler(hass, coordinator).async_start(10)
+    assert CoordinatorProfiler.running()
+    assert coordinator.profiler is not None
+    assert other.profiler is None
+
+    await coordinator.async_refresh()
+    await other.async_refresh()
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=11))
+    await hass.async_block_till_done()
+    assert not CoordinatorProfiler.running()
+    assert coordinator.profiler is None
+
+    try:
+        with open(result["timings"], encoding="utf-8") as file:
+            timings = json.load(file)
+        assert timings["request"]["count"] == 1
+        assert timings["SilkApiData.snapshot"]["count"] == 1
+        assert timings["async_update_listeners"]["count"] == 1
+        assert os.path.exists(result["profile"])
+    finally:
+        for path in (result["profile"], result["timings"]):
+            if os.path.exists(path):
+                os.remove(path)
+    await coordinator.async_shutdown()
+    await other.async_shutdown()
@@ -0,0 +1,68 @@
+"""Tests for the scheduler sharing the poll deadlines."""
+
+import asyncio
+from datetime import timedelta
+from unittest.mock import AsyncMock, Mock
+
+from homeassistant.core import HomeAssistant
+
+from custom_components.bwt_perla.scheduler import BwtPollScheduler
+
+
+def _coordinator(name: str) -> Mock:
+    coordinator = Mock()
+    coordinator.name = name
+    coordinator.poll_interval = timedelta(seconds=10)
+    coordinator.next_poll_delay.return_value = 600
+    coordinator.async_refresh = AsyncMock()
+    return coordinator
+
+
+async def test_deadlines_staggered(hass: HomeAssistant) -> None:
+    """Devices with the same interval are not polled at the same instant."""
+    scheduler = BwtPollScheduler(hass, 2)
+    first = _coordinator("first")
+    second = _coordinator("second")
+    # The scheduler runs on the loop clock, the deadlines are real
+    scheduler.async_register("first", first, 0)
+    scheduler.async_register("second", second, 0)
+
+    await asyncio.sleep(0.1)
+    assert first.async_refresh.call_count == 1
+    assert second.async_refresh.call_count == 0
+    await asyncio.sleep(0.25)
+    assert second.async_refresh.call_count == 1
+    scheduler.async_shutdown()
+
+
+async def test_max_in_flight(hass: HomeAssistant) -> None:
+    """Due polls wait for a free slot."""
+    scheduler = BwtPollScheduler(hass, 1)
+    release = asyncio.Event()
+    first = _coordinator("first")
+    first.async_refresh = AsyncMock(side_effect=release.wait)
+    second = _coordinator("second")
+    scheduler.async_register("first", first, 0)
+    scheduler.async_register("second", second, 0)
+
+    await asyncio.sleep(0.35)
+    # The deadline of the second device has passed
+    assert first.async_refresh.call_count == 1
+    assert second.async_refresh.call_count == 0
+    assert scheduler.stats()["in_flight"] == 1
+
+    release.set()
+    await hass.async_block_till_done()
+    assert second.async_refresh.call_count == 1
+    assert scheduler.stats()["in_flight"] == 0
+    scheduler.async_shutdown()
+
+
+async def test_unregister(hass: HomeAssistant) -> None:
+    """An unregistered device is not polled anymore."""
+    scheduler = BwtPollScheduler(hass, 2)
+    coordinator = _coordinator("first")
+    unregister = scheduler.async_register("first", coordinator, 0)
+    unregister()
+    await asyncio.sleep(0.05)
+    assert coordinator.async_refresh.call_count == 0
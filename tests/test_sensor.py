@@ -0,0 +1,96 @@
+"""Tests for the sensors of a device."""
+
+from unittest.mock import AsyncMock
+
+from bwt_api.bwt import BwtModel
+import pytest
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from homeassistant.components.recorder import Recorder
+from homeassistant.components.sensor import SensorDeviceClass
+from homeassistant.const import CONF_HOST
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import entity_registry as er
+
+from custom_components.bwt_perla.const import CONF_MODEL, DOMAIN
+from custom_components.bwt_perla.coordinator import (
+    BwtCoordinator,
+    async_hand_over_snapshot,
+)
+from custom_components.bwt_perla.data.silk import REGISTER_COUNT, SilkApiData
+
+# No flow, so the integrated total stays the same
+RAW = [0 if index == 16 else index for index in range(REGISTER_COUNT)]
+
+
+@pytest.fixture(autouse=True)
+def auto_enable_custom_integrations(
+    recorder_mock: Recorder, enable_custom_integrations: None
+) -> None:
+    """Set up the recorder the integration depends on before hass."""
+
+
+@pytest.fixture
+async def entry(hass: HomeAssistant):
+    """Set up a Silk from the snapshot of the config flow."""
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        version=2,
+        minor_version=2,
+        title="Perla",
+        data={CONF_HOST: "silk", CONF_MODEL: BwtModel.PERLA_SILK.value},
+    )
+    entry.add_to_hass(hass)
+    async_hand_over_snapshot(hass, "silk", SilkApiData(RAW).snapshot())
+    assert await hass.config_entries.async_setup(entry.entry_id)
+    await hass.async_block_till_done()
+    yield entry
+    assert await hass.config_entries.async_unload(entry.entry_id)
+
+
+def _entity_id(hass: HomeAssistant, entry: MockConfigEntry, key: str) -> str:
+    return er.async_get(hass).async_get_entity_id(
+        "sensor", DOMAIN, f"{entry.entry_id}_{key}"
+    )
+
+
+def _coordinator(hass: HomeAssistant, entry: MockConfigEntry) -> BwtCoordinator:
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+    coordinator.my_api.get_registers = AsyncMock(return_value=RAW)
+    return coordinator
+
+
+async def test_silk_entities(hass: HomeAssistant, entry: MockConfigEntry) -> None:
+    """The Silk only sensors are built from the register table."""
+    registry = er.async_get(hass)
+    # Rarely used, disabled by default
+    for key in ("days_in_service", "warranty_days_remaining"):
+        assert registry.async_get(_entity_id(hass, entry, key)).disabled
+    service = hass.states.get(_entity_id(hass, entry, "next_customer_service"))
+    assert service.attributes["device_class"] == SensorDeviceClass.TIMESTAMP
+    assert service.attributes["icon"] == "mdi:wrench-clock"
+
+
+async def test_unchanged_state_not_written(
+    hass: HomeAssistant, entry: MockConfigEntry
+) -> None:
+    """Only entities with a changed state are written."""
+    coordinator = _coordinator(hass, entry)
+    await coordinator.async_refresh()
+    writes = coordinator.state_writes
+    skipped = coordinator.state_writes_skipped
+    assert skipped > 0
+
+    await coordinator.async_refresh()
+    assert coordinator.state_writes == writes
+    assert coordinator.state_writes_skipped > skipped
+
+    hardness = hass.states.get(_entity_id(hass, entry, "hardness_in"))
+    coordinator.my_api.get_registers.return_value = [
+        value + 1 if index == 16 else value for index, value in enumerate(RAW)
+    ]
+    await coordinator.async_refresh()
+    assert coordinator.state_writes > writes
+    flow = hass.states.get(_entity_id(hass, entry, "current_flow"))
+    assert float(flow.state) > 0
+    assert hass.states.get(_entity_id(hass, entry, "hardness_in")) is hardness
@@ -0,0 +1,84 @@
+"""Tests for decoding the Silk registers."""
+
+from custom_components.bwt_perla.data.silk import (
+    FIELD_REGISTERS,
+    REGISTER_COUNT,
+    SilkApiData,
+    decode_registers,
+    register_ranges,
+)
+
+RAW = list(range(REGISTER_COUNT))
+
+
+def test_decode_registers_scaled() -> None:
+    """Registers are scaled by the table."""
+    record = decode_registers(RAW)
+    assert record.total_water_served == 15 * 100
+    assert record.current_flow_rate == 16 * 60
+    assert record.water_hardness == 4
+    assert record.register_0 == 0
+
+
+def test_decode_registers_short_dump() -> None:
+    """Registers missing in a short dump are None."""
+    record = decode_registers(RAW[:10])
+    assert record.water_hardness == 4
+    assert record.total_water_served is None
+    record = decode_registers(RAW[:10], (range(0, REGISTER_COUNT),))
+    assert record.water_hardness == 4
+    assert record.total_water_served is None
+
+
+def test_register_ranges_merged() -> None:
+    """Adjacent registers are read as one range."""
+    assert register_ranges(["current_flow", "total_output"]) == (range(15, 17),)
+    assert register_ranges(["current_flow", "hardness_in", "regenerativ_level"]) == (
+        range(4, 5),
+        range(16, 17),
+        range(30, 32),
+    )
+    assert register_ranges(["hardness_out", "unknown"]) == ()
+    assert register_ranges(["registers"]) == (range(REGISTER_COUNT),)
+
+
+def test_decode_registers_ranges() -> None:
+    """Only the registers of the ranges are decoded."""
+    record = decode_registers(RAW, register_ranges(["current_flow"]))
+    assert record.current_flow_rate == 16 * 60
+    assert record.total_water_served is None
+    assert record.water_hardness is None
+
+
+def test_field_registers_in_range() -> None:
+    """Every value is decoded from existing registers."""
+    for indices in FIELD_REGISTERS.values():
+        assert all(0 <= index < REGISTER_COUNT for index in indices)
+
+
+def test_snapshot() -> None:
+    """A slow poll decodes every value."""
+    snapshot = SilkApiData(RAW).snapshot()
+    assert snapshot.current_flow == 16 * 60
+    assert snapshot.total_output == 15 * 100
+    assert snapshot.day_output == 42
+    assert snapshot.capacity_1 == 23
+    assert snapshot.regeneration_count_1 == 19
+    assert snapshot.regenerativ_level == int(31 / 30 * 100)
+    assert snapshot.register(47) == 47
+    assert snapshot.last_regeneration_1.hour == 7
+    assert snapshot.last_regeneration_1.minute == 8
+
+
+def test_snapshot_fast() -> None:
+    """A fast poll takes all but the fast values from the previous snapshot."""
+    previous = SilkApiData(RAW).snapshot()
+    raw = [value + 1 for value in RAW]
+    snapshot = SilkApiData(raw).snapshot(previous)
+    assert snapshot.current_flow == 17 * 60
+    assert snapshot.total_output == 16 * 100
+    assert snapshot.day_output == 43
+    assert snapshot.capacity_1 == 24
+    assert snapshot.hardness_in == previous.hardness_in
+    assert snapshot.regeneration_count_1 == previous.regeneration_count_1
+    assert snapshot.registers is previous.registers
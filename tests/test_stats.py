@@ -0,0 +1,44 @@
+"""Tests for the poll statistics."""
+
+from custom_components.bwt_perla.stats import LatencyHistogram, PollStats
+
+
+def test_histogram_empty() -> None:
+    """An empty histogram has no quantiles."""
+    histogram = LatencyHistogram()
+    assert histogram.quantile(0.5) is None
+    assert histogram.as_dict()["mean"] is None
+
+
+def test_histogram_quantiles() -> None:
+    """Quantiles are the upper bounds of their buckets."""
+    histogram = LatencyHistogram()
+    for _ in range(90):
+        histogram.add(0.003)
+    for _ in range(10):
+        histogram.add(0.3)
+    assert histogram.quantile(0.5) == 0.005
+    assert histogram.quantile(0.95) == 0.5
+    assert histogram.max == 0.3
+    assert histogram.last == 0.3
+
+
+def test_histogram_open_bucket() -> None:
+    """Durations above the last bound are reported by the maximum."""
+    histogram = LatencyHistogram()
+    histogram.add(12.0)
+    assert histogram.quantile(0.95) == 12.0
+    assert histogram.as_dict()["buckets"][">10.0"] == 1
+
+
+def test_poll_stats() -> None:
+    """The diagnostics hold the counters and the histograms."""
+    stats = PollStats()
+    stats.polls = 3
+    stats.errors = 1
+    stats.request.add(0.02)
+    result = stats.as_dict()
+    assert result["polls"] == 3
+    assert result["errors"] == 1
+    assert result["request"]["count"] == 1
+    assert result["decode"]["count"] == 0
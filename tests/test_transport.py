@@ -0,0 +1,78 @@
+"""Tests for the transport shared by all apis."""
+
+import asyncio
+from unittest.mock import Mock
+
+import aiohttp
+import pytest
+
+from custom_components.bwt_perla.transport import BwtTransport
+
+
+class _Session:
+    """Client session counting the requests in flight per host."""
+
+    def __init__(self) -> None:
+        self.in_flight: dict[str, int] = {}
+        self.max_in_flight: dict[str, int] = {}
+
+    async def get(self, url: str, **kwargs) -> Mock:
+        host = url.split("/")[2]
+        self.in_flight[host] = self.in_flight.get(host, 0) + 1
+        self.max_in_flight[host] = max(
+            self.max_in_flight.get(host, 0), self.in_flight[host]
+        )
+        await asyncio.sleep(0.01)
+        self.in_flight[host] -= 1
+        response = Mock()
+        response.content.total_bytes = 42
+        return response
+
+
+async def _async_request(session, url: str) -> None:
+    async with session.get(url):
+        await asyncio.sleep(0.01)
+
+
+async def test_limit_dropped_with_last_session() -> None:
+    """The limit of a host lives as long as its sessions."""
+    transport = BwtTransport(Mock())
+    first = transport.session("perla")
+    second = transport.session("perla")
+    assert first._limit is second._limit
+
+    await first.close()
+    # Closing twice does not release the host of the second session
+    await first.close()
+    third = transport.session("perla")
+    assert third._limit is second._limit
+
+    await second.close()
+    await third.close()
+    assert "perla" not in transport._limits
+    assert transport.session("perla")._limit is not second._limit
+
+
+async def test_requests_serialized_per_host() -> None:
+    """Apis of the same host share one connection, other hosts do not wait."""
+    client = _Session()
+    transport = BwtTransport(client)
+    sessions = [transport.session(host) for host in ("a", "a", "b", "b")]
+    await asyncio.gather(
+        *(
+            _async_request(session, f"http://{host}/api")
+            for session, host in zip(sessions, ("a", "a", "b", "b"))
+            for _ in range(3)
+        )
+    )
+    assert client.max_in_flight == {"a": 1, "b": 1}
+    assert sessions[0].payload_bytes == 42
+
+
+async def test_closed_session() -> None:
+    """A closed session sends no requests."""
+    transport = BwtTransport(_Session())
+    session = transport.session("a")
+    await session.close()
+    with pytest.raises(aiohttp.ClientConnectionError):
+        await _async_request(session, "http://a/api")
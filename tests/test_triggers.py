@@ -0,0 +1,81 @@
+"""Tests for the bursts of fast polls."""
+
+import time
+from unittest.mock import AsyncMock, Mock, patch
+
+from bwt_api.bwt import BwtModel
+import pytest
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from homeassistant.core import HomeAssistant
+
+from custom_components.bwt_perla.const import DOMAIN, EVENT_FAST_POLL
+from custom_components.bwt_perla.coordinator import BwtCoordinator
+from custom_components.bwt_perla.triggers import (
+    async_fast_poll,
+    async_listen_fast_poll_event,
+)
+
+
+@pytest.fixture
+async def coordinator(hass: HomeAssistant):
+    """Return the coordinator of a loaded entry."""
+    entry = MockConfigEntry(domain=DOMAIN, title="Perla", data={})
+    entry.add_to_hass(hass)
+    api = Mock()
+    api.close = AsyncMock()
+    coordinator = BwtCoordinator(hass, entry, api, BwtModel.PERLA_SILK)
+    hass.data.setdefault(DOMAIN, {})[entry.entry_id] = coordinator
+    yield coordinator
+    await coordinator.async_shutdown()
+
+
+async def test_bursts_merged(hass: HomeAssistant, coordinator: BwtCoordinator) -> None:
+    """Overlapping bursts keep the shorter interval and the later end."""
+    assert coordinator.next_poll_delay() == 30
+    coordinator.async_fast_poll(5, 60)
+    assert coordinator.next_poll_delay() == 5
+    coordinator.async_fast_poll(2, 10)
+    assert coordinator.next_poll_delay() == 2
+    assert coordinator.fast_poll_remaining > 50
+    coordinator.async_fast_poll(10, 120)
+    assert coordinator.next_poll_delay() == 2
+    assert coordinator.fast_poll_remaining > 110
+
+
+async def test_burst_ends(hass: HomeAssistant, coordinator: BwtCoordinator) -> None:
+    """After a burst the poll policy takes over again."""
+    coordinator.async_fast_poll(2, 10)
+    later = time.monotonic() + 11
+    with patch(
+        "custom_components.bwt_perla.coordinator.time.monotonic", return_value=later
+    ):
+        assert coordinator.next_poll_delay() == 30
+        assert coordinator.fast_poll_remaining == 0
+        # A new burst does not inherit the interval of the old one
+        coordinator.async_fast_poll(5, 10)
+        assert coordinator.next_poll_delay() == 5
+
+
+async def test_fast_poll_all(hass: HomeAssistant, coordinator: BwtCoordinator) -> None:
+    """Without entry id every device polls faster."""
+    assert async_fast_poll(hass, None, 2, 10) == 1
+    assert async_fast_poll(hass, "other", 2, 10) == 0
+
+
+async def test_fast_poll_event(
+    hass: HomeAssistant, coordinator: BwtCoordinator
+) -> None:
+    """The event starts a burst, invalid events are ignored."""
+    unsub = async_listen_fast_poll_event(hass)
+    hass.bus.async_fire(EVENT_FAST_POLL, {"interval": 100})
+    await hass.async_block_till_done()
+    assert coordinator.fast_poll_remaining == 0
+
+    hass.bus.async_fire(
+        EVENT_FAST_POLL,
+        {"config_entry_id": coordinator.config_entry.entry_id, "interval": 3},
+    )
+    await hass.async_block_till_done()
+    assert coordinator.next_poll_delay() == 3
+    unsub()